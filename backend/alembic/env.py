@@ -1,14 +1,17 @@
 import asyncio
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
-from app.db import Base
+from app.db import Base, STARTUP_LOCK
+from app.db.advisory_lock import ADVISORY_LOCK, ADVISORY_UNLOCK
 from app.settings import DATABASE_URL_FULL
 from app.models import *
 
@@ -26,6 +29,16 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+# Секции task создаются функцией task_create_partitions() и в моделях не описаны:
+# без фильтра autogenerate предлагает их удалить
+TASK_PARTITION = re.compile(r'task_default|task_p\d{6}')
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    table_name = name if type_ == 'table' else getattr(getattr(object, 'table', None), 'name', None)
+    return not (table_name and TASK_PARTITION.fullmatch(table_name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +61,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,10 +71,23 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
-
-    with context.begin_transaction():
-        context.run_migrations()
+    # Миграции из нескольких контейнеров применяются по очереди, а процессы
+    # приложения не создают данные, пока схема не обновлена. Блокировка
+    # сессионная: переживает commit и autocommit_block внутри миграций
+    connection.execute(text(ADVISORY_LOCK), {'name': STARTUP_LOCK})
+    connection.commit()
+    try:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        connection.execute(text(ADVISORY_UNLOCK), {'name': STARTUP_LOCK})
+        connection.commit()
 
 
 async def run_migrations_online() -> None:
@@ -0,0 +1,117 @@
+"""Added task list generation counters
+
+Revision ID: 174df43b5a0d
+Revises: bb4b98c550ea
+Create Date: 2026-10-18 13:06:25.969577
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '174df43b5a0d'
+down_revision: Union[str, Sequence[str], None] = 'bb4b98c550ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count - r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSE
+        -- Любое изменение задачи меняет поколение её старого и нового статуса
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT n.status, CASE WHEN o.status <> n.status THEN 1 ELSE 0 END AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                UNION ALL
+                SELECT o.status, CASE WHEN o.status <> n.status THEN -1 ELSE 0 END AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count + r.delta WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count - r.delta WHERE status = r.status;
+        END LOOP;
+    ELSE
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT n.status, 1 AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE o.status <> n.status
+                UNION ALL
+                SELECT o.status, -1 AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE o.status <> n.status
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count + r.delta WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('task_status_counter', sa.Column('generation', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('task_status_counter', sa.Column('changed_at', sa.DateTime(), nullable=True))
+    op.execute(TASK_STATUS_COUNTER_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_TASK_STATUS_COUNTER_FUNCTION)
+    op.drop_column('task_status_counter', 'changed_at')
+    op.drop_column('task_status_counter', 'generation')
@@ -0,0 +1,99 @@
+"""Added task status counters
+
+Revision ID: 209f1c84d441
+Revises: fe59d37bac51
+Create Date: 2026-10-18 12:57:24.410247
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '209f1c84d441'
+down_revision: Union[str, Sequence[str], None] = 'fe59d37bac51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count + r.delta WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count - r.delta WHERE status = r.status;
+        END LOOP;
+    ELSE
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT n.status, 1 AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE o.status <> n.status
+                UNION ALL
+                SELECT o.status, -1 AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE o.status <> n.status
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter SET count = count + r.delta WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_status_counter',
+    sa.Column('status', postgresql.ENUM('created', 'in_progress', 'finished', name='task_status_type', create_type=False), nullable=False),
+    sa.Column('count', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('status')
+    )
+    # Не даём писать в task, пока счётчики заполняются текущими значениями
+    op.execute('LOCK TABLE task IN SHARE MODE')
+    op.execute(TASK_STATUS_COUNTER_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER task_status_counter_insert AFTER INSERT ON task
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER task_status_counter_update AFTER UPDATE ON task
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER task_status_counter_delete AFTER DELETE ON task
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """)
+    op.execute("""
+        INSERT INTO task_status_counter (status, count)
+        SELECT s.status, (SELECT count(*) FROM task WHERE task.status = s.status)
+        FROM unnest(enum_range(NULL::task_status_type)) AS s(status)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER task_status_counter_delete ON task')
+    op.execute('DROP TRIGGER task_status_counter_update ON task')
+    op.execute('DROP TRIGGER task_status_counter_insert ON task')
+    op.execute('DROP FUNCTION task_status_counter_refresh()')
+    op.drop_table('task_status_counter')
@@ -0,0 +1,99 @@
+"""Added task archive change tokens
+
+Revision ID: 22ddc342db1e
+Revises: c4009f0de6fc
+Create Date: 2026-10-18 13:41:33.145702
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '22ddc342db1e'
+down_revision: Union[str, Sequence[str], None] = 'c4009f0de6fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Удаление tombstone клиентам уже не интересно. Задача, которую тот же
+        -- оператор записал в task_archive (archive_finished), перенесена в архив
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN a.id IS NULL THEN 'deleted' ELSE 'archived' END,
+            'id', o.id, 'status', o.status, 'version', o.version
+        )::text)
+        FROM old_rows o LEFT JOIN task_archive a ON a.id = o.id
+        WHERE o.deleted_at IS NULL;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN n.deleted_at IS NULL THEN 'updated' ELSE 'deleted' END,
+            'id', n.id, 'status', n.status, 'old_status', o.status, 'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Удаление tombstone клиентам уже не интересно
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'deleted', 'id', o.id, 'status', o.status, 'version', o.version
+        )::text) FROM old_rows o WHERE o.deleted_at IS NULL;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN n.deleted_at IS NULL THEN 'updated' ELSE 'deleted' END,
+            'id', n.id, 'status', n.status, 'old_status', o.status, 'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Без DEFAULT при добавлении таблица не перезаписывается: у уже
+    # перенесённых в архив задач change_xid остаётся NULL
+    op.add_column('task_archive', sa.Column('change_xid', sa.BigInteger(), nullable=True))
+    op.alter_column(
+        'task_archive', 'change_xid',
+        server_default=sa.text('pg_current_xact_id()::text::bigint'),
+    )
+    op.execute(TASK_NOTIFY_FUNCTION)
+
+    # CONCURRENTLY не блокирует запись в task_archive, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_archive_change_xid_id', 'task_archive', ['change_xid', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_task_archive_change_xid_id', table_name='task_archive',
+            postgresql_concurrently=True,
+        )
+    op.execute(PREVIOUS_TASK_NOTIFY_FUNCTION)
+    op.drop_column('task_archive', 'change_xid')
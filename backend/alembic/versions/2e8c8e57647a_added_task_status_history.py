@@ -0,0 +1,55 @@
+"""Added task status history
+
+Revision ID: 2e8c8e57647a
+Revises: 7d1ba2dcee51
+Create Date: 2026-10-18 13:27:36.718038
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e8c8e57647a'
+down_revision: Union[str, Sequence[str], None] = '7d1ba2dcee51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_status_history',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('task_id', sa.UUID(), nullable=False),
+        sa.Column(
+            'old_status',
+            postgresql.ENUM(name='task_status_type', create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            'status',
+            postgresql.ENUM(name='task_status_type', create_type=False),
+            nullable=False,
+        ),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_task_status_history_changed_at', 'task_status_history', ['changed_at'],
+        unique=False, postgresql_using='brin',
+    )
+    op.create_index(
+        'ix_task_status_history_task_id', 'task_status_history', ['task_id'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_status_history_task_id', table_name='task_status_history')
+    op.drop_index('ix_task_status_history_changed_at', table_name='task_status_history')
+    op.drop_table('task_status_history')
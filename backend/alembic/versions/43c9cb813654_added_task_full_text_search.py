@@ -0,0 +1,108 @@
+"""Added task full text search
+
+Revision ID: 43c9cb813654
+Revises: 174df43b5a0d
+Create Date: 2026-10-18 13:07:44.492092
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '43c9cb813654'
+down_revision: Union[str, Sequence[str], None] = '174df43b5a0d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Вектор задачи по названию и описанию, см. TASK_SEARCH_VECTOR_FUNCTION в app/models/task_model.py
+TASK_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_search_vector(name text, description text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple'::regconfig, $1), 'A') ||
+           setweight(to_tsvector('simple'::regconfig, $2), 'B')
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+TASK_SET_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_set_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := task_search_vector(NEW.name, NEW.description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER task_search_vector BEFORE INSERT OR UPDATE OF name, description ON task
+FOR EACH ROW EXECUTE FUNCTION task_set_search_vector()
+"""
+
+# Заполнение вектора у существующих задач пачками по первичному ключу
+TASK_SEARCH_VECTOR_BACKFILL = """
+UPDATE task SET search_vector = task_search_vector(name, description)
+WHERE id IN (
+    SELECT id FROM task WHERE id > :after ORDER BY id LIMIT :batch_size
+)
+RETURNING id
+"""
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """
+    Upgrade schema.
+    Без перезаписи таблицы и без долгих блокировок записи в task: колонка
+    добавляется пустой (ACCESS EXCLUSIVE только на изменение каталога), новые
+    и изменённые задачи заполняет триггер, существующие - пачки UPDATE в своих
+    транзакциях, GIN индекс строится CONCURRENTLY, а NOT NULL ставится по
+    заранее проверенному CHECK без повторного сканирования таблицы.
+    """
+    op.add_column('task', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(TASK_SEARCH_VECTOR_FUNCTION)
+    op.execute(TASK_SET_SEARCH_VECTOR_FUNCTION)
+    op.execute(TASK_SEARCH_VECTOR_TRIGGER)
+
+    # CONCURRENTLY и пачки в отдельных транзакциях не работают внутри транзакции миграции
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        after = uuid.UUID(int=0)
+        while True:
+            ids = connection.execute(
+                sa.text(TASK_SEARCH_VECTOR_BACKFILL),
+                {'after': after, 'batch_size': BACKFILL_BATCH_SIZE},
+            ).scalars().all()
+            if not ids:
+                break
+            after = max(ids)
+
+        op.create_index(
+            'ix_task_search_vector', 'task', ['search_vector'],
+            unique=False, postgresql_using='gin', postgresql_concurrently=True,
+        )
+        # VALIDATE сканирует таблицу, не блокируя запись, а SET NOT NULL
+        # при проверенном CHECK обходится без сканирования
+        op.execute(
+            'ALTER TABLE task ADD CONSTRAINT task_search_vector_not_null '
+            'CHECK (search_vector IS NOT NULL) NOT VALID'
+        )
+        op.execute('ALTER TABLE task VALIDATE CONSTRAINT task_search_vector_not_null')
+        op.alter_column('task', 'search_vector', nullable=False)
+        op.drop_constraint('task_search_vector_not_null', 'task', type_='check')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_task_search_vector', table_name='task',
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+    op.execute('DROP TRIGGER task_search_vector ON task')
+    op.drop_column('task', 'search_vector')
+    op.execute('DROP FUNCTION task_set_search_vector()')
+    op.execute('DROP FUNCTION task_search_vector(text, text)')
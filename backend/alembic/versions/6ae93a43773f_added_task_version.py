@@ -0,0 +1,28 @@
+"""Added task version
+
+Revision ID: 6ae93a43773f
+Revises: 43c9cb813654
+Create Date: 2026-10-18 13:09:15.274457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6ae93a43773f'
+down_revision: Union[str, Sequence[str], None] = '43c9cb813654'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('task', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('task', 'version')
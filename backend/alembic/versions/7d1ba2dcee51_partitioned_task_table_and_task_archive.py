@@ -0,0 +1,219 @@
+"""Partitioned task table and task archive
+
+Все задачи копируются в новую таблицу одним INSERT ... SELECT в транзакции
+миграции, старая таблица всё это время заблокирована (ACCESS EXCLUSIVE).
+На больших таблицах миграцию нужно запускать в окно обслуживания,
+когда приложение остановлено.
+
+Revision ID: 7d1ba2dcee51
+Revises: 87794c915090
+Create Date: 2026-10-18 13:24:06.830816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1ba2dcee51'
+down_revision: Union[str, Sequence[str], None] = '87794c915090'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_COLUMNS = (
+    'id, created_at, updated_at, name, description, status, search_vector, version, deleted_at, change_xid'
+)
+TASK_ARCHIVE_COLUMNS = 'id, created_at, updated_at, name, description, status, version'
+
+TASK_INDEXES = [
+    ('ix_task_created_at_id', ['created_at', 'id'], {}),
+    ('ix_task_updated_at', ['updated_at'], {}),
+    ('ix_task_status_updated_at', ['status', 'updated_at'], {}),
+    ('ix_task_status_created_at_id', ['status', 'created_at', 'id'], {}),
+    ('ix_task_search_vector', ['search_vector'], {'postgresql_using': 'gin'}),
+    ('ix_task_change_xid_id', ['change_xid', 'id'], {}),
+    ('ix_task_deleted_at', ['deleted_at'], {'postgresql_where': sa.text('deleted_at IS NOT NULL')}),
+]
+
+TASK_TRIGGERS = [
+    """
+    CREATE TRIGGER task_search_vector BEFORE INSERT OR UPDATE OF name, description ON task
+    FOR EACH ROW EXECUTE FUNCTION task_set_search_vector()
+    """,
+    """
+    CREATE TRIGGER task_change_xid BEFORE UPDATE ON task
+    FOR EACH ROW EXECUTE FUNCTION task_set_change_xid()
+    """,
+    """
+    CREATE TRIGGER task_status_counter_insert AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+    """
+    CREATE TRIGGER task_status_counter_update AFTER UPDATE ON task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+    """
+    CREATE TRIGGER task_status_counter_delete AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+    """
+    CREATE TRIGGER task_notify_insert AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+    """
+    CREATE TRIGGER task_notify_update AFTER UPDATE ON task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+    """
+    CREATE TRIGGER task_notify_delete AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+]
+
+TASK_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_create_partitions(start_at timestamp, months integer)
+RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', start_at);
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Секции могут одновременно создавать несколько процессов приложения
+    PERFORM pg_advisory_xact_lock(hashtext('task_create_partitions'));
+    FOR n IN 1 .. months LOOP
+        partition_name := 'task_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF task FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+                created := created + 1;
+            EXCEPTION WHEN check_violation THEN
+                RAISE WARNING 'task partition % not created: %', partition_name, SQLERRM;
+            END;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_STATUS_COUNTER_REBUILD = """
+INSERT INTO task_status_counter (status, count)
+SELECT s.status, (
+    SELECT count(*) FROM task WHERE task.status = s.status AND task.deleted_at IS NULL
+)
+FROM unnest(enum_range(NULL::task_status_type)) AS s(status)
+ON CONFLICT (status) DO UPDATE
+SET count = EXCLUDED.count, generation = task_status_counter.generation + 1
+"""
+
+
+def create_task_table(partitioned: bool):
+    op.create_table(
+        'task',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column(
+            'status',
+            postgresql.ENUM(name='task_status_type', create_type=False),
+            nullable=False,
+        ),
+        sa.Column('search_vector', postgresql.TSVECTOR(), nullable=False),
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column(
+            'change_xid', sa.BigInteger(),
+            server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=False,
+        ),
+        sa.PrimaryKeyConstraint(*(['id', 'created_at'] if partitioned else ['id']), name='task_pkey'),
+        **({'postgresql_partition_by': 'RANGE (created_at)'} if partitioned else {}),
+    )
+
+
+def create_task_indexes():
+    for name, columns, kw in TASK_INDEXES:
+        op.create_index(name, 'task', columns, unique=False, **kw)
+
+
+def rename_task_table(new_name: str):
+    """Освобождает имена таблицы, первичного ключа и индексов для новой task"""
+    op.rename_table('task', new_name)
+    op.execute(f'ALTER TABLE {new_name} RENAME CONSTRAINT task_pkey TO {new_name}_pkey')
+    for name, _, _ in TASK_INDEXES:
+        op.drop_index(name, table_name=new_name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Обычную таблицу нельзя сделать секционированной: создаём новую task
+    # и копируем в неё задачи. Индексы и триггеры создаются после копирования:
+    # строки не обновляют индексы по одной, счётчики task_status_counter не меняются.
+    rename_task_table('task_unpartitioned')
+    create_task_table(partitioned=True)
+
+    op.execute(TASK_PARTITIONS_FUNCTION)
+    op.execute('CREATE TABLE task_default PARTITION OF task DEFAULT')
+    op.execute("""
+        SELECT task_create_partitions(month, 1)
+        FROM (SELECT DISTINCT date_trunc('month', created_at) AS month FROM task_unpartitioned) months
+    """)
+    op.execute('SELECT task_create_partitions(now()::timestamp, 4)')
+
+    op.execute(f'INSERT INTO task ({TASK_COLUMNS}) SELECT {TASK_COLUMNS} FROM task_unpartitioned')
+    op.drop_table('task_unpartitioned')
+    create_task_indexes()
+    for trigger in TASK_TRIGGERS:
+        op.execute(trigger)
+
+    op.create_table(
+        'task_archive',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column(
+            'status',
+            postgresql.ENUM(name='task_status_type', create_type=False),
+            nullable=False,
+        ),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Задачи из архива возвращаются в task
+    rename_task_table('task_partitioned')
+    create_task_table(partitioned=False)
+    op.execute(f'INSERT INTO task ({TASK_COLUMNS}) SELECT {TASK_COLUMNS} FROM task_partitioned')
+    # Триггеры ещё не созданы, поисковый вектор считается здесь
+    op.execute(
+        f'INSERT INTO task ({TASK_ARCHIVE_COLUMNS}, search_vector) '
+        f'SELECT {TASK_ARCHIVE_COLUMNS}, task_search_vector(name, description) FROM task_archive'
+    )
+    op.drop_table('task_partitioned')
+    op.drop_table('task_archive')
+    op.execute('DROP FUNCTION task_create_partitions(timestamp, integer)')
+    create_task_indexes()
+    for trigger in TASK_TRIGGERS:
+        op.execute(trigger)
+    op.execute(TASK_STATUS_COUNTER_REBUILD)
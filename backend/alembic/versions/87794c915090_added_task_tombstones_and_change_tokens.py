@@ -0,0 +1,213 @@
+"""Added task tombstones and change tokens
+
+Revision ID: 87794c915090
+Revises: e6077a604dc8
+Create Date: 2026-10-18 13:21:12.556281
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '87794c915090'
+down_revision: Union[str, Sequence[str], None] = 'e6077a604dc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_CHANGE_XID_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_set_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) FILTER (WHERE deleted_at IS NULL) AS delta
+            FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) FILTER (WHERE deleted_at IS NULL) AS delta
+            FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count - r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSE
+        -- Любое изменение задачи меняет поколение её старого и нового статуса.
+        -- Строка с deleted_at (tombstone) не считается: пометка удалённой
+        -- уменьшает счётчик так же, как DELETE
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT status, CASE WHEN deleted_at IS NULL THEN 1 ELSE 0 END AS delta
+                FROM new_rows
+                UNION ALL
+                SELECT status, CASE WHEN deleted_at IS NULL THEN -1 ELSE 0 END AS delta
+                FROM old_rows
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) AS delta FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count - r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSE
+        -- Любое изменение задачи меняет поколение её старого и нового статуса
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT n.status, CASE WHEN o.status <> n.status THEN 1 ELSE 0 END AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                UNION ALL
+                SELECT o.status, CASE WHEN o.status <> n.status THEN -1 ELSE 0 END AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Удаление tombstone клиентам уже не интересно
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'deleted', 'id', o.id, 'status', o.status, 'version', o.version
+        )::text) FROM old_rows o WHERE o.deleted_at IS NULL;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN n.deleted_at IS NULL THEN 'updated' ELSE 'deleted' END,
+            'id', n.id, 'status', n.status, 'old_status', o.status, 'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'deleted', 'id', o.id, 'status', o.status, 'version', o.version
+        )::text) FROM old_rows o;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'updated', 'id', n.id, 'status', n.status, 'old_status', o.status,
+            'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный default не переписывает таблицу. Существующие задачи получают
+    # change_xid = 0 и попадут в первую же синхронизацию
+    op.add_column('task', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('task', sa.Column('change_xid', sa.BigInteger(), nullable=False, server_default='0'))
+    op.alter_column('task', 'change_xid', server_default=sa.text('pg_current_xact_id()::text::bigint'))
+    op.execute(TASK_CHANGE_XID_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER task_change_xid BEFORE UPDATE ON task
+        FOR EACH ROW EXECUTE FUNCTION task_set_change_xid()
+    """)
+    op.execute(TASK_STATUS_COUNTER_FUNCTION)
+    op.execute(TASK_NOTIFY_FUNCTION)
+
+    # CONCURRENTLY не блокирует запись в task, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_change_xid_id', 'task', ['change_xid', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_task_deleted_at', 'task', ['deleted_at'],
+            unique=False, postgresql_concurrently=True,
+            postgresql_where=sa.text('deleted_at IS NOT NULL'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_task_deleted_at', table_name='task', postgresql_concurrently=True)
+        op.drop_index('ix_task_change_xid_id', table_name='task', postgresql_concurrently=True)
+
+    # tombstone уже не учтены в счётчиках, поэтому удаляются до возврата старых триггеров
+    op.execute('DELETE FROM task WHERE deleted_at IS NOT NULL')
+    op.execute(PREVIOUS_TASK_NOTIFY_FUNCTION)
+    op.execute(PREVIOUS_TASK_STATUS_COUNTER_FUNCTION)
+    op.execute('DROP TRIGGER task_change_xid ON task')
+    op.execute('DROP FUNCTION task_set_change_xid()')
+    op.drop_column('task', 'change_xid')
+    op.drop_column('task', 'deleted_at')
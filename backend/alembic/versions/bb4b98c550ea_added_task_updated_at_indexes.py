@@ -0,0 +1,30 @@
+"""Added task updated_at indexes
+
+Revision ID: bb4b98c550ea
+Revises: 209f1c84d441
+Create Date: 2026-10-18 13:02:52.552847
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb4b98c550ea'
+down_revision: Union[str, Sequence[str], None] = '209f1c84d441'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_task_updated_at', 'task', ['updated_at'], unique=False)
+    op.create_index('ix_task_status_updated_at', 'task', ['status', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_status_updated_at', table_name='task')
+    op.drop_index('ix_task_updated_at', table_name='task')
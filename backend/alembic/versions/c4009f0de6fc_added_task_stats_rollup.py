@@ -0,0 +1,47 @@
+"""Added task stats rollup
+
+Revision ID: c4009f0de6fc
+Revises: 2e8c8e57647a
+Create Date: 2026-10-18 13:29:38.941369
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4009f0de6fc'
+down_revision: Union[str, Sequence[str], None] = '2e8c8e57647a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_stats_hourly',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column(
+            'status',
+            postgresql.ENUM(name='task_status_type', create_type=False),
+            nullable=False,
+        ),
+        sa.Column('entered', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('created', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'status'),
+    )
+    op.create_table(
+        'task_stats_watermark',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('processed_until', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_stats_watermark')
+    op.drop_table('task_stats_hourly')
@@ -0,0 +1,69 @@
+"""Added task change notifications
+
+Revision ID: e6077a604dc8
+Revises: fcc814ad5494
+Create Date: 2026-10-18 13:17:16.466872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6077a604dc8'
+down_revision: Union[str, Sequence[str], None] = 'fcc814ad5494'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'deleted', 'id', o.id, 'status', o.status, 'version', o.version
+        )::text) FROM old_rows o;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'updated', 'id', n.id, 'status', n.status, 'old_status', o.status,
+            'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(TASK_NOTIFY_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER task_notify_insert AFTER INSERT ON task
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER task_notify_update AFTER UPDATE ON task
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER task_notify_delete AFTER DELETE ON task
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER task_notify_delete ON task')
+    op.execute('DROP TRIGGER task_notify_update ON task')
+    op.execute('DROP TRIGGER task_notify_insert ON task')
+    op.execute('DROP FUNCTION task_notify_changes()')
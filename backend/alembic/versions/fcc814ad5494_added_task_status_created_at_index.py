@@ -0,0 +1,37 @@
+"""Added task status created_at index
+
+Revision ID: fcc814ad5494
+Revises: 6ae93a43773f
+Create Date: 2026-10-18 13:15:31.897498
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fcc814ad5494'
+down_revision: Union[str, Sequence[str], None] = '6ae93a43773f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в task, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_status_created_at_id', 'task', ['status', 'created_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_task_status_created_at_id', table_name='task',
+            postgresql_concurrently=True,
+        )
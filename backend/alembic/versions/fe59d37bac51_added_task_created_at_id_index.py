@@ -0,0 +1,28 @@
+"""Added task created_at id index
+
+Revision ID: fe59d37bac51
+Revises: 3dbfe83b1eaf
+Create Date: 2026-10-18 12:55:28.756325
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fe59d37bac51'
+down_revision: Union[str, Sequence[str], None] = '3dbfe83b1eaf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_task_created_at_id', 'task', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_created_at_id', table_name='task')
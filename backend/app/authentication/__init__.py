@@ -1,4 +1,7 @@
-from .jwt_backend import JWTAuthenticationBackend
+from .jwt_backend import JWTAuthenticationBackend, jwt_backend, user_claims_cache
 from .authentication_manager import AuthenticationManager, auth_manager
 from .get_current_user import authenticate_user
-from .password_utils import verify_password, get_password_hash
+from .password_utils import (
+    verify_password, get_password_hash,
+    password_hasher, PasswordHasherOverloaded,
+)
@@ -6,6 +6,7 @@ from fastapi import HTTPException, status
 from app.models import UserModel
 from app.settings import JWT_SECRET_KEY, JWT_ALGORITHM
 from app.schemas import AuthSchema
+from .password_utils import PasswordHasherOverloaded
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -28,7 +29,14 @@ class AuthenticationManager():
 
     async def authenticate_user(self, data: AuthSchema):
         user = await UserModel.get_by_username(username=data.username)
-        if not user.check_password(password=data.password):
+        try:
+            password_valid = user is not None and await user.check_password(password=data.password)
+        except PasswordHasherOverloaded:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Сервер перегружен, повторите попытку позже",
+                                headers={"Retry-After": "1"},
+                                )
+        if not password_valid:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Не правильно набраны логин или пароль",
                                 headers={"WWW-Authenticate": "Bearer"},
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import time
+from typing import NamedTuple
 from uuid import UUID
 from jose import JWTError, jwt
 from fastapi import Request
@@ -6,15 +9,32 @@ from starlette.authentication import (
     AuthenticationBackend, AuthenticationError, SimpleUser, AuthCredentials
 )
 
+from app.cache import TTLCache
 from app.models import UserModel
+from app.settings import (
+    JWT_SECRET_KEY, JWT_ALGORITHM,
+    AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL,
+    AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL,
+    AUTH_MAX_CONCURRENT_USER_LOOKUPS,
+)
 
 
 logger = logging.getLogger('uvicorn.error')
 
 
+class UserClaims(NamedTuple):
+    id: UUID | None
+    exists: bool
+    admin: bool
+
+
+# Кэш данных пользователей по username. Сбрасывается событиями UserModel,
+# см. app/models/user_model.py
+user_claims_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
+
+
 class JWTUser(SimpleUser):
     def __init__(self, username: str,  id: UUID, admin: bool = False,):
-        logger.info('JWTUser')
         super().__init__(username)
         self.admin = admin
         self.id = id
@@ -26,14 +46,57 @@ class JWTUser(SimpleUser):
 
 class JWTAuthenticationBackend(AuthenticationBackend):
 
-    def __init__(self, secret: str, algorithm: str):
-        logger.info('JWTAuthenticationBackend.__init__')
+    def __init__(
+        self,
+        secret: str,
+        algorithm: str,
+        user_cache: TTLCache = user_claims_cache,
+        max_concurrent_lookups: int = AUTH_MAX_CONCURRENT_USER_LOOKUPS,
+    ):
         self.secret = secret
         self.algorithm = algorithm
-
+        self.token_cache = TTLCache(maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=AUTH_TOKEN_CACHE_TTL)
+        self.user_cache = user_cache
+        # Ограничение на количество одновременных запросов к базе при промахах кэша
+        self._lookup_semaphore = asyncio.Semaphore(max_concurrent_lookups)
+        self._lookups: dict[str, asyncio.Future] = {}
+
+    def decode_token(self, token: str) -> dict:
+        """jwt.decode с кэшем: проверка подписи не повторяется для одного и того же токена"""
+        payload = self.token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            ttl = None
+            if 'exp' in payload:
+                ttl = payload['exp'] - time.time()
+            # Запись не переживёт срок действия токена
+            self.token_cache.set(token, payload, ttl=ttl)
+        return payload
+
+    async def get_user_claims(self, username: str) -> UserClaims:
+        claims = self.user_cache.get(username)
+        if claims is not None:
+            return claims
+
+        # Одновременные промахи по одному username ждут один запрос к базе
+        lookup = self._lookups.get(username)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._load_user_claims(username))
+            self._lookups[username] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(username, None))
+        return await asyncio.shield(lookup)
+
+    async def _load_user_claims(self, username: str) -> UserClaims:
+        async with self._lookup_semaphore:
+            user = await UserModel.get_by_username(username)
+        if user:
+            claims = UserClaims(id=user.id, exists=True, admin=bool(user.admin))
+        else:
+            claims = UserClaims(id=None, exists=False, admin=False)
+        self.user_cache.set(username, claims)
+        return claims
 
     async def authenticate(self, request: Request):
-        logger.info('JWTAuthenticationBackend.authenticate')
         if "Authorization" not in request.headers:
             return None
 
@@ -44,18 +107,27 @@ class JWTAuthenticationBackend(AuthenticationBackend):
                 return None
 
             # Decode JWT token
-            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
-            logger.info('payload')
-            logger.info(payload)
+            payload = self.decode_token(token)
             username = payload.get("username")
-            is_admin = payload.get("admin", False)
             _id = payload.get("id", False)
 
-            if username and UserModel.get_by_username(username):
-                return AuthCredentials([]), JWTUser(username, _id, is_admin)
+            if username:
+                claims = await self.get_user_claims(username)
+                if claims.exists and str(claims.id) == str(_id):
+                    return AuthCredentials([]), JWTUser(username, _id, claims.admin)
+            logger.debug('JWT токен не соответствует пользователю', extra={'username': username})
 
-        except (ValueError, JWTError):
-            pass
+        except (ValueError, JWTError) as e:
+            logger.debug('Не верный JWT токен: %s', type(e).__name__)
 
         raise AuthenticationError("Invalid token")
 
+    def stats(self) -> dict:
+        return {
+            'token_cache': self.token_cache.stats(),
+            'user_cache': self.user_cache.stats(),
+            'user_lookups_in_flight': len(self._lookups),
+        }
+
+
+jwt_backend = JWTAuthenticationBackend(JWT_SECRET_KEY, JWT_ALGORITHM)
@@ -1,5 +1,11 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+from app.settings import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -10,3 +16,93 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+class PasswordHasherOverloaded(Exception):
+    """Очередь на хэширование паролей заполнена"""
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в пуле потоков, чтобы не блокировать event loop.
+    Количество ожидающих и выполняющихся операций ограничено max_pending:
+    при переполнении сразу бросается PasswordHasherOverloaded.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='password-hasher',
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherOverloaded()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        submitted = time.perf_counter()
+
+        def _call():
+            return time.perf_counter(), func(*args)
+
+        def _done(_):
+            # Поток продолжает хэширование и после отмены ожидающего запроса,
+            # поэтому операция освобождает место только по его завершении
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # event loop уже закрыт
+                pass
+
+        future = self.executor.submit(_call)
+        future.add_done_callback(_done)
+        started, result = await asyncio.wrap_future(future)
+        self.completed += 1
+        waited = started - submitted
+        self.queue_time_total += waited
+        if waited > self.queue_time_max:
+            self.queue_time_max = waited
+        return result
+
+    def _release(self):
+        self.pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'queue_time_avg': self.queue_time_total / self.completed if self.completed else 0.0,
+            'queue_time_max': self.queue_time_max,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+)
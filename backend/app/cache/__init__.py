@@ -0,0 +1,7 @@
+from .ttl_cache import TTLCache
+from .backends import (
+    CacheBackend, NullCacheBackend, LocalCacheBackend, RedisCacheBackend,
+    create_cache_backend,
+)
+from .task_cache import TaskCache, task_cache
+from .task_list_cache import TaskListCache, task_list_cache
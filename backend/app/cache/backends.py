@@ -0,0 +1,86 @@
+from app.settings import REDIS_URL
+from .ttl_cache import TTLCache
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+
+class CacheBackend:
+    """Интерфейс хранилища кэша: значения - байты, ключи - строки"""
+
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class NullCacheBackend(CacheBackend):
+    """Кэш выключен"""
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+
+class LocalCacheBackend(CacheBackend):
+    """LRU кэш в памяти процесса"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        return {'size': stats['size'], 'maxsize': stats['maxsize'], 'evictions': stats['evictions']}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Общий для всех процессов кэш в redis"""
+
+    def __init__(self, url: str = REDIS_URL):
+        if redis is None:
+            raise RuntimeError('Для кэша в redis нужно установить пакет redis')
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+
+def create_cache_backend(name: str, maxsize: int, ttl: float) -> CacheBackend:
+    if name == 'local':
+        return LocalCacheBackend(maxsize=maxsize, ttl=ttl)
+    if name == 'redis':
+        return RedisCacheBackend()
+    if name == 'none':
+        return NullCacheBackend()
+    raise ValueError(f'Неизвестный backend кэша: {name}')
@@ -0,0 +1,77 @@
+import logging
+from uuid import UUID
+
+from pydantic import ValidationError
+
+from app.schemas import TaskOutSchema, task_out_adapter
+from app.settings import TASK_CACHE_BACKEND, TASK_CACHE_SIZE, TASK_CACHE_TTL
+from .backends import CacheBackend, create_cache_backend
+
+
+logger = logging.getLogger('uvicorn.error')
+
+class TaskCache:
+    """
+    Read-through кэш задач по id. Хранит TaskOutSchema в виде JSON,
+    поэтому одинаково работает с локальным и общим хранилищем.
+    Ошибки хранилища не прерывают запрос: чтение считается промахом.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(task_id: UUID | str) -> str:
+        return f'task:{task_id}'
+
+    async def get(self, task_id: UUID | str) -> TaskOutSchema | None:
+        try:
+            value = await self.backend.get(self._key(task_id))
+        except Exception as e:
+            logger.warning(f'Ошибка чтения из кэша задач: {e}')
+            value = None
+        if value is not None:
+            try:
+                task = task_out_adapter.validate_json(value)
+            except ValidationError:
+                # Запись в старом формате, например до добавления поля в TaskOutSchema
+                task = None
+            if task is not None:
+                self.hits += 1
+                return task
+        self.misses += 1
+        return None
+
+    async def set(self, *tasks):
+        try:
+            for task in tasks:
+                value = task_out_adapter.dump_json(
+                    task_out_adapter.validate_python(task, from_attributes=True)
+                )
+                await self.backend.set(self._key(task.id), value, self.ttl)
+        except Exception as e:
+            logger.warning(f'Ошибка записи в кэш задач: {e}')
+            await self.invalidate(*[_.id for _ in tasks])
+
+    async def invalidate(self, *task_ids: UUID | str):
+        try:
+            await self.backend.delete(*[self._key(_) for _ in task_ids])
+        except Exception as e:
+            logger.error(f'Ошибка инвалидации кэша задач: {e}')
+
+    def stats(self) -> dict:
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            **self.backend.stats(),
+        }
+
+
+task_cache = TaskCache(
+    backend=create_cache_backend(TASK_CACHE_BACKEND, maxsize=TASK_CACHE_SIZE, ttl=TASK_CACHE_TTL),
+    ttl=TASK_CACHE_TTL,
+)
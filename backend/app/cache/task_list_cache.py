@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from app.settings import TASK_LIST_CACHE_MAX_BYTES, TASK_LIST_CACHE_MAX_ENTRIES
+
+
+class TaskListCache:
+    """
+    LRU кэш готовых тел ответов GET /tasks, ограниченный суммарным размером в байтах.
+    Ключ - ETag страницы, в который входят параметры запроса и поколения счётчиков
+    task_status_counter. Любая запись в task меняет поколение, поэтому устаревшие
+    страницы больше не запрашиваются и вытесняются из кэша без всякого TTL.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, bytes] = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> bytes | None:
+        body = self._data.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        previous = self._data.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= len(previous)
+        self._data[key] = body
+        self.size_bytes += len(body)
+        while self.size_bytes > self.max_bytes or len(self._data) > self.max_entries:
+            _, evicted = self._data.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._data),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+task_list_cache = TaskListCache(
+    max_bytes=TASK_LIST_CACHE_MAX_BYTES, max_entries=TASK_LIST_CACHE_MAX_ENTRIES,
+)
@@ -1,6 +1,9 @@
 from .session import session_manager
-from .transaction import db_session, db_transaction
+from .transaction import db_session, db_read_session, db_transaction
 from .base import Base
+from .buffered_insert import BufferedInsert
+from .advisory_lock import advisory_lock, STARTUP_LOCK
 
-__all__ = ["Base", "session_manager", "db_session", "db_transaction"]
+__all__ = ["Base", "session_manager", "db_session", "db_read_session", "db_transaction", "BufferedInsert",
+           "advisory_lock", "STARTUP_LOCK"]
 
@@ -0,0 +1,30 @@
+import time
+from contextlib import asynccontextmanager
+
+import sqlalchemy as sa
+
+from .transaction import db_session
+
+
+# Общая блокировка шагов старта для всех процессов приложения и миграций alembic
+STARTUP_LOCK = 'task_tracker_startup'
+
+ADVISORY_LOCK = 'SELECT pg_advisory_lock(hashtext(:name))'
+ADVISORY_UNLOCK = 'SELECT pg_advisory_unlock(hashtext(:name))'
+
+
+@asynccontextmanager
+async def advisory_lock(name: str):
+    """
+    Сессионная advisory блокировка Postgres на отдельном соединении.
+    Процессы с тем же name ждут, пока блокировку не отпустят; если соединение
+    оборвётся, Postgres отпустит её сам. Возвращает время ожидания в секундах.
+    """
+    async with db_session() as session:
+        started = time.perf_counter()
+        await session.execute(sa.text(ADVISORY_LOCK), {'name': name})
+        waited = time.perf_counter() - started
+        try:
+            yield waited
+        finally:
+            await session.execute(sa.text(ADVISORY_UNLOCK), {'name': name})
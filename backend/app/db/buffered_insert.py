@@ -0,0 +1,137 @@
+import asyncio
+import logging
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError, DataError
+
+from .transaction import db_session
+
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class BufferedInsert:
+    """
+    Буфер строк таблицы, которые записываются в базу фоновой задачей
+    многострочными INSERT: раз в flush_interval секунд или сразу, как только
+    накопилось max_rows строк. Добавивший строки запрос не ждёт записи.
+    Строки из буфера теряются при падении процесса. Пока база недоступна,
+    буфер растёт до max_pending строк, затем отбрасываются самые старые.
+    Строки, которые база отвергает из-за данных (ограничения, неверные значения),
+    не повторяются: пачка с такой строкой пишется по одной строке, ошибочные
+    отбрасываются и пишутся в лог.
+    """
+
+    def __init__(self, table: sa.Table, flush_interval: float, max_rows: int, max_pending: int):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self._rows: list[dict] = []
+        self._in_flight: list[dict] = []
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def pending(self) -> list[dict]:
+        """Строки, которые ещё не записаны в базу, в том числе записываемые сейчас"""
+        return self._in_flight + self._rows
+
+    def add(self, *rows: dict):
+        self._rows.extend(rows)
+        self._trim()
+        if len(self._rows) >= self.max_rows:
+            self._full.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f'buffered_insert_{self.table.name}')
+
+    async def stop(self):
+        """Останавливает фоновую задачу и записывает оставшиеся строки"""
+        if self._task is not None:
+            # Задачу не отменяем: отмена посреди flush потеряла бы записываемую пачку
+            self._stopping = True
+            self._full.set()
+            try:
+                await self._task
+            finally:
+                self._task = None
+                self._stopping = False
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Записывает накопленные строки пачками по max_rows, возвращает количество записанных"""
+        async with self._flush_lock:
+            rows, self._rows = self._rows, []
+            self._in_flight = rows
+            done = written = 0
+            # Строки rows[:single_until] пишутся по одной
+            single_until = 0
+            try:
+                async with db_session() as session:
+                    while done < len(rows):
+                        size = 1 if done < single_until else self.max_rows
+                        batch = rows[done:done + size]
+                        try:
+                            await session.execute(sa.insert(self.table), batch)
+                            written += len(batch)
+                        except (IntegrityError, DataError) as e:
+                            # Повтор не поможет: ищем ошибочные строки, остальные записываем
+                            await session.rollback()
+                            if len(batch) > 1:
+                                single_until = done + len(batch)
+                                continue
+                            self.rejected += 1
+                            logger.error(f'Строка отброшена при записи в {self.table.name}: {e}')
+                        done += len(batch)
+            except Exception as e:
+                # Незаписанные строки возвращаются в начало буфера до следующей попытки.
+                # Соединение в режиме AUTOCOMMIT, записанные пачки уже сохранены
+                self.errors += 1
+                self._rows = rows[done:] + self._rows
+                self._trim()
+                logger.error(f'Ошибка записи в {self.table.name}: {e}')
+            except BaseException:
+                # При отмене незаписанные строки тоже возвращаются в буфер
+                self._rows = rows[done:] + self._rows
+                self._trim()
+                raise
+            finally:
+                self._in_flight = []
+            if written:
+                self.flushes += 1
+                self.written += written
+            return written
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._rows),
+            'written': self.written,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'flushes': self.flushes,
+            'errors': self.errors,
+        }
+
+    def _trim(self):
+        overflow = len(self._rows) - self.max_pending
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
@@ -1,35 +1,125 @@
+import asyncio
+import itertools
 import logging
 from contextvars import ContextVar
+from fastapi import Request, Response
+from sqlalchemy import event, text
 from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
     AsyncSession
 )
+from app.settings import (
+    DATABASE_ECHO, DATABASE_POOL_ENABLED, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT, DATABASE_POOL_RECYCLE, DATABASE_POOL_PRE_PING,
+    DATABASE_REPLICA_URLS, DATABASE_REPLICA_MAX_LAG, DATABASE_STICKY_WINDOW,
+)
+from app.metrics import before_cursor_execute, after_cursor_execute, handle_error
 from .base import Base
+from .pool import InstrumentedQueuePool
 
 logger = logging.getLogger('uvicorn.error')
 db_session_context = ContextVar('db_session')
 
+# Заголовок запроса, с которым GET читает из основной базы
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+# Cookie, которую получает клиент после записи: пока она жива, его чтения идут
+# в основную базу и он видит свои изменения, даже если реплика отстаёт
+READ_PRIMARY_COOKIE = 'read_primary'
+
+# Отставание реплики в секундах. Если реплика получила весь WAL и применила его,
+# отставания нет, даже если записей давно не было
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class Replica:
+    """Реплика для чтения: engine, фабрика сессий и последнее измеренное отставание"""
+
+    def __init__(self, engine, sessionmaker):
+        self.engine = engine
+        self.sessionmaker = sessionmaker
+        # None - отставание неизвестно или реплика недоступна
+        self.lag: float | None = None
+        self.reads = 0
+
+    def stats(self) -> dict:
+        return {
+            'host': self.engine.url.host,
+            'lag': self.lag,
+            'reads': self.reads,
+        }
+
 class DatabaseSessionManager:
     def __init__(self):
         self._engine = None
         self._sessionmaker = None
+        self._pooled = DATABASE_POOL_ENABLED
+        self._replicas: list[Replica] = []
+        self._replica_counter = itertools.count()
+        self.primary_reads = 0
         self.db_session_context = ContextVar('db_session')
 
-    async def init(self, url: str):
-        self._engine = create_async_engine(
+    async def init(
+        self,
+        url: str,
+        pooled: bool = DATABASE_POOL_ENABLED,
+        replica_urls: list[str] = DATABASE_REPLICA_URLS,
+    ):
+        self._pooled = pooled
+        self._engine, self._sessionmaker = self._create_engine(url)
+        for replica_url in replica_urls:
+            self.add_replica(replica_url)
+
+    def _create_engine(self, url: str):
+        if self._pooled:
+            pool_options = dict(
+                poolclass=InstrumentedQueuePool,
+                pool_size=DATABASE_POOL_SIZE,
+                max_overflow=DATABASE_MAX_OVERFLOW,
+                pool_timeout=DATABASE_POOL_TIMEOUT,
+                pool_recycle=DATABASE_POOL_RECYCLE,
+                pool_pre_ping=DATABASE_POOL_PRE_PING,
+            )
+        else:
+            pool_options = dict(poolclass=NullPool)
+        engine = create_async_engine(
             url,
-            poolclass=NullPool,
-            echo=True,
+            echo=DATABASE_ECHO,
             isolation_level="AUTOCOMMIT",
+            **pool_options,
         )
-        self._sessionmaker = async_sessionmaker(
-            bind=self._engine,
+        self._instrument(engine)
+        sessionmaker = async_sessionmaker(
+            bind=engine,
             expire_on_commit=False,
             class_=AsyncSession,
             future=True,
         )
+        return engine, sessionmaker
+
+    def add_replica(self, url: str) -> Replica:
+        replica = Replica(*self._create_engine(url))
+        self._replicas.append(replica)
+        return replica
+
+    async def close_replicas(self):
+        replicas, self._replicas = self._replicas, []
+        for replica in replicas:
+            await replica.engine.dispose()
+
+    @staticmethod
+    def _instrument(engine):
+        """Счётчики количества и времени SQL запросов для /metrics, см. app/metrics"""
+        event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(engine.sync_engine, 'handle_error', handle_error)
 
     async def connect(self):
         if self._sessionmaker is None:
@@ -37,6 +127,74 @@ class DatabaseSessionManager:
         async with self._sessionmaker() as session:
             self.db_session_context.set(session)
 
+    def read_sessionmaker(self, primary: bool = False):
+        """
+        Фабрика сессий для чтения: следующая по кругу реплика, отставание которой
+        не больше DATABASE_REPLICA_MAX_LAG, иначе основная база.
+        """
+        if not primary:
+            replicas = [
+                _ for _ in self._replicas
+                if _.lag is not None and _.lag <= DATABASE_REPLICA_MAX_LAG
+            ]
+            if replicas:
+                replica = replicas[next(self._replica_counter) % len(replicas)]
+                replica.reads += 1
+                return replica.sessionmaker
+        self.primary_reads += 1
+        return self._sessionmaker
+
+    async def connect_read(self, primary: bool = False):
+        if self._sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        async with self.read_sessionmaker(primary)() as session:
+            self.db_session_context.set(session)
+
+    async def check_replica_lag(self):
+        """Обновляет отставание всех реплик. Недоступная реплика получает lag = None"""
+        async def check(replica: Replica):
+            try:
+                async with replica.engine.connect() as conn:
+                    replica.lag = float(await conn.scalar(text(REPLICA_LAG_QUERY)))
+            except Exception as e:
+                if replica.lag is not None:
+                    logger.warning(f'Реплика {replica.engine.url.host} недоступна: {e}')
+                replica.lag = None
+
+        await asyncio.gather(*[check(_) for _ in self._replicas])
+
+    async def warmup(self, connections: int):
+        """Заранее открывает connections соединений, чтобы первые запросы не ждали подключения"""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        if not isinstance(self._engine.pool, InstrumentedQueuePool):
+            return
+        connections = min(connections, self._engine.pool.size())
+
+        opened = await asyncio.gather(
+            *[self._engine.connect().start() for _ in range(connections)],
+            return_exceptions=True,
+        )
+        for conn in opened:
+            if isinstance(conn, Exception):
+                logger.error(f'Не удалось заранее открыть соединение: {conn}')
+                continue
+            await conn.close()
+
+    def pool_stats(self) -> dict:
+        if self._engine is None:
+            return {}
+        pool = self._engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            return pool.stats()
+        return {'pool_class': type(pool).__name__}
+
+    def replica_stats(self) -> dict:
+        return {
+            'primary_reads': self.primary_reads,
+            'replicas': [_.stats() for _ in self._replicas],
+        }
+
     @property
     def session(self) -> AsyncSession:
         return self.db_session_context.get('db_session')
@@ -44,6 +202,7 @@ class DatabaseSessionManager:
     async def close(self):
         if self._engine is None:
             return
+        await self.close_replicas()
         await self._engine.dispose()
         self._engine = None
         self._sessionmaker = None
@@ -61,13 +220,40 @@ class DatabaseSessionManager:
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
 
-    async def activate_db_connection(self):
+    async def activate_db_connection(self, request: Request, response: Response):
+        """Сессия основной базы для запросов, которые пишут, и чтений, которым нужна основная база"""
+        if self._replicas and DATABASE_STICKY_WINDOW > 0 and request.method not in ('GET', 'HEAD'):
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, '1', max_age=DATABASE_STICKY_WINDOW, httponly=True,
+            )
         await self.connect()
         try:
             yield self.session
         except Exception as e:
             logger.error(f'Exception accured, while processing: {e}')
-            self.session.rollback()
+            await self.session.rollback()
+            raise
+        finally:
+            await self.session.close()
+
+    async def activate_read_db_connection(self, request: Request):
+        """
+        Сессия для GET запросов: реплика, если она есть и не отстаёт.
+        Основная база - если клиент недавно писал (cookie read_primary)
+        или передал заголовок X-Read-Primary. Тогда request.state.read_primary = True
+        и обработчик не должен отвечать из кэшей процесса.
+        """
+        primary = (
+            request.headers.get(READ_PRIMARY_HEADER, '').lower() in ('1', 'true')
+            or READ_PRIMARY_COOKIE in request.cookies
+        )
+        request.state.read_primary = primary
+        await self.connect_read(primary=primary)
+        try:
+            yield self.session
+        except Exception as e:
+            logger.error(f'Exception accured, while processing: {e}')
+            await self.session.rollback()
             raise
         finally:
             await self.session.close()
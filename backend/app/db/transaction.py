@@ -15,6 +15,19 @@ async def db_session():
         await session.close()
 
 
+@asynccontextmanager
+async def db_read_session(primary: bool = False):
+    """Session on a read replica, or on the primary if no replica is usable"""
+    session = session_manager.read_sessionmaker(primary)()
+    try:
+        yield session
+    except Exception as e:
+        await session.rollback()
+        raise e
+    finally:
+        await session.close()
+
+
 @asynccontextmanager
 async def db_transaction():
     """Provides a database session with automatic transaction handling"""
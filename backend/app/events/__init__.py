@@ -0,0 +1,6 @@
+from .broker import TaskEventBroker, Subscription, TooManySubscribers, task_event_broker
+from .listener import TaskEventListener, TASK_EVENTS_CHANNEL
+from .sse import sse_task_events, sse_message
+
+
+task_event_listener = TaskEventListener(task_event_broker)
@@ -0,0 +1,78 @@
+import asyncio
+
+from app.types import TaskStatusTypeEnum, TaskEventTypeEnum
+from app.settings import TASK_EVENTS_QUEUE_SIZE, TASK_EVENTS_MAX_SUBSCRIBERS
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """
+    Очередь событий одного подписчика. Очередь ограничена: если подписчик не успевает
+    читать, самые старые события отбрасываются, а dropped увеличивается.
+    """
+
+    def __init__(self, task_status: TaskStatusTypeEnum | None, maxsize: int):
+        self.task_status = task_status
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        if self.task_status is None or event['op'] == TaskEventTypeEnum.RESYNC:
+            return True
+        # Задача, которая ушла из статуса, тоже интересна подписчику этого статуса
+        return self.task_status in (event.get('status'), event.get('old_status'))
+
+    def put(self, event: dict) -> bool:
+        """Кладёт событие, при переполнении вытесняя самое старое. False - событие вытеснено"""
+        dropped = False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            dropped = True
+        self.queue.put_nowait(event)
+        return not dropped
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class TaskEventBroker:
+    """Раздаёт события об изменении задач всем подписчикам внутри процесса"""
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscriptions: set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, task_status: TaskStatusTypeEnum | None = None) -> Subscription:
+        if len(self._subscriptions) >= self.max_subscribers:
+            raise TooManySubscribers()
+        subscription = Subscription(task_status, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict):
+        self.published += 1
+        for subscription in self._subscriptions:
+            if subscription.matches(event) and not subscription.put(event):
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            'subscribers': len(self._subscriptions),
+            'published': self.published,
+            'dropped': self.dropped,
+        }
+
+
+task_event_broker = TaskEventBroker(
+    queue_size=TASK_EVENTS_QUEUE_SIZE, max_subscribers=TASK_EVENTS_MAX_SUBSCRIBERS,
+)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.types import TaskEventTypeEnum
+from app.settings import TASK_EVENTS_RECONNECT_DELAY
+from .broker import TaskEventBroker
+
+
+logger = logging.getLogger('uvicorn.error')
+
+# Канал, в который пишет триггер task_notify_changes, см. app/models/task_model.py
+TASK_EVENTS_CHANNEL = 'task_changes'
+
+
+class TaskEventListener:
+    """
+    Одно выделенное соединение asyncpg на процесс, которое слушает канал
+    task_changes и передаёт события в TaskEventBroker. Соединение не берётся
+    из пула SQLAlchemy: LISTEN должен жить всё время работы процесса.
+    После переподключения подписчики получают событие resync, так как
+    уведомления, пришедшие без соединения, потеряны.
+    """
+
+    def __init__(self, broker: TaskEventBroker, reconnect_delay: float = TASK_EVENTS_RECONNECT_DELAY):
+        self.broker = broker
+        self.reconnect_delay = reconnect_delay
+        self._task: asyncio.Task | None = None
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+
+    def start(self, url: str):
+        if self._task is None:
+            # asyncpg не понимает схему postgresql+asyncpg://
+            dsn = make_url(url).set(drivername='postgresql').render_as_string(hide_password=False)
+            self._task = asyncio.create_task(self._run(dsn), name='task_event_listener')
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.connected.clear()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f'Не верное уведомление в канале {channel}: {payload}')
+            return
+        self.broker.publish(event)
+
+    async def _run(self, dsn: str):
+        while True:
+            closed = asyncio.Event()
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(TASK_EVENTS_CHANNEL, self._on_notification)
+                if self.reconnects:
+                    self.broker.publish({'op': TaskEventTypeEnum.RESYNC})
+                self.connected.set()
+                await closed.wait()
+                logger.warning('Соединение для LISTEN task_changes закрыто')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка соединения для LISTEN task_changes: {e}')
+            finally:
+                self.connected.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self) -> dict:
+        return {'connected': self.connected.is_set(), 'reconnects': self.reconnects}
@@ -0,0 +1,30 @@
+import asyncio
+from typing import AsyncIterator
+
+import orjson
+
+from app.types import TaskEventTypeEnum
+from .broker import Subscription
+
+
+def sse_message(event: dict) -> bytes:
+    return b'event: ' + str(event['op']).encode() + b'\ndata: ' + orjson.dumps(event) + b'\n\n'
+
+
+async def sse_task_events(subscription: Subscription, ping_interval: float) -> AsyncIterator[bytes]:
+    """
+    События подписки в формате Server-Sent Events. Если подписчик отстал
+    и часть событий была отброшена, перед следующим событием отправляется resync.
+    """
+    yield b': connected\n\n'
+    dropped = subscription.dropped
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.get(), timeout=ping_interval)
+        except asyncio.TimeoutError:
+            yield b': ping\n\n'
+            continue
+        if subscription.dropped != dropped:
+            dropped = subscription.dropped
+            yield sse_message({'op': TaskEventTypeEnum.RESYNC, 'dropped': dropped})
+        yield sse_message(event)
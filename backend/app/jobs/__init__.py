@@ -0,0 +1 @@
+from .periodic_job import PeriodicJob
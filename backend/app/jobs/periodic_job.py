@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class PeriodicJob:
+    """Фоновая задача asyncio, которая вызывает func каждые interval секунд"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+            except Exception as e:
+                # Одна неудачная итерация не должна останавливать задачу
+                logger.error(f'Ошибка в фоновой задаче {self.name}: {e}')
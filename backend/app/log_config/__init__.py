@@ -0,0 +1,2 @@
+from .handlers import JsonFormatter, SamplingFilter, DroppingQueueHandler
+from .setup import setup_logging, stop_logging, logging_stats, parse_levels
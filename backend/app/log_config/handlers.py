@@ -0,0 +1,72 @@
+import logging
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from queue import Full
+
+import orjson
+
+
+# Атрибуты LogRecord, которые не считаются полями extra.
+# color_message - копия сообщения с ANSI цветами, которую добавляет uvicorn
+RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName', 'color_message'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись; поля из extra= попадают в объект как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS:
+                data[key] = value
+        return orjson.dumps(data, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю rate записей уровня level и ниже"""
+
+    def __init__(self, rate: float, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который никогда не блокирует вызывающий код:
+    если очередь заполнена, запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # В отличие от QueueHandler.prepare сообщение не форматируется здесь,
+        # чтобы JsonFormatter в фоновом потоке видел исходные поля записи
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
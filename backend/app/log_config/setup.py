@@ -0,0 +1,89 @@
+import atexit
+import logging
+import sys
+from logging.handlers import QueueListener
+from queue import Queue
+
+from app.settings import (
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE,
+)
+from .handlers import JsonFormatter, SamplingFilter, DroppingQueueHandler
+
+
+# Логгеры uvicorn пишут в свои обработчики; перенаправляем их в общую очередь
+UVICORN_LOGGERS = ('uvicorn', 'uvicorn.error', 'uvicorn.access')
+# SQLAlchemy пишет каждый SQL запрос и события пула на уровне INFO, если логгер
+# его пропускает. SQL по-прежнему можно включить через DATABASE_ECHO или LOG_LEVELS
+DEFAULT_LEVELS = {'sqlalchemy': 'WARNING'}
+
+_listener: QueueListener | None = None
+_queue_handler: DroppingQueueHandler | None = None
+
+
+def parse_levels(levels: str) -> dict[str, str]:
+    """'a=INFO,b.c=DEBUG' -> {'a': 'INFO', 'b.c': 'DEBUG'}"""
+    result = {}
+    for item in levels.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            result[name.strip()] = level.strip().upper()
+    return result
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+    debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE,
+    queue_size: int = LOG_QUEUE_SIZE,
+) -> DroppingQueueHandler:
+    """
+    Все записи проходят через DroppingQueueHandler на корневом логгере,
+    а в stderr их пишет QueueListener в отдельном потоке. Повторный вызов
+    заменяет предыдущую настройку.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        )
+
+    queue = Queue(maxsize=queue_size)
+    _queue_handler = DroppingQueueHandler(queue)
+    _queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+    _listener = QueueListener(queue, stream_handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    for name in UVICORN_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers.clear()
+        logger.propagate = True
+    for name, logger_level in {**DEFAULT_LEVELS, **parse_levels(levels)}.items():
+        logging.getLogger(name).setLevel(logger_level)
+    return _queue_handler
+
+
+def stop_logging():
+    """Дописывает записи из очереди и снимает обработчик с корневого логгера"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def logging_stats() -> dict:
+    return {'dropped': _queue_handler.dropped if _queue_handler else 0}
+
+
+atexit.register(stop_logging)
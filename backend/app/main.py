@@ -1,45 +1,91 @@
+import time
+# Начало импорта приложения в процессе: время импорта входит во время старта
+IMPORT_STARTED = time.perf_counter()
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.openapi.utils import get_openapi
 from starlette.middleware.authentication import AuthenticationMiddleware
 
 from app.db import session_manager
-from app.utils import init_admin
-from app.authentication import JWTAuthenticationBackend
+from app.models import task_status_history_writer
+from app.metrics import PrometheusMiddleware, register_db_pool_collector
+from app.utils import (
+    init_data, startup_finished, purge_task_tombstones, ensure_task_partitions,
+    archive_finished_tasks, rollup_task_stats,
+)
+from app.authentication import jwt_backend, password_hasher
 from app.settings import ( DATABASE_URL_FULL, APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD,
-    JWT_SECRET_KEY, JWT_ALGORITHM,
+    DATABASE_POOL_WARMUP, DATABASE_REPLICA_LAG_CHECK_INTERVAL, TASK_EVENTS_ENABLED,
+    TASK_TOMBSTONE_PURGE_INTERVAL, TASK_PARTITION_CHECK_INTERVAL, TASK_ARCHIVE_INTERVAL,
+    TASK_STATS_ROLLUP_INTERVAL,
 )
+from app.events import task_event_listener
+from app.jobs import PeriodicJob
 from app.routers import main_router
+from app.log_config import setup_logging
 
 
 import logging
 logger = logging.getLogger('uvicorn.error')
 
+# До создания приложения, чтобы заменить обработчики, настроенные uvicorn
+setup_logging()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    started = time.perf_counter()
     await session_manager.init(DATABASE_URL_FULL)
-    logger.info('SESSION_MANAGER')
-    logger.info('before')
-    logger.info(session_manager.db_session_context)
+    await session_manager.warmup(DATABASE_POOL_WARMUP)
     await session_manager.connect()
-    logger.info('after')
-    logger.info(session_manager.db_session_context)
-    await init_admin(APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD)
+    logger.info('Подключение к базе данных установлено')
+    # Несколько процессов uvicorn стартуют одновременно: админ и секции
+    # создаются под advisory блокировкой по очереди
+    lock_wait = await init_data(APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD)
+    # Пока отставание реплики не измерено, она не используется
+    await session_manager.check_replica_lag()
+    jobs = [
+        PeriodicJob('replica_lag', DATABASE_REPLICA_LAG_CHECK_INTERVAL, session_manager.check_replica_lag),
+        PeriodicJob('tombstone_purge', TASK_TOMBSTONE_PURGE_INTERVAL, purge_task_tombstones),
+        PeriodicJob('task_partitions', TASK_PARTITION_CHECK_INTERVAL, ensure_task_partitions),
+        PeriodicJob('task_archive', TASK_ARCHIVE_INTERVAL, archive_finished_tasks),
+        # Пересчитывает один процесс за раз, остальные пропускают итерацию
+        PeriodicJob('task_stats_rollup', TASK_STATS_ROLLUP_INTERVAL, rollup_task_stats),
+    ]
+    for job in jobs:
+        job.start()
+    task_status_history_writer.start()
+    if TASK_EVENTS_ENABLED:
+        task_event_listener.start(DATABASE_URL_FULL)
+    startup_finished(IMPORT_STARTED, started, lock_wait)
     yield
+    await task_event_listener.stop()
+    for job in jobs:
+        await job.stop()
+    # Записывает историю статусов, накопленную в памяти
+    await task_status_history_writer.stop()
     await session_manager.session.close()
     await session_manager.close()
+    password_hasher.shutdown()
+    # Очередь логов останавливается при выходе из процесса (atexit):
+    # uvicorn пишет сообщения о завершении уже после lifespan
 
 
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # middleware
 app.add_middleware(
     AuthenticationMiddleware,
-    backend=JWTAuthenticationBackend(JWT_SECRET_KEY, JWT_ALGORITHM)
+    backend=jwt_backend,
 )
+# Добавляется последним, чтобы замерять запрос целиком, включая аутентификацию
+app.add_middleware(PrometheusMiddleware)
+register_db_pool_collector(session_manager)
 
 
 # routers
@@ -69,7 +115,7 @@ def custom_openapi():
     }
 
     # Add security to protected paths
-    protected_paths = ['/who_am_i', '/tasks']
+    protected_paths = ['/who_am_i', '/tasks', '/stats']
     for path in openapi_schema["paths"]:
         if any(p in path for p in protected_paths):
             for method in openapi_schema["paths"][path]:
@@ -0,0 +1,6 @@
+from .registry import render_metrics, register_db_pool_collector
+from .request_stats import (
+    RequestDbStats, request_db_stats,
+    before_cursor_execute, after_cursor_execute, handle_error,
+)
+from .middleware import PrometheusMiddleware
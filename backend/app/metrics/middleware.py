@@ -0,0 +1,53 @@
+import time
+
+from .registry import (
+    http_requests_total, http_request_duration_seconds, http_requests_in_progress,
+    db_queries_per_request, db_time_per_request_seconds,
+)
+from .request_stats import RequestDbStats, request_db_stats
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware: время обработки, количество запросов по статусам,
+    запросы в обработке, количество и время SQL запросов на каждый HTTP запрос.
+    Маршрут берётся из шаблона пути (/tasks/{task_id}), а не из самого пути,
+    чтобы количество рядов метрик не зависело от id в запросах.
+    """
+
+    def __init__(self, app, excluded_paths: tuple[str, ...] = ('/metrics',)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status_code = 500
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            request_db_stats.reset(token)
+
+            route = scope.get('route')
+            route = route.path if route is not None else 'unmatched'
+            http_requests_total.labels(method, route, status_code).inc()
+            http_request_duration_seconds.labels(method, route).observe(elapsed)
+            db_queries_per_request.labels(method, route).observe(stats.queries)
+            db_time_per_request_seconds.labels(method, route).observe(stats.seconds)
@@ -0,0 +1,67 @@
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+# Несколько процессов uvicorn: метрики пишутся в общую папку и собираются при чтении
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+http_requests_total = Counter(
+    'http_requests_total', 'Количество обработанных HTTP запросов',
+    ['method', 'route', 'status'],
+)
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP запроса',
+    ['method', 'route'], buckets=LATENCY_BUCKETS,
+)
+http_requests_in_progress = Gauge(
+    'http_requests_in_progress', 'Количество HTTP запросов в обработке',
+    ['method'], multiprocess_mode='livesum',
+)
+db_queries_per_request = Histogram(
+    'db_queries_per_request', 'Количество SQL запросов на один HTTP запрос',
+    ['method', 'route'], buckets=QUERY_COUNT_BUCKETS,
+)
+db_time_per_request_seconds = Histogram(
+    'db_time_per_request_seconds', 'Суммарное время SQL запросов на один HTTP запрос',
+    ['method', 'route'], buckets=LATENCY_BUCKETS,
+)
+db_query_duration_seconds = Histogram(
+    'db_query_duration_seconds', 'Время выполнения одного SQL запроса',
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class DbPoolCollector:
+    """Состояние пула соединений в момент чтения метрик"""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    def collect(self):
+        stats = self.session_manager.pool_stats()
+        for name in ('checked_out', 'overflow', 'saturation', 'checkout_timeouts', 'checkout_wait_max'):
+            if name in stats:
+                yield GaugeMetricFamily(f'db_pool_{name}', f'Пул соединений: {name}', value=stats[name])
+
+
+def register_db_pool_collector(session_manager):
+    # В режиме нескольких процессов у каждого процесса свой пул, общей картины нет
+    if not MULTIPROCESS:
+        REGISTRY.register(DbPoolCollector(session_manager))
+
+
+def render_metrics() -> bytes:
+    """Все метрики в текстовом формате Prometheus"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,36 @@
+import time
+from contextvars import ContextVar
+
+from .registry import db_query_duration_seconds
+
+
+class RequestDbStats:
+    """Количество и суммарное время SQL запросов в рамках одного HTTP запроса"""
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar('request_db_stats', default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    db_query_duration_seconds.observe(elapsed)
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def handle_error(exception_context):
+    # after_cursor_execute не вызывается при ошибке запроса
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
@@ -1,2 +1,6 @@
 from .user_model import UserModel
-from .task_model import TaskModel
+from .task_model import TaskModel, search_words, naive_utc
+from .task_archive_model import TaskArchiveModel
+from .task_status_counter_model import TaskStatusCounterModel, TaskListState
+from .task_status_history_model import TaskStatusHistoryModel, task_status_history_writer
+from .task_stats_model import TaskStatsHourlyModel, TaskStatsWatermarkModel
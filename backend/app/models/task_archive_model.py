@@ -0,0 +1,48 @@
+from __future__ import annotations
+from uuid import UUID as PyUUID
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.types import TaskStatusTypeEnum
+from app.db import Base, session_manager
+
+
+class TaskArchiveModel(Base):
+    """
+    Архив завершённых задач. TaskModel.archive_finished переносит сюда задачи
+    в статусе finished, которые давно не менялись, чтобы они не раздували
+    секции и индексы task. В списках, поиске и счётчиках архив не участвует,
+    задачу из архива можно только получить по id через TaskModel.get_task.
+    О переносе в архив клиенты узнают из GET /tasks/changes (archived) и
+    из GET /tasks/stream (событие archived).
+    """
+    __tablename__ = 'task_archive'
+    __table_args__ = (
+        sa.Index('ix_task_archive_change_xid_id', 'change_xid', 'id'),
+    )
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    updated_at = sa.Column(sa.DateTime, nullable=False)
+    archived_at = sa.Column(sa.DateTime, server_default=sa.func.now(), nullable=False)
+
+    name = sa.Column(sa.String(), nullable=False)
+    description = sa.Column(sa.String(), nullable=False)
+    status = sa.Column(
+        sa.Enum(*[x.value for x in TaskStatusTypeEnum], name='task_status_type'),
+        nullable=False,
+    )
+    version = sa.Column(sa.Integer, nullable=False)
+    # Номер транзакции, перенёсшей задачу в архив, как TaskModel.change_xid.
+    # У задач, перенесённых до появления колонки, NULL
+    change_xid = sa.Column(
+        sa.BigInteger, nullable=True,
+        server_default=sa.text('pg_current_xact_id()::text::bigint'),
+    )
+
+    @classmethod
+    async def get(cls, task_id: PyUUID) -> TaskArchiveModel | None:
+        return (await session_manager.session.scalars(
+            sa.select(TaskArchiveModel).where(TaskArchiveModel.id == task_id)
+        )).one_or_none()
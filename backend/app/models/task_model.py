@@ -1,19 +1,46 @@
 from __future__ import annotations
+import json
+import re
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator
 
 import sqlalchemy as sa
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import deferred
 
-from app.types import TaskStatusTypeEnum
-from app.db import Base, session_manager
+from app.types import TaskStatusTypeEnum, CountModeTypeEnum
+from app.db import Base, session_manager, db_session, db_read_session
+from app.cache import task_cache
+from app.settings import TASK_PARTITION_MONTHS_AHEAD
+from .task_status_counter_model import TaskStatusCounterModel
+from .task_archive_model import TaskArchiveModel
+from .task_status_history_model import task_status_history_writer, status_history_entry
+
+
+TASK_CHANGE_XID = 'pg_current_xact_id()::text::bigint'
+# Колонки задачи, которые сохраняются в task_archive
+TASK_ARCHIVE_COLUMNS = ['id', 'created_at', 'updated_at', 'name', 'description', 'status', 'version']
 
 
 class TaskModel(Base):
     __tablename__ = 'task'
+    __table_args__ = (
+        sa.Index('ix_task_created_at_id', 'created_at', 'id'),
+        sa.Index('ix_task_updated_at', 'updated_at'),
+        sa.Index('ix_task_status_updated_at', 'status', 'updated_at'),
+        sa.Index('ix_task_status_created_at_id', 'status', 'created_at', 'id'),
+        sa.Index('ix_task_search_vector', 'search_vector', postgresql_using='gin'),
+        sa.Index('ix_task_change_xid_id', 'change_xid', 'id'),
+        sa.Index('ix_task_deleted_at', 'deleted_at', postgresql_where=sa.text('deleted_at IS NOT NULL')),
+        # Месячные секции по created_at, см. TASK_PARTITIONS_FUNCTION.
+        # Первичный ключ секционированной таблицы обязан включать created_at,
+        # уникальность id обеспечивает uuid4.
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
     id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    created_at = sa.Column(sa.DateTime, default=datetime.utcnow, server_default=sa.func.now(), nullable=False)
+    created_at = sa.Column(sa.DateTime, primary_key=True, default=datetime.utcnow, server_default=sa.func.now(), nullable=False)
     updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=sa.func.now(), server_onupdate=sa.func.now(), nullable=False)
 
     name = sa.Column(sa.String(), nullable=False)
@@ -24,37 +51,710 @@ class TaskModel(Base):
         nullable=False,
         default=TaskStatusTypeEnum.CREATED,
     )
+    # Номер версии задачи, увеличивается при каждом изменении.
+    # Используется для compare-and-swap обновлений и в ETag задачи.
+    version = sa.Column(sa.Integer, nullable=False, default=1, server_default='1')
+    # Время удаления. Удалённая задача остаётся в таблице (tombstone), чтобы о
+    # её удалении узнали клиенты GET /tasks/changes, и не видна остальным запросам.
+    # Старые tombstone удаляет purge_tombstones.
+    deleted_at = sa.Column(sa.DateTime, nullable=True)
+    # Номер транзакции, которая последней изменила задачу. Выставляется базой
+    # (TASK_CHANGE_XID_TRIGGER) и служит монотонным токеном для GET /tasks/changes.
+    change_xid = sa.Column(sa.BigInteger, nullable=False, server_default=sa.text(TASK_CHANGE_XID))
+
+    # Поисковый вектор считает сама база триггером TASK_SEARCH_VECTOR_TRIGGER.
+    # Конфигурация 'simple' без стемминга, так как задачи пишут и на русском,
+    # и на английском. Не загружается вместе с задачей.
+    search_vector = deferred(sa.Column(
+        TSVECTOR,
+        server_default=sa.FetchedValue(),
+        server_onupdate=sa.FetchedValue(),
+        nullable=False,
+    ))
 
     @classmethod
-    async def get_task(cls, task_id: UUID) -> TaskModel | None:
+    async def get_task(cls, task_id: UUID, archived: bool = True, use_cache: bool = True) -> TaskModel | None:
+        """
+        Задача по id через read-through кэш task_cache.
+        Из кэша возвращается объект TaskModel, не привязанный к сессии.
+        use_cache=False - задача читается из базы в обход кэша, кэш не меняется.
+        Если задачи нет в task и archived не False, она ищется в task_archive;
+        архивная задача тоже возвращается как TaskModel без сессии и не кэшируется.
+        """
+        if use_cache:
+            cached = await task_cache.get(task_id)
+            if cached:
+                return TaskModel(**cached.model_dump())
+
         task = (await session_manager.session.scalars(
             sa.select(TaskModel)
-            .where(TaskModel.id == task_id)
+            .where(TaskModel.id == task_id, TaskModel.deleted_at.is_(None))
         )).one_or_none()
 
+        if task and use_cache:
+            await task_cache.set(task)
+        if task is None and archived:
+            archived_task = await TaskArchiveModel.get(task_id)
+            if archived_task:
+                return TaskModel(**{_: getattr(archived_task, _) for _ in TASK_ARCHIVE_COLUMNS})
+        return task
+
+    @classmethod
+    async def create(cls, **values) -> TaskModel:
+        task = TaskModel(**values)
+        session_manager.session.add(task)
+        await session_manager.session.flush()
+        await task_cache.set(task)
+        task_status_history_writer.add(status_history_entry(task, None))
+        return task
+
+    @classmethod
+    async def update_returning(
+        cls,
+        task_id: UUID,
+        expected_versions: list[int] | None = None,
+        **values,
+    ) -> TaskModel | None:
+        """
+        Обновляет только переданные поля задачи одним UPDATE ... RETURNING
+        и увеличивает её version. None - задача не найдена.
+        expected_versions - compare-and-swap: задача обновится, только если
+        её version совпадает с одним из значений.
+        Смена статуса записывается в историю через task_status_history_writer.
+        """
+        old = locked_statuses([task_id])
+        query = (
+            sa.update(TaskModel)
+            .where(TaskModel.id == old.c.id, TaskModel.created_at == old.c.created_at)
+            .values(version=TaskModel.version + 1, **values)
+            .returning(TaskModel, old.c.status)
+            .execution_options(synchronize_session=False)
+        )
+        if expected_versions is not None:
+            query = query.where(TaskModel.version.in_(expected_versions))
+        row = (await session_manager.session.execute(query)).one_or_none()
+        if row is None:
+            return None
+        task, old_status = row
+        await task_cache.set(task)
+        if old_status != task.status:
+            task_status_history_writer.add(status_history_entry(task, old_status))
         return task
 
+    @classmethod
+    async def delete_returning(cls, task_id: UUID) -> UUID | None:
+        """
+        Помечает задачу удалённой одним UPDATE ... RETURNING, строка остаётся
+        в таблице как tombstone. None - задача не найдена
+        """
+        deleted_id = (await session_manager.session.scalars(
+            sa.update(TaskModel)
+            .where(TaskModel.id == task_id, TaskModel.deleted_at.is_(None))
+            .values(deleted_at=datetime.utcnow(), version=TaskModel.version + 1)
+            .returning(TaskModel.id)
+            .execution_options(synchronize_session=False)
+        )).one_or_none()
+        await task_cache.invalidate(task_id)
+        return deleted_id
+
     @classmethod
     async def get_total_count(
         cls,
         task_status: TaskStatusTypeEnum | None = None,
+        count_mode: CountModeTypeEnum = CountModeTypeEnum.EXACT,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        updated_after: datetime | None = None,
+        updated_before: datetime | None = None,
     ) -> int:
-        query = sa.select(sa.func.count(TaskModel.id))
-        if task_status:
-            query = query.where(TaskModel.status == task_status)
-        return (await session_manager.session.scalar(query))
+        """
+        Количество задач. Без фильтров по времени в режиме EXACT берётся из
+        task_status_counter, в режиме ESTIMATE - из статистики планировщика
+        (pg_class и pg_stats). С фильтрами по времени счётчики не подходят:
+        EXACT - count(*) по индексу, ESTIMATE - оценка строк из EXPLAIN.
+        """
+        time_filters = task_time_filters(
+            created_after=created_after, created_before=created_before,
+            updated_after=updated_after, updated_before=updated_before,
+        )
+        if time_filters:
+            query = sa.select(TaskModel.id).where(TaskModel.deleted_at.is_(None), *time_filters)
+            if task_status:
+                query = query.where(TaskModel.status == task_status)
+            if count_mode == CountModeTypeEnum.ESTIMATE:
+                return await explain_rows(query)
+            return await session_manager.session.scalar(
+                sa.select(sa.func.count()).select_from(query.subquery())
+            )
+
+        if count_mode == CountModeTypeEnum.ESTIMATE:
+            estimate = await session_manager.session.scalar(
+                sa.text(TASK_COUNT_ESTIMATE),
+                {'status': str(task_status) if task_status else None},
+            )
+            # Таблица ещё ни разу не анализировалась
+            if estimate is not None and estimate >= 0:
+                return round(estimate)
+        return await TaskStatusCounterModel.get_count(task_status=task_status)
 
     @classmethod
-    async def get_butch(
+    def butch_query(
         cls, page: int | None = None,
         page_size: int | None = None,
         task_status: TaskStatusTypeEnum | None = None,
-    ) -> list[TaskModel]:
-        query = sa.select(TaskModel)
+        after: tuple[datetime, uuid.UUID] | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        updated_after: datetime | None = None,
+        updated_before: datetime | None = None,
+    ) -> sa.Select:
+        """
+        Запрос страницы задач, упорядоченных по (created_at, id).
+        Если передан after - курсор (created_at, id) последней задачи
+        предыдущей страницы, то используется keyset пагинация и page игнорируется.
+        """
+        query = (
+            sa.select(TaskModel)
+            .where(TaskModel.deleted_at.is_(None), *task_time_filters(
+                created_after=created_after, created_before=created_before,
+                updated_after=updated_after, updated_before=updated_before,
+            ))
+            .order_by(TaskModel.created_at, TaskModel.id)
+        )
         if task_status:
             query = query.where(TaskModel.status == task_status)
+        if after:
+            query = query.where(
+                sa.tuple_(TaskModel.created_at, TaskModel.id) > sa.tuple_(
+                    sa.literal(after[0], TaskModel.created_at.type),
+                    sa.literal(after[1], TaskModel.id.type),
+                )
+            )
+            page = None
         if page and page_size:
             offset = (page - 1) * page_size
-            query = query.offset(offset).limit(page_size)
-        return (await session_manager.session.scalars(query)).all()
+            query = query.offset(offset)
+        if page_size:
+            query = query.limit(page_size)
+        return query
+
+    @classmethod
+    async def get_butch(cls, **kwargs) -> list[TaskModel]:
+        """Страница задач, параметры - как у butch_query"""
+        return (await session_manager.session.scalars(cls.butch_query(**kwargs))).all()
+
+    @classmethod
+    async def search(
+        cls,
+        q: str,
+        page_size: int,
+        task_status: TaskStatusTypeEnum | None = None,
+        after: tuple[float, uuid.UUID] | None = None,
+    ) -> list[tuple[TaskModel, float]]:
+        """
+        Полнотекстовый поиск по name и description, упорядоченный по (rank desc, id).
+        Каждое слово q ищется как префикс. after - курсор (rank, id) последней
+        задачи предыдущей страницы.
+        """
+        ts_query = search_ts_query(q)
+        rank = sa.func.ts_rank_cd(TaskModel.search_vector, ts_query)
+        query = (
+            sa.select(TaskModel, rank)
+            .where(TaskModel.search_vector.op('@@')(ts_query), TaskModel.deleted_at.is_(None))
+            .order_by(rank.desc(), TaskModel.id)
+            .limit(page_size)
+        )
+        if task_status:
+            query = query.where(TaskModel.status == task_status)
+        if after:
+            after_rank = sa.literal(after[0], sa.Float)
+            query = query.where(sa.or_(
+                rank < after_rank,
+                sa.and_(rank == after_rank, TaskModel.id > after[1]),
+            ))
+        return [tuple(_) for _ in (await session_manager.session.execute(query)).all()]
+
+    @classmethod
+    async def search_count(
+        cls, q: str, task_status: TaskStatusTypeEnum | None = None,
+    ) -> int:
+        query = (
+            sa.select(sa.func.count())
+            .select_from(TaskModel)
+            .where(TaskModel.search_vector.op('@@')(search_ts_query(q)), TaskModel.deleted_at.is_(None))
+        )
+        if task_status:
+            query = query.where(TaskModel.status == task_status)
+        return await session_manager.session.scalar(query)
+
+    @classmethod
+    async def bulk_create(cls, items: list[dict]) -> list[TaskModel]:
+        """Один многострочный INSERT ... RETURNING для всех задач, в порядке items"""
+        if not items:
+            return []
+        tasks = (await session_manager.session.scalars(
+            sa.insert(TaskModel).returning(TaskModel, sort_by_parameter_order=True),
+            items,
+        )).all()
+        task_status_history_writer.add(*[status_history_entry(_, None) for _ in tasks])
+        return tasks
+
+    @classmethod
+    async def bulk_update(cls, items: list[dict]) -> list[TaskModel]:
+        """
+        Один UPDATE ... FROM (VALUES ...) RETURNING для всех задач.
+        Каждый элемент items содержит id и новые name, description, status.
+        Возвращает только найденные задачи. Смена статуса записывается в историю.
+        """
+        if not items:
+            return []
+        data = sa.values(
+            sa.column('id', TaskModel.id.type),
+            sa.column('name', TaskModel.name.type),
+            sa.column('description', TaskModel.description.type),
+            sa.column('status', TaskModel.status.type),
+            name='data',
+        ).data([
+            (_['id'], _['name'], _['description'], _['status']) for _ in items
+        ])
+        old = locked_statuses([_['id'] for _ in items])
+        rows = (await session_manager.session.execute(
+            sa.update(TaskModel)
+            .where(
+                TaskModel.id == data.c.id,
+                TaskModel.id == old.c.id,
+                TaskModel.created_at == old.c.created_at,
+            )
+            .values(
+                name=data.c.name,
+                description=data.c.description,
+                status=data.c.status,
+                version=TaskModel.version + 1,
+            )
+            .returning(TaskModel, old.c.status)
+            .execution_options(synchronize_session=False)
+        )).all()
+        tasks = [task for task, _ in rows]
+        await task_cache.set(*tasks)
+        task_status_history_writer.add(*[
+            status_history_entry(task, old_status)
+            for task, old_status in rows if old_status != task.status
+        ])
+        return tasks
+
+    @classmethod
+    async def bulk_delete(cls, ids: list[uuid.UUID]) -> list[uuid.UUID]:
+        """Помечает задачи удалёнными одним UPDATE ... RETURNING, возвращает id удалённых"""
+        if not ids:
+            return []
+        deleted_ids = (await session_manager.session.scalars(
+            sa.update(TaskModel)
+            .where(TaskModel.id.in_(ids), TaskModel.deleted_at.is_(None))
+            .values(deleted_at=datetime.utcnow(), version=TaskModel.version + 1)
+            .returning(TaskModel.id)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await task_cache.invalidate(*deleted_ids)
+        return deleted_ids
+
+    @classmethod
+    async def stream_batches(
+        cls,
+        batch_size: int,
+        task_status: TaskStatusTypeEnum | None = None,
+    ) -> AsyncIterator[list[sa.Row]]:
+        """
+        Построчно читает таблицу task через серверный курсор, отдавая строки пачками
+        по batch_size. Использует отдельное соединение (по возможности к реплике)
+        в транзакции REPEATABLE READ, поэтому выгрузка видит согласованный снимок
+        и не зависит от сессии запроса.
+        """
+        query = (
+            sa.select(
+                TaskModel.id, TaskModel.name, TaskModel.description,
+                TaskModel.status, TaskModel.created_at, TaskModel.updated_at,
+            )
+            .where(TaskModel.deleted_at.is_(None))
+            .order_by(TaskModel.created_at, TaskModel.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if task_status:
+            query = query.where(TaskModel.status == task_status)
+
+        async with db_read_session() as session:
+            await session.connection(
+                execution_options={'isolation_level': 'REPEATABLE READ'}
+            )
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                yield rows
+
+    @classmethod
+    async def get_changes(
+        cls,
+        page_size: int,
+        since: int | None = None,
+        after_id: uuid.UUID | None = None,
+    ) -> tuple[list[TaskModel | TaskArchiveModel], int]:
+        """
+        Задачи, в том числе удалённые и перенесённые в архив (TaskArchiveModel),
+        которые изменили транзакции с номером не меньше since, упорядоченные по
+        (change_xid, id). after_id - продолжение выборки после задачи (since, after_id).
+        Без since - только не удалённые задачи из task, для первой синхронизации.
+        Отдаются только изменения транзакций младше xmin текущего снимка: все они
+        завершены, а более поздние изменения получат change_xid не меньше xmin,
+        поэтому между запросами ничего не теряется. Возвращает задачи и xmin -
+        границу since для следующего запроса.
+        """
+        xmin = await session_manager.session.scalar(sa.text(TASK_SNAPSHOT_XMIN))
+        if since is None:
+            return (await session_manager.session.scalars(
+                changes_query(TaskModel, xmin, page_size).where(TaskModel.deleted_at.is_(None))
+            )).all(), xmin
+
+        # Первые page_size изменений из task и из архива, из них - первые page_size общие
+        changes = []
+        for model in (TaskModel, TaskArchiveModel):
+            query = changes_query(model, xmin, page_size)
+            if after_id is None:
+                query = query.where(model.change_xid >= since)
+            else:
+                query = query.where(
+                    sa.tuple_(model.change_xid, model.id) > sa.tuple_(
+                        sa.literal(since, model.change_xid.type),
+                        sa.literal(after_id, model.id.type),
+                    )
+                )
+            changes.extend((await session_manager.session.scalars(query)).all())
+        changes.sort(key=lambda _: (_.change_xid, _.id))
+        return changes[:page_size], xmin
+
+    @classmethod
+    async def archive_finished(cls, older_than: datetime, batch_size: int) -> int:
+        """
+        Переносит задачи в статусе finished, не менявшиеся с older_than, в task_archive.
+        Каждая пачка из batch_size задач переносится одним оператором
+        WITH moved AS (DELETE ... RETURNING) INSERT INTO task_archive SELECT ...
+        в своей транзакции. Возвращает количество перенесённых задач.
+        """
+        batch = (
+            sa.select(TaskModel.id, TaskModel.created_at)
+            .where(
+                TaskModel.status == TaskStatusTypeEnum.FINISHED,
+                TaskModel.updated_at < older_than,
+                TaskModel.deleted_at.is_(None),
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            sa.delete(TaskModel)
+            .where(sa.tuple_(TaskModel.id, TaskModel.created_at).in_(batch))
+            .returning(*[getattr(TaskModel, _) for _ in TASK_ARCHIVE_COLUMNS])
+            .cte('moved')
+        )
+        query = (
+            sa.insert(TaskArchiveModel)
+            .from_select(TASK_ARCHIVE_COLUMNS, sa.select(*[moved.c[_] for _ in TASK_ARCHIVE_COLUMNS]))
+            .returning(TaskArchiveModel.id)
+        )
+        archived = 0
+        async with db_session() as session:
+            while True:
+                ids = (await session.scalars(query)).all()
+                await task_cache.invalidate(*ids)
+                archived += len(ids)
+                if len(ids) < batch_size:
+                    return archived
+
+    @classmethod
+    async def create_partitions(cls, start_at: datetime, months: int) -> int:
+        """
+        Создаёт недостающие месячные секции task, начиная с месяца start_at.
+        Возвращает количество созданных секций.
+        """
+        async with db_session() as session:
+            return await session.scalar(
+                sa.text('SELECT task_create_partitions(:start_at, :months)'),
+                {'start_at': start_at, 'months': months},
+            )
+
+    @classmethod
+    async def purge_tombstones(cls, older_than: datetime, batch_size: int) -> int:
+        """
+        Окончательно удаляет задачи, помеченные удалёнными раньше older_than.
+        Каждая пачка из batch_size строк - отдельный DELETE в своей транзакции,
+        чтобы не держать долгие блокировки. Возвращает количество удалённых строк.
+        """
+        batch = (
+            sa.select(TaskModel.id)
+            .where(TaskModel.deleted_at < older_than)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        purged = 0
+        async with db_session() as session:
+            while True:
+                ids = (await session.scalars(
+                    sa.delete(TaskModel)
+                    .where(TaskModel.id.in_(batch.scalar_subquery()))
+                    .returning(TaskModel.id)
+                )).all()
+                purged += len(ids)
+                if len(ids) < batch_size:
+                    return purged
+
+
+def task_time_filters(
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
+) -> list:
+    """Условия на created_at и updated_at. Граница after включается, before - нет"""
+    filters = []
+    if created_after:
+        filters.append(TaskModel.created_at >= naive_utc(created_after))
+    if created_before:
+        filters.append(TaskModel.created_at < naive_utc(created_before))
+    if updated_after:
+        filters.append(TaskModel.updated_at >= naive_utc(updated_after))
+    if updated_before:
+        filters.append(TaskModel.updated_at < naive_utc(updated_before))
+    return filters
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Время в колонках task хранится в UTC без часового пояса"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def explain_rows(query: sa.Select) -> int:
+    """Оценка количества строк запроса планировщиком, без его выполнения"""
+    plan = await session_manager.session.scalar(
+        sa.text(f'EXPLAIN (FORMAT JSON) {compile_query(query)}')
+    )
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def compile_query(query: sa.Select) -> str:
+    """SQL запроса с подставленными значениями параметров, для EXPLAIN"""
+    return str(query.compile(
+        dialect=session_manager.session.bind.dialect,
+        compile_kwargs={'literal_binds': True},
+    ))
+
+
+def locked_statuses(ids: list[uuid.UUID]) -> sa.Subquery:
+    """
+    Подзапрос с текущими статусами задач ids для UPDATE ... FROM: RETURNING
+    отдаёт только новые значения, а прежний статус нужен для истории.
+    FOR UPDATE блокирует строки в порядке id и читает последнюю версию строки,
+    даже если её успела изменить параллельная транзакция.
+    """
+    return (
+        sa.select(TaskModel.id, TaskModel.created_at, TaskModel.status)
+        .where(TaskModel.id.in_(ids), TaskModel.deleted_at.is_(None))
+        .order_by(TaskModel.id)
+        .with_for_update()
+        .subquery('old')
+    )
+
+
+def changes_query(model, xmin: int, page_size: int) -> sa.Select:
+    """Изменения task или task_archive до xmin по порядку (change_xid, id)"""
+    return (
+        sa.select(model)
+        .where(model.change_xid < xmin)
+        .order_by(model.change_xid, model.id)
+        .limit(page_size)
+    )
+
+
+def search_words(q: str) -> list[str]:
+    """Слова поискового запроса. Всё, кроме букв и цифр, отбрасывается"""
+    return re.findall(r'\w+', q.lower())
+
+
+def search_ts_query(q: str):
+    """tsquery, в котором все слова q обязательны и ищутся как префиксы"""
+    return sa.func.to_tsquery('simple', ' & '.join(f'{_}:*' for _ in search_words(q)))
+
+
+# Сумма оценок по секциям task. Секции, которые ещё ни разу не анализировались
+# (reltuples < 0), пропускаются; если таких нет совсем - NULL
+TASK_COUNT_ESTIMATE = """
+SELECT sum(CASE
+    WHEN CAST(:status AS text) IS NULL THEN c.reltuples
+    ELSE c.reltuples * COALESCE((
+        SELECT s.most_common_freqs[array_position(s.most_common_vals::text::text[], CAST(:status AS text))]
+        FROM pg_stats s
+        WHERE s.schemaname = current_schema() AND s.tablename = c.relname AND s.attname = 'status'
+    ), 0)
+END)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'task'::regclass AND c.reltuples >= 0
+"""
+
+
+# Месячные секции task_pYYYYMM. Функция создаёт секции на months месяцев начиная
+# с месяца start_at, пропуская существующие. Если в task_default уже есть задачи
+# за месяц, секция не создаётся, а в лог базы пишется предупреждение.
+TASK_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_create_partitions(start_at timestamp, months integer)
+RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', start_at);
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Секции могут одновременно создавать несколько процессов приложения
+    PERFORM pg_advisory_xact_lock(hashtext('task_create_partitions'));
+    FOR n IN 1 .. months LOOP
+        partition_name := 'task_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF task FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + interval '1 month'
+                );
+                created := created + 1;
+            EXCEPTION WHEN check_violation THEN
+                RAISE WARNING 'task partition % not created: %', partition_name, SQLERRM;
+            END;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_DEFAULT_PARTITION = 'CREATE TABLE IF NOT EXISTS task_default PARTITION OF task DEFAULT'
+
+
+@sa.event.listens_for(Base.metadata, 'after_create')
+def _create_task_partitions(target, connection, **kw):
+    connection.execute(sa.text(TASK_PARTITIONS_FUNCTION))
+    connection.execute(sa.text(TASK_DEFAULT_PARTITION))
+    connection.execute(
+        sa.text('SELECT task_create_partitions(now()::timestamp, :months)'),
+        {'months': TASK_PARTITION_MONTHS_AHEAD + 1},
+    )
+
+
+# Номер транзакции в change_xid при каждом изменении задачи (при INSERT - server_default)
+TASK_CHANGE_XID_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION task_set_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := {TASK_CHANGE_XID};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_CHANGE_XID_TRIGGER = """
+CREATE TRIGGER task_change_xid BEFORE UPDATE ON task
+FOR EACH ROW EXECUTE FUNCTION task_set_change_xid()
+"""
+
+# Поисковый вектор задачи. Триггер, а не генерируемая колонка: колонку с триггером
+# можно добавить и заполнить пачками без перезаписи всей таблицы
+TASK_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_search_vector(name text, description text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple'::regconfig, $1), 'A') ||
+           setweight(to_tsvector('simple'::regconfig, $2), 'B')
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+TASK_SET_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_set_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := task_search_vector(NEW.name, NEW.description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER task_search_vector BEFORE INSERT OR UPDATE OF name, description ON task
+FOR EACH ROW EXECUTE FUNCTION task_set_search_vector()
+"""
+
+
+@sa.event.listens_for(Base.metadata, 'after_create')
+def _create_task_search_vector_trigger(target, connection, **kw):
+    connection.execute(sa.text(TASK_SEARCH_VECTOR_FUNCTION))
+    connection.execute(sa.text(TASK_SET_SEARCH_VECTOR_FUNCTION))
+    connection.execute(sa.text(TASK_SEARCH_VECTOR_TRIGGER))
+
+
+# Самая старая транзакция, которая ещё может быть не завершена для текущего снимка
+TASK_SNAPSHOT_XMIN = 'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+
+
+@sa.event.listens_for(Base.metadata, 'after_create')
+def _create_task_change_xid_trigger(target, connection, **kw):
+    connection.execute(sa.text(TASK_CHANGE_XID_FUNCTION))
+    connection.execute(sa.text(TASK_CHANGE_XID_TRIGGER))
+
+
+# Уведомления об изменении задач для GET /tasks/stream, см. app/events.
+# В payload только id, статус и версия - лимит NOTIFY 8000 байт,
+# а задачу целиком клиент при необходимости перечитает сам.
+TASK_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_notify_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', 'created', 'id', n.id, 'status', n.status, 'version', n.version
+        )::text) FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Удаление tombstone клиентам уже не интересно. Задача, которую тот же
+        -- оператор записал в task_archive (archive_finished), перенесена в архив
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN a.id IS NULL THEN 'deleted' ELSE 'archived' END,
+            'id', o.id, 'status', o.status, 'version', o.version
+        )::text)
+        FROM old_rows o LEFT JOIN task_archive a ON a.id = o.id
+        WHERE o.deleted_at IS NULL;
+    ELSE
+        PERFORM pg_notify('task_changes', json_build_object(
+            'op', CASE WHEN n.deleted_at IS NULL THEN 'updated' ELSE 'deleted' END,
+            'id', n.id, 'status', n.status, 'old_status', o.status, 'version', n.version
+        )::text) FROM new_rows n JOIN old_rows o ON o.id = n.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_NOTIFY_TRIGGERS = [
+    """
+    CREATE TRIGGER task_notify_insert AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+    """
+    CREATE TRIGGER task_notify_update AFTER UPDATE ON task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+    """
+    CREATE TRIGGER task_notify_delete AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_notify_changes()
+    """,
+]
+
 
+@sa.event.listens_for(Base.metadata, 'after_create')
+def _create_task_notify_triggers(target, connection, **kw):
+    connection.execute(sa.text(TASK_NOTIFY_FUNCTION))
+    for trigger in TASK_NOTIFY_TRIGGERS:
+        connection.execute(sa.text(trigger))
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from app.types import TaskStatusTypeEnum, StatsBucketTypeEnum
+from app.db import Base, session_manager, db_session
+
+
+class TaskStatsWatermarkModel(Base):
+    """До какого момента пересчитана статистика name"""
+    __tablename__ = 'task_stats_watermark'
+
+    name = sa.Column(sa.String(), primary_key=True)
+    processed_until = sa.Column(sa.DateTime, nullable=False)
+
+
+class TaskStatsHourlyModel(Base):
+    """
+    Почасовая статистика задач по task_status_history: сколько раз за час задачи
+    переходили в статус status (entered) и сколько из них были созданием задачи
+    (created). Поддерживается rollup, GET /tasks/stats читает только эту таблицу.
+    """
+    __tablename__ = 'task_stats_hourly'
+
+    bucket = sa.Column(sa.DateTime, primary_key=True)
+    status = sa.Column(
+        sa.Enum(*[x.value for x in TaskStatusTypeEnum], name='task_status_type'),
+        primary_key=True,
+    )
+    entered = sa.Column(sa.BigInteger, nullable=False, default=0, server_default='0')
+    created = sa.Column(sa.BigInteger, nullable=False, default=0, server_default='0')
+
+    @classmethod
+    async def rollup(cls, late_window: float) -> bool:
+        """
+        Пересчитывает часы, начиная с часа (прошлый пересчёт - late_window), по
+        task_status_history. Чтение истории ограничено по changed_at, его
+        обслуживает BRIN индекс. Пересчёт идёт в одной транзакции под advisory lock:
+        если его уже выполняет другой процесс, возвращает False и ничего не делает.
+        """
+        async with db_session() as session:
+            await session.connection(execution_options={'isolation_level': 'READ COMMITTED'})
+            locked = await session.scalar(
+                sa.text('SELECT pg_try_advisory_xact_lock(hashtext(:name))'),
+                {'name': TASK_STATS_HOURLY},
+            )
+            if not locked:
+                return False
+
+            processed_until = await session.scalar(
+                sa.select(TaskStatsWatermarkModel.processed_until)
+                .where(TaskStatsWatermarkModel.name == TASK_STATS_HOURLY)
+            )
+            now = await session.scalar(sa.text("SELECT now() AT TIME ZONE 'utc'"))
+            since = datetime(1970, 1, 1)
+            if processed_until:
+                since = (processed_until - timedelta(seconds=late_window)).replace(
+                    minute=0, second=0, microsecond=0,
+                )
+
+            await session.execute(sa.text(TASK_STATS_ROLLUP), {'since': since})
+            await session.execute(
+                insert(TaskStatsWatermarkModel)
+                .values(name=TASK_STATS_HOURLY, processed_until=now)
+                .on_conflict_do_update(
+                    index_elements=[TaskStatsWatermarkModel.name],
+                    set_={'processed_until': now},
+                )
+            )
+            await session.commit()
+        return True
+
+    @classmethod
+    async def get_buckets(
+        cls, bucket: StatsBucketTypeEnum, start: datetime, end: datetime,
+    ) -> list[dict]:
+        """
+        Статистика по интервалам bucket, которые начинаются в [start, end).
+        Интервалы считаются целиком: первый начинается в start, округлённом вверх
+        до границы интервала, последний заканчивается после end
+        """
+        bucket_start = sa.func.date_trunc(str(bucket), TaskStatsHourlyModel.bucket)
+        first, until = bucket_ceil(start, bucket), bucket_ceil(end, bucket)
+        rows = (await session_manager.session.execute(
+            sa.select(
+                bucket_start.label('start'),
+                TaskStatsHourlyModel.status,
+                sa.func.sum(TaskStatsHourlyModel.entered).label('entered'),
+                sa.func.sum(TaskStatsHourlyModel.created).label('created'),
+            )
+            .where(TaskStatsHourlyModel.bucket >= first, TaskStatsHourlyModel.bucket < until)
+            .group_by(bucket_start, TaskStatsHourlyModel.status)
+            .order_by(bucket_start)
+        )).all()
+
+        buckets = {}
+        for row in rows:
+            item = buckets.setdefault(row.start, {
+                'start': row.start,
+                'created': 0,
+                'finished': 0,
+                'entered': {_: 0 for _ in TaskStatusTypeEnum},
+            })
+            item['created'] += row.created
+            item['entered'][row.status] = row.entered
+            if row.status == TaskStatusTypeEnum.FINISHED:
+                item['finished'] = row.entered
+        return list(buckets.values())
+
+    @classmethod
+    async def get_processed_until(cls) -> datetime | None:
+        return await session_manager.session.scalar(
+            sa.select(TaskStatsWatermarkModel.processed_until)
+            .where(TaskStatsWatermarkModel.name == TASK_STATS_HOURLY)
+        )
+
+
+TASK_STATS_HOURLY = 'task_stats_hourly'
+
+TASK_STATS_ROLLUP = """
+INSERT INTO task_stats_hourly (bucket, status, entered, created)
+SELECT date_trunc('hour', changed_at), status, count(*), count(*) FILTER (WHERE old_status IS NULL)
+FROM task_status_history
+WHERE changed_at >= :since
+GROUP BY 1, 2
+ON CONFLICT (bucket, status) DO UPDATE
+SET entered = EXCLUDED.entered, created = EXCLUDED.created
+"""
+
+
+BUCKET_STEPS = {
+    StatsBucketTypeEnum.HOUR: timedelta(hours=1),
+    StatsBucketTypeEnum.DAY: timedelta(days=1),
+    StatsBucketTypeEnum.WEEK: timedelta(weeks=1),
+}
+
+
+def bucket_floor(value: datetime, bucket: StatsBucketTypeEnum) -> datetime:
+    """Начало интервала bucket, в который попадает value, как date_trunc в Postgres"""
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if bucket == StatsBucketTypeEnum.HOUR:
+        return value
+    value = value.replace(hour=0)
+    if bucket == StatsBucketTypeEnum.WEEK:
+        # Недели в date_trunc начинаются с понедельника
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def bucket_ceil(value: datetime, bucket: StatsBucketTypeEnum) -> datetime:
+    """Ближайшее начало интервала bucket, не раньше value"""
+    floor = bucket_floor(value, bucket)
+    return floor if floor == value else floor + BUCKET_STEPS[bucket]
@@ -0,0 +1,166 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import NamedTuple
+
+import sqlalchemy as sa
+
+from app.types import TaskStatusTypeEnum
+from app.db import Base, session_manager
+
+
+class TaskListState(NamedTuple):
+    count: int
+    generation: tuple[int, ...]
+    changed_at: datetime | None
+
+
+class TaskStatusCounterModel(Base):
+    """
+    Точное количество задач для каждого статуса и номер поколения (generation),
+    который увеличивается при любом изменении задач с этим статусом.
+    Поддерживается триггерами на таблице task (см. TASK_STATUS_COUNTER_FUNCTION),
+    поэтому получение total_items стоит O(1) вместо count(*) по всей таблице,
+    а по generation можно понять, изменился ли список задач.
+    """
+    __tablename__ = 'task_status_counter'
+
+    status = sa.Column(
+        sa.Enum(*[x.value for x in TaskStatusTypeEnum], name='task_status_type'),
+        primary_key=True,
+    )
+    count = sa.Column(sa.BigInteger, nullable=False, default=0, server_default='0')
+    generation = sa.Column(sa.BigInteger, nullable=False, default=0, server_default='0')
+    changed_at = sa.Column(sa.DateTime, nullable=True)
+
+    @classmethod
+    async def get_counts(cls) -> dict[str, int]:
+        """Количество задач по каждому статусу"""
+        rows = (await session_manager.session.execute(
+            sa.select(TaskStatusCounterModel.status, TaskStatusCounterModel.count)
+        )).all()
+        return {_.status: _.count for _ in rows}
+
+    @classmethod
+    async def get_count(cls, task_status: TaskStatusTypeEnum | None = None) -> int:
+        query = sa.select(sa.func.coalesce(sa.func.sum(TaskStatusCounterModel.count), 0))
+        if task_status:
+            query = query.where(TaskStatusCounterModel.status == task_status)
+        return int(await session_manager.session.scalar(query))
+
+    @classmethod
+    async def get_list_state(cls, task_status: TaskStatusTypeEnum | None = None) -> TaskListState:
+        """Количество, поколения и время последнего изменения задач одним запросом"""
+        query = (
+            sa.select(
+                TaskStatusCounterModel.count,
+                TaskStatusCounterModel.generation,
+                TaskStatusCounterModel.changed_at,
+            )
+            .order_by(TaskStatusCounterModel.status)
+        )
+        if task_status:
+            query = query.where(TaskStatusCounterModel.status == task_status)
+        rows = (await session_manager.session.execute(query)).all()
+        changed_at = [_.changed_at for _ in rows if _.changed_at]
+        return TaskListState(
+            count=sum(_.count for _ in rows),
+            generation=tuple(_.generation for _ in rows),
+            changed_at=max(changed_at) if changed_at else None,
+        )
+
+    @classmethod
+    async def rebuild(cls):
+        """Пересчитывает счётчики по таблице task, если они разошлись с данными"""
+        await session_manager.session.execute(sa.text(TASK_STATUS_COUNTER_REBUILD))
+
+
+# Триггеры уровня оператора с transition tables: один UPDATE счётчика на статус
+# за оператор, а не на каждую строку. Счётчики обновляются в порядке статусов,
+# чтобы параллельные транзакции не получали deadlock.
+# generation увеличивается при любой записи, в том числе без смены статуса.
+# Удалённые задачи (deleted_at не NULL) в count не входят.
+TASK_STATUS_COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_status_counter_refresh() RETURNS trigger AS $$
+DECLARE
+    r record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT status, count(*) FILTER (WHERE deleted_at IS NULL) AS delta
+            FROM new_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR r IN
+            SELECT status, count(*) FILTER (WHERE deleted_at IS NULL) AS delta
+            FROM old_rows GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count - r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    ELSE
+        -- Любое изменение задачи меняет поколение её старого и нового статуса.
+        -- Строка с deleted_at (tombstone) не считается: пометка удалённой
+        -- уменьшает счётчик так же, как DELETE
+        FOR r IN
+            SELECT status, sum(delta) AS delta FROM (
+                SELECT status, CASE WHEN deleted_at IS NULL THEN 1 ELSE 0 END AS delta
+                FROM new_rows
+                UNION ALL
+                SELECT status, CASE WHEN deleted_at IS NULL THEN -1 ELSE 0 END AS delta
+                FROM old_rows
+            ) changes
+            GROUP BY status ORDER BY status
+        LOOP
+            UPDATE task_status_counter
+            SET count = count + r.delta, generation = generation + 1,
+                changed_at = now() AT TIME ZONE 'utc'
+            WHERE status = r.status;
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_STATUS_COUNTER_TRIGGERS = [
+    """
+    CREATE TRIGGER task_status_counter_insert AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+    """
+    CREATE TRIGGER task_status_counter_update AFTER UPDATE ON task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+    """
+    CREATE TRIGGER task_status_counter_delete AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_status_counter_refresh()
+    """,
+]
+
+TASK_STATUS_COUNTER_REBUILD = """
+INSERT INTO task_status_counter (status, count)
+SELECT s.status, (
+    SELECT count(*) FROM task WHERE task.status = s.status AND task.deleted_at IS NULL
+)
+FROM unnest(enum_range(NULL::task_status_type)) AS s(status)
+ON CONFLICT (status) DO UPDATE
+SET count = EXCLUDED.count, generation = task_status_counter.generation + 1
+"""
+
+
+@sa.event.listens_for(Base.metadata, 'after_create')
+def _create_task_status_counter_triggers(target, connection, **kw):
+    connection.execute(sa.text(TASK_STATUS_COUNTER_FUNCTION))
+    for trigger in TASK_STATUS_COUNTER_TRIGGERS:
+        connection.execute(sa.text(trigger))
+    connection.execute(sa.text(TASK_STATUS_COUNTER_REBUILD))
@@ -0,0 +1,82 @@
+from __future__ import annotations
+from uuid import UUID as PyUUID
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.types import TaskStatusTypeEnum
+from app.db import Base, BufferedInsert, session_manager
+from app.settings import (
+    TASK_HISTORY_FLUSH_INTERVAL_MS, TASK_HISTORY_FLUSH_ROWS, TASK_HISTORY_MAX_PENDING,
+)
+
+
+class TaskStatusHistoryModel(Base):
+    """
+    Журнал смены статусов задач, только для добавления. old_status = NULL -
+    создание задачи. Записи добавляются через task_status_history_writer.
+    BRIN индекс по changed_at почти ничего не стоит при вставке и мал даже
+    на огромной таблице, так как записи приходят в порядке времени.
+    """
+    __tablename__ = 'task_status_history'
+    __table_args__ = (
+        sa.Index('ix_task_status_history_changed_at', 'changed_at', postgresql_using='brin'),
+        sa.Index('ix_task_status_history_task_id', 'task_id'),
+    )
+
+    id = sa.Column(sa.BigInteger, sa.Identity(), primary_key=True)
+    task_id = sa.Column(UUID(as_uuid=True), nullable=False)
+    old_status = sa.Column(
+        sa.Enum(*[x.value for x in TaskStatusTypeEnum], name='task_status_type'),
+        nullable=True,
+    )
+    status = sa.Column(
+        sa.Enum(*[x.value for x in TaskStatusTypeEnum], name='task_status_type'),
+        nullable=False,
+    )
+    version = sa.Column(sa.Integer, nullable=False)
+    changed_at = sa.Column(sa.DateTime, nullable=False)
+
+    @classmethod
+    async def get_for_task(cls, task_id: PyUUID) -> list[dict]:
+        """
+        История статусов задачи по времени, включая ещё не записанные
+        в базу изменения из task_status_history_writer этого процесса.
+        Сессия должна быть на основной базе. Буферы других процессов не видны:
+        их изменения появятся после записи в базу
+        """
+        # Буфер читается до запроса: запись, которой уже нет в буфере,
+        # к началу запроса сохранена в основной базе. Повторы убираются по version
+        pending = [_ for _ in task_status_history_writer.pending if _['task_id'] == task_id]
+        rows = (await session_manager.session.execute(
+            sa.select(
+                TaskStatusHistoryModel.old_status,
+                TaskStatusHistoryModel.status,
+                TaskStatusHistoryModel.version,
+                TaskStatusHistoryModel.changed_at,
+            )
+            .where(TaskStatusHistoryModel.task_id == task_id)
+        )).mappings().all()
+        history = {_['version']: dict(_) for _ in rows}
+        for entry in pending:
+            history.setdefault(entry['version'], entry)
+        return sorted(history.values(), key=lambda _: (_['changed_at'], _['version']))
+
+
+def status_history_entry(task, old_status: TaskStatusTypeEnum | None) -> dict:
+    """Запись истории для задачи task после изменения статуса с old_status"""
+    return {
+        'task_id': task.id,
+        'old_status': old_status,
+        'status': task.status,
+        'version': task.version,
+        'changed_at': task.updated_at,
+    }
+
+
+task_status_history_writer = BufferedInsert(
+    TaskStatusHistoryModel.__table__,
+    flush_interval=TASK_HISTORY_FLUSH_INTERVAL_MS / 1000,
+    max_rows=TASK_HISTORY_FLUSH_ROWS,
+    max_pending=TASK_HISTORY_MAX_PENDING,
+)
@@ -5,7 +5,7 @@ from datetime import datetime
 import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import UUID
 
-from app.db import Base, db_session
+from app.db import Base, db_read_session
 
 
 class UserModel(Base):
@@ -22,18 +22,29 @@ class UserModel(Base):
 
 
     @classmethod
-    async def get_by_username(cls, username: str):
-        async with db_session() as session:
+    async def get_by_username(cls, username: str, primary: bool = False):
+        """Пользователь по username. Читается с реплики, если primary не передан"""
+        async with db_read_session(primary) as session:
             user = (await session.scalars(
                 sa.select(UserModel)
                 .where(UserModel.username == username)
             )).one_or_none()
         return user
 
-    def check_password(self, password: str):
-        from app.authentication import verify_password, get_password_hash
-        return verify_password(password, self.password)
+    async def check_password(self, password: str) -> bool:
+        from app.authentication import password_hasher
+        return await password_hasher.verify(password, self.password)
 
-    def set_password(self, password: str):
-        from app.authentication import get_password_hash
-        self.password = get_password_hash(password)
+    async def set_password(self, password: str):
+        from app.authentication import password_hasher
+        self.password = await password_hasher.hash(password)
+
+
+@sa.event.listens_for(UserModel, 'after_insert')
+@sa.event.listens_for(UserModel, 'after_update')
+@sa.event.listens_for(UserModel, 'after_delete')
+def _invalidate_user_claims(mapper, connection, target: UserModel):
+    from app.authentication import user_claims_cache
+    history = sa.inspect(target).attrs.username.history
+    for username in [target.username, *history.deleted]:
+        user_claims_cache.delete(username)
@@ -2,8 +2,12 @@ from fastapi import APIRouter
 
 from .auth_router import router as auth_router
 from .task_router import router as task_router
+from .stats_router import router as stats_router
+from .metrics_router import router as metrics_router
 
 
 main_router = APIRouter()
 main_router.include_router(auth_router, prefix="")
 main_router.include_router(task_router, prefix="/tasks")
+main_router.include_router(stats_router, prefix="/stats")
+main_router.include_router(metrics_router, prefix="/metrics")
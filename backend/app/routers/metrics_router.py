@@ -0,0 +1,22 @@
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.metrics import render_metrics
+
+
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.get("", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    GET /metrics\n
+    Метрики приложения в текстовом формате Prometheus: время обработки и статусы
+    HTTP запросов по маршрутам, запросы в обработке, количество и время SQL
+    запросов на один HTTP запрос, состояние пула соединений.\n
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
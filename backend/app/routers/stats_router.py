@@ -0,0 +1,41 @@
+import logging
+
+from fastapi import APIRouter, Depends
+
+from app.authentication import authenticate_user, jwt_backend, password_hasher
+from app.db import session_manager
+from app.cache import task_cache, task_list_cache
+from app.log_config import logging_stats
+from app.events import task_event_broker, task_event_listener
+from app.models import task_status_history_writer
+from app.utils import startup_stats
+
+
+logger = logging.getLogger('uvicorn.error')
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_stats(user = Depends(authenticate_user)) -> dict:
+    """
+    GET /stats\n
+    Внутренняя статистика процесса: состояние пула соединений с базой данных
+    (занятость, время ожидания соединения, таймауты), отставание
+    и количество чтений реплик, кэши аутентификации,
+    очередь хэширования паролей, кэш задач, кэш страниц списка задач,
+    количество отброшенных записей лога, подписчики потока событий задач,
+    буфер записи истории статусов задач, время старта процесса.\n
+    """
+    return {
+        'db_pool': session_manager.pool_stats(),
+        'db_replicas': session_manager.replica_stats(),
+        'auth': jwt_backend.stats(),
+        'password_hasher': password_hasher.stats(),
+        'task_cache': task_cache.stats(),
+        'task_list_cache': task_list_cache.stats(),
+        'logging': logging_stats(),
+        'task_events': {**task_event_broker.stats(), **task_event_listener.stats()},
+        'task_status_history': task_status_history_writer.stats(),
+        'startup': startup_stats(),
+    }
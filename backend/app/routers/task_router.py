@@ -1,18 +1,43 @@
 import logging
+from datetime import datetime, timedelta
 from uuid import UUID
 from math import ceil
+from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy import delete
+from fastapi import APIRouter, Body, Depends, Query, Request, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.authentication import authenticate_user
 from app.schemas import (
-    TaskInSchema, TaskEditSchema,
-    TaskOutSchema, PaginationResponse
+    TaskInSchema, TaskEditSchema, TaskPatchSchema,
+    TaskOutSchema, PaginationResponse,
+    TaskBulkEditSchema, TaskBulkResultSchema, TaskChangesSchema, TaskStatusHistorySchema,
+    TaskStatsSchema,
+    encode_cursor, decode_cursor, encode_search_cursor, decode_search_cursor,
+    encode_change_token, decode_change_token,
+    task_page_adapter, task_changes_adapter, adapter_response,
 )
-from app.models import TaskModel
+from app.models import (
+    TaskModel, TaskArchiveModel, TaskStatusCounterModel, TaskStatusHistoryModel, TaskStatsHourlyModel,
+    search_words, naive_utc,
+)
+from app.cache import task_list_cache
+from app.events import task_event_broker, sse_task_events, TooManySubscribers
 from app.db import session_manager
-from app.types import TaskStatusTypeEnum
+from app.types import (
+    TaskStatusTypeEnum, CountModeTypeEnum, BulkResultTypeEnum, ExportFormatTypeEnum,
+    StatsBucketTypeEnum,
+)
+from app.settings import (
+    TASK_BULK_MAX_ITEMS, TASK_EXPORT_BATCH_SIZE, TASK_LIST_MAX_PAGE_SIZE,
+    TASK_SEARCH_MAX_QUERY_LENGTH, TASK_SEARCH_MAX_PAGE_SIZE,
+    TASK_EVENTS_PING_INTERVAL, TASK_TOMBSTONE_RETENTION, TASK_CHANGES_MAX_PAGE_SIZE,
+)
+from app.utils import (
+    EXPORT_SERIALIZERS, EXPORT_MEDIA_TYPES,
+    task_etag, parse_task_etag, list_etag, if_match_etags,
+    is_not_modified, cache_headers,
+)
 
 
 logger = logging.getLogger('uvicorn.error')
@@ -23,6 +48,7 @@ router = APIRouter()
 @router.post("", status_code=status.HTTP_201_CREATED,)
 async def post_task(
     data: TaskInSchema,
+    response: Response,
     user = Depends(authenticate_user),
     db_session = Depends(session_manager.activate_db_connection),
 ) -> TaskOutSchema:
@@ -31,60 +57,396 @@ async def post_task(
     Создание новой задачи. Статус новой задачи всегда будет = 'created';\n
     name - название задачи; description - описание задачи.\n
     """
-    task = TaskModel(
+    task = await TaskModel.create(
         name=data.name,
         description=data.description,
     )
-    session_manager.session.add(task)
-    await session_manager.session.flush()
 
+    response.headers.update(cache_headers(task_etag(task), task.updated_at))
     return TaskOutSchema.model_validate(task)
 
 
-@router.get("")
+@router.get("", response_model=PaginationResponse[TaskOutSchema])
 async def get_list_tasks(
-    page: int = 1,
-    page_size: int = 100,
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=TASK_LIST_MAX_PAGE_SIZE),
+    cursor: str | None = None,
     task_status: TaskStatusTypeEnum | None = None,
+    count_mode: CountModeTypeEnum = CountModeTypeEnum.EXACT,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
     user = Depends(authenticate_user),
-    db_session = Depends(session_manager.activate_db_connection),
-) -> PaginationResponse:
+    db_session = Depends(session_manager.activate_read_db_connection),
+) -> Response:
     """
     GET /tasks\n
-    Получение пагинированного списка задач.\n
-    Есть возможность фильтрации по статусам task_status.\n
+    Получение пагинированного списка задач, упорядоченных по времени создания.\n
+    Есть возможность фильтрации по статусам task_status и по времени создания
+    и изменения: created_after, created_before, updated_after, updated_before
+    (граница after включается, before - нет; время без часового пояса - UTC).\n
+    Для глубоких страниц вместо page передавайте cursor из next_cursor
+    предыдущего ответа - скорость не зависит от номера страницы.\n
+    count_mode=estimate - приблизительный total_items по статистике postgres.\n
+    Поддерживаются If-None-Match и If-Modified-Since: если задачи не менялись,
+    возвращается 304 без тела.\n
+    Готовые страницы кэшируются в памяти до первого изменения задач.\n
     """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Не верный cursor',
+            )
+
+    time_filters = {
+        'created_after': created_after, 'created_before': created_before,
+        'updated_after': updated_after, 'updated_before': updated_before,
+    }
+    list_state = await TaskStatusCounterModel.get_list_state(task_status=task_status)
+    etag = list_etag(
+        {'page': page, 'page_size': page_size, 'cursor': cursor,
+         'task_status': task_status, 'count_mode': count_mode, **time_filters},
+        list_state.generation,
+    )
+    headers = cache_headers(etag, list_state.changed_at)
+    if is_not_modified(request, etag, list_state.changed_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Тело страницы для того же поколения счётчиков уже собиралось - базу не трогаем
+    body = task_list_cache.get(etag)
+    if body is not None:
+        return Response(body, media_type='application/json', headers=headers)
 
-    logger.info('TASK_ROUTER')
-    logger.info(session_manager.db_session_context)
     tasks = await TaskModel.get_butch(
-        page=page, page_size=page_size, task_status=task_status
+        page=page, page_size=page_size, task_status=task_status, after=after,
+        **time_filters,
     )
-    tasks_total = await TaskModel.get_total_count(task_status=task_status)
+    if count_mode == CountModeTypeEnum.EXACT and not any(time_filters.values()):
+        tasks_total = list_state.count
+    else:
+        tasks_total = await TaskModel.get_total_count(
+            task_status=task_status, count_mode=count_mode, **time_filters,
+        )
     total_pages = ceil(tasks_total/page_size)
 
-    return PaginationResponse(
-        current_page=page,
-        page_size=page_size,
-        total_pages=total_pages,
-        total_items=tasks_total,
-        results=[TaskOutSchema.model_validate(_) for _ in tasks]
+    next_cursor = None
+    if len(tasks) == page_size:
+        next_cursor = encode_cursor(tasks[-1].created_at, tasks[-1].id)
+
+    response = adapter_response(task_page_adapter, {
+        'current_page': None if after else page,
+        'page_size': page_size,
+        'total_pages': total_pages,
+        'total_items': tasks_total,
+        'next_cursor': next_cursor,
+        'results': tasks,
+    }, headers=headers)
+    task_list_cache.set(etag, response.body)
+    return response
+
+
+@router.get("/search", response_model=PaginationResponse[TaskOutSchema])
+async def search_tasks(
+    q: str = Query(min_length=1, max_length=TASK_SEARCH_MAX_QUERY_LENGTH),
+    page_size: int = Query(100, ge=1, le=TASK_SEARCH_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    task_status: TaskStatusTypeEnum | None = None,
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_read_db_connection),
+) -> Response:
+    """
+    GET /tasks/search\n
+    Полнотекстовый поиск задач по названию и описанию.\n
+    Каждое слово q ищется как начало слова в задаче, задача должна содержать все слова.
+    Совпадения в названии весят больше, чем в описании; результаты упорядочены
+    по релевантности.\n
+    Есть возможность фильтрации по статусам task_status. Для следующей страницы
+    передавайте cursor из next_cursor предыдущего ответа.\n
+    """
+    if not search_words(q):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Поисковый запрос не содержит слов',
+        )
+    after = None
+    if cursor:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Не верный cursor',
+            )
+
+    found = await TaskModel.search(
+        q=q, page_size=page_size, task_status=task_status, after=after,
+    )
+    tasks_total = await TaskModel.search_count(q=q, task_status=task_status)
+
+    next_cursor = None
+    if len(found) == page_size:
+        task, rank = found[-1]
+        next_cursor = encode_search_cursor(rank, task.id)
+
+    return adapter_response(task_page_adapter, {
+        'current_page': None if after else 1,
+        'page_size': page_size,
+        'total_pages': ceil(tasks_total/page_size),
+        'total_items': tasks_total,
+        'next_cursor': next_cursor,
+        'results': [task for task, _ in found],
+    })
+
+
+@router.get("/changes", response_model=TaskChangesSchema)
+async def get_task_changes(
+    since: str | None = None,
+    page_size: int = Query(100, ge=1, le=TASK_CHANGES_MAX_PAGE_SIZE),
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_read_db_connection),
+) -> Response:
+    """
+    GET /tasks/changes\n
+    Синхронизация задач по изменениям вместо повторной загрузки всего списка.\n
+    Без since возвращает все задачи, с since - только созданные, изменённые
+    (tasks), удалённые (deleted) и перенесённые в архив (archived) после выдачи
+    токена since. Архивная задача пропадает из списков, но остаётся доступна
+    по GET /tasks/{task_id}. Каждый ответ содержит
+    next_token для следующего запроса; при has_more = true изменений больше,
+    чем page_size, и следующую часть нужно запросить сразу.\n
+    Задача может прийти повторно, поэтому изменения применяются по id.
+    Если токен старше срока хранения удалённых задач, ответ 410 -
+    нужна полная синхронизация без since.\n
+    """
+    now = datetime.utcnow()
+    since_xid = after_id = None
+    issued_at = now
+    if since:
+        try:
+            since_xid, issued_at, after_id = decode_change_token(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Не верный токен since',
+            )
+        if issued_at < now - timedelta(seconds=TASK_TOMBSTONE_RETENTION):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail='Токен since устарел, нужна полная синхронизация',
+            )
+
+    tasks, xmin = await TaskModel.get_changes(
+        page_size=page_size, since=since_xid, after_id=after_id,
+    )
+
+    has_more = len(tasks) == page_size
+    if has_more:
+        # Продолжение той же выборки: время выдачи остаётся от исходного токена
+        next_token = encode_change_token(tasks[-1].change_xid, issued_at, tasks[-1].id)
+    else:
+        # Реплика может отставать от базы, выдавшей since - граница не уменьшается
+        next_token = encode_change_token(max(xmin, since_xid or 0), now)
+
+    live = [_ for _ in tasks if isinstance(_, TaskModel)]
+    return adapter_response(task_changes_adapter, {
+        'next_token': next_token,
+        'has_more': has_more,
+        'tasks': [_ for _ in live if _.deleted_at is None],
+        'deleted': [_.id for _ in live if _.deleted_at is not None],
+        'archived': [_.id for _ in tasks if isinstance(_, TaskArchiveModel)],
+    })
+
+
+@router.get("/stats")
+async def get_task_stats(
+    bucket: StatsBucketTypeEnum = StatsBucketTypeEnum.HOUR,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_read_db_connection),
+) -> TaskStatsSchema:
+    """
+    GET /tasks/stats\n
+    Статистика задач для дашбордов: текущее количество задач по статусам и
+    по интервалам bucket (hour, day, week, по UTC) - сколько задач создано,
+    завершено и сколько раз задачи переходили в каждый статус.\n
+    start, end - интервалы, которые начинаются в [start, end), считаются целиком,
+    по умолчанию последние 7 дней. Данные берутся из заранее посчитанной почасовой статистики
+    и отстают от задач не больше чем на интервал её пересчёта (updated_until).\n
+    """
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='start должен быть раньше end',
+        )
+    return {
+        'counts': await TaskStatusCounterModel.get_counts(),
+        'bucket': bucket,
+        'start': start,
+        'end': end,
+        'updated_until': await TaskStatsHourlyModel.get_processed_until(),
+        'buckets': await TaskStatsHourlyModel.get_buckets(bucket, start, end),
+    }
+
+
+@router.get("/export")
+async def export_tasks(
+    export_format: ExportFormatTypeEnum = Query(ExportFormatTypeEnum.NDJSON, alias='format'),
+    task_status: TaskStatusTypeEnum | None = None,
+    user = Depends(authenticate_user),
+) -> StreamingResponse:
+    """
+    GET /tasks/export\n
+    Потоковая выгрузка всех задач в формате ndjson или csv.\n
+    Задачи читаются из базы серверным курсором пачками, поэтому потребление памяти
+    не зависит от количества задач. Есть возможность фильтрации по статусам task_status.\n
+    """
+    batches = TaskModel.stream_batches(
+        batch_size=TASK_EXPORT_BATCH_SIZE, task_status=task_status,
+    )
+    return StreamingResponse(
+        EXPORT_SERIALIZERS[export_format](batches),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="tasks.{export_format}"'},
+    )
+
+
+@router.get("/stream")
+async def stream_task_events(
+    task_status: TaskStatusTypeEnum | None = None,
+    user = Depends(authenticate_user),
+) -> StreamingResponse:
+    """
+    GET /tasks/stream\n
+    Поток событий об изменении задач в формате Server-Sent Events вместо
+    периодического опроса GET /tasks.\n
+    События created, updated, deleted, archived содержат id, status, version задачи
+    (у updated ещё old_status). archived - задача перенесена в архив: она пропала
+    из списков, но доступна по GET /tasks/{task_id}. Есть возможность фильтрации по статусам task_status:
+    приходят события задач, которые имеют этот статус или только что из него вышли.\n
+    Событие resync означает, что часть событий потеряна и задачи нужно перечитать.\n
+    """
+    try:
+        subscription = task_event_broker.subscribe(task_status)
+    except TooManySubscribers:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Слишком много подписчиков, повторите попытку позже',
+            headers={'Retry-After': '5'},
+        )
+
+    async def events():
+        try:
+            async for message in sse_task_events(subscription, TASK_EVENTS_PING_INTERVAL):
+                yield message
+        finally:
+            task_event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED,)
+async def post_tasks_bulk(
+    data: Annotated[list[TaskInSchema], Body(max_length=TASK_BULK_MAX_ITEMS)],
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_db_connection),
+) -> list[TaskBulkResultSchema]:
+    """
+    POST /tasks/bulk\n
+    Создание списка задач одним запросом к базе данных.\n
+    Результаты возвращаются в том же порядке, что и задачи в запросе.\n
+    """
+    tasks = await TaskModel.bulk_create(
+        [{'name': _.name, 'description': _.description} for _ in data]
     )
 
+    return [
+        TaskBulkResultSchema(
+            id=task.id,
+            result=BulkResultTypeEnum.CREATED,
+            task=TaskOutSchema.model_validate(task),
+        )
+        for task in tasks
+    ]
+
+
+@router.put("/bulk")
+async def edit_tasks_bulk(
+    data: Annotated[list[TaskBulkEditSchema], Body(max_length=TASK_BULK_MAX_ITEMS)],
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_db_connection),
+) -> list[TaskBulkResultSchema]:
+    """
+    PUT /tasks/bulk\n
+    Редактирование списка задач одним запросом к базе данных.\n
+    Для каждой задачи в ответе result = 'updated' или 'not_found'.
+    Если id повторяется, применяется последнее значение.\n
+    """
+    items = {_.id: _.model_dump() for _ in data}
+    tasks = {task.id: task for task in await TaskModel.bulk_update(list(items.values()))}
+
+    return [
+        TaskBulkResultSchema(
+            id=_.id,
+            result=BulkResultTypeEnum.UPDATED if _.id in tasks else BulkResultTypeEnum.NOT_FOUND,
+            task=TaskOutSchema.model_validate(tasks[_.id]) if _.id in tasks else None,
+        )
+        for _ in data
+    ]
+
+
+@router.delete("/bulk")
+async def delete_tasks_bulk(
+    data: Annotated[list[UUID], Body(max_length=TASK_BULK_MAX_ITEMS)],
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_db_connection),
+) -> list[TaskBulkResultSchema]:
+    """
+    DELETE /tasks/bulk\n
+    Удаление списка задач по id одним запросом к базе данных.\n
+    Для каждого id в ответе result = 'deleted' или 'not_found'.\n
+    """
+    deleted = set(await TaskModel.bulk_delete(list(set(data))))
+
+    return [
+        TaskBulkResultSchema(
+            id=_,
+            result=BulkResultTypeEnum.DELETED if _ in deleted else BulkResultTypeEnum.NOT_FOUND,
+        )
+        for _ in data
+    ]
+
 
 @router.get("/{task_id}")
 async def get_task(
     task_id: UUID,
+    request: Request,
+    response: Response,
     user = Depends(authenticate_user),
-    db_session = Depends(session_manager.activate_db_connection),
+    db_session = Depends(session_manager.activate_read_db_connection),
 ) -> TaskOutSchema:
     """
     GET /tasks/{task_id}\n
     Вывод одной задачи по приведённому task_id.\n
     name - название задачи; description - описание задачи.\n
+    Поддерживаются If-None-Match и If-Modified-Since: если задача не менялась,
+    возвращается 304 без тела.\n
     """
 
-    task = await TaskModel.get_task(task_id)
+    # Клиент, который только что писал, не должен получить копию из кэша
+    task = await TaskModel.get_task(task_id, use_cache=not _read_primary(request))
 
     if not task:
         raise HTTPException(
@@ -92,13 +454,45 @@ async def get_task(
             detail='Задача не была найдена',
         )
 
+    etag = task_etag(task)
+    headers = cache_headers(etag, task.updated_at)
+    if is_not_modified(request, etag, task.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
     return TaskOutSchema.model_validate(task)
 
 
+@router.get("/{task_id}/history")
+async def get_task_history(
+    task_id: UUID,
+    user = Depends(authenticate_user),
+    # История читается из основной базы: записи, которых уже нет в буфере
+    # этого процесса, на отстающей реплике может ещё не быть
+    db_session = Depends(session_manager.activate_db_connection),
+) -> list[TaskStatusHistorySchema]:
+    """
+    GET /tasks/{task_id}/history\n
+    История статусов задачи по времени: old_status, status, version задачи
+    после смены статуса и время смены changed_at. Первая запись с old_status = null -
+    создание задачи.\n
+    Изменение, сделанное через другой процесс приложения, появляется в истории
+    после записи его буфера, не позже TASK_HISTORY_FLUSH_INTERVAL_MS.\n
+    """
+    if not await TaskModel.get_task(task_id, use_cache=False):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Задача не была найдена',
+        )
+    return await TaskStatusHistoryModel.get_for_task(task_id)
+
+
 @router.put("/{task_id}")
 async def edit_task(
     task_id: UUID,
     data: TaskEditSchema,
+    request: Request,
+    response: Response,
     user = Depends(authenticate_user),
     db_session = Depends(session_manager.activate_db_connection),
 ) -> TaskOutSchema:
@@ -107,20 +501,62 @@ async def edit_task(
     Редактирование задачи, в том числе и её статуса.\n
     name - название задачи; description - описание задачи; status - статус задачи\n
     status задачи может быть 'created', 'in_progress', 'finished'\n
+    С заголовком If-Match задача изменится, только если её ETag не изменился,
+    иначе вернётся 412.\n
     """
 
-    task = await TaskModel.get_task(task_id)
+    expected_versions = _if_match_versions(request, task_id)
+    task = await TaskModel.update_returning(
+        task_id, expected_versions=expected_versions, **data.model_dump(),
+    )
 
     if not task:
+        await _raise_update_failed(task_id, expected_versions)
+
+    response.headers.update(cache_headers(task_etag(task), task.updated_at))
+    return TaskOutSchema.model_validate(task)
+
+
+@router.patch("/{task_id}")
+async def patch_task(
+    task_id: UUID,
+    data: TaskPatchSchema,
+    request: Request,
+    response: Response,
+    user = Depends(authenticate_user),
+    db_session = Depends(session_manager.activate_db_connection),
+) -> TaskOutSchema:
+    """
+    PATCH /tasks/{task_id}\n
+    Частичное редактирование задачи: изменяются только переданные поля
+    name, description, status; поля со значением null не изменяются.\n
+    version - версия задачи, которую видел клиент. Если задачу успели изменить,
+    вернётся 409 и клиент должен перечитать задачу. То же для заголовка If-Match,
+    но с ответом 412.\n
+    """
+
+    values = data.model_dump(exclude_unset=True, exclude_none=True, exclude={'version'})
+    if not values:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Задача не была найдена',
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Не переданы поля для изменения',
+        )
+
+    expected_versions = _if_match_versions(request, task_id)
+    if data.version is not None:
+        if expected_versions is None:
+            expected_versions = [data.version]
+        else:
+            expected_versions = [_ for _ in expected_versions if _ == data.version]
+
+    task = await TaskModel.update_returning(
+        task_id, expected_versions=expected_versions, **values,
     )
 
-    for key in data.__fields__.keys():
-        setattr(task, key, getattr(data, key))
-    await db_session.flush()
+    if not task:
+        await _raise_update_failed(task_id, expected_versions, data.version)
 
+    response.headers.update(cache_headers(task_etag(task), task.updated_at))
     return TaskOutSchema.model_validate(task)
 
 
@@ -135,15 +571,53 @@ async def delete_task(
     Удаление одной из задач по приведённому id.\n
     """
 
-    task = await TaskModel.get_task(task_id)
+    deleted_id = await TaskModel.delete_returning(task_id)
 
-    if not task:
+    if not deleted_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Задача не была найдена',
         )
 
-    await session_manager.session.execute(
-        delete(TaskModel)
-        .where(TaskModel.id == task_id)
+
+def _read_primary(request: Request) -> bool:
+    """Чтение идёт из основной базы по требованию клиента (см. activate_read_db_connection)"""
+    return getattr(request.state, 'read_primary', False)
+
+
+def _if_match_versions(request: Request, task_id: UUID) -> list[int] | None:
+    """Версии задачи из заголовка If-Match. None - заголовка нет или он равен *"""
+    etags = if_match_etags(request)
+    if etags is None or '*' in etags:
+        return None
+    parsed = [parse_task_etag(_) for _ in etags]
+    return [_[1] for _ in parsed if _ and _[0] == task_id]
+
+
+async def _raise_update_failed(
+    task_id: UUID,
+    expected_versions: list[int] | None,
+    version: int | None = None,
+):
+    """
+    Причина, по которой UPDATE не нашёл задачу: 404 - задачи нет,
+    409 - не совпала version из тела запроса, 412 - не совпал If-Match.
+    """
+    if expected_versions is not None:
+        # Архивные задачи не изменяются, для записи их нет. Кэш другого процесса
+        # мог устареть - ответ строится по строке из основной базы
+        task = await TaskModel.get_task(task_id, archived=False, use_cache=False)
+        if task and version is not None and task.version != version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f'Задача была изменена, версия задачи: {task.version}',
+            )
+        if task:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail='Задача была изменена',
+            )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail='Задача не была найдена',
     )
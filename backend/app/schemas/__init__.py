@@ -1,4 +1,12 @@
-from .utils import SchemaBase, PaginationResponse
+from .utils import (
+    SchemaBase, PaginationResponse, encode_cursor, decode_cursor,
+    encode_search_cursor, decode_search_cursor, encode_change_token, decode_change_token,
+)
 from .auth_schemas import AuthSchema
 from .user_schemas import UserSchema
-from .task_schemas import TaskInSchema, TaskOutSchema, TaskEditSchema
+from .task_schemas import (
+    TaskInSchema, TaskOutSchema, TaskEditSchema, TaskPatchSchema,
+    TaskBulkEditSchema, TaskBulkResultSchema, TaskChangesSchema, TaskStatusHistorySchema,
+    TaskStatsSchema,
+)
+from .adapters import task_out_adapter, task_page_adapter, task_changes_adapter, adapter_response
@@ -0,0 +1,29 @@
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from .utils import PaginationResponse
+from .task_schemas import TaskOutSchema, TaskChangesSchema
+
+
+# Заранее собранные валидаторы/сериализаторы ответов. Объекты ORM проверяются
+# и сериализуются в JSON за один проход в pydantic-core, без повторной валидации
+# ответа в FastAPI и без jsonable_encoder.
+task_out_adapter = TypeAdapter(TaskOutSchema)
+task_page_adapter = TypeAdapter(PaginationResponse[TaskOutSchema])
+task_changes_adapter = TypeAdapter(TaskChangesSchema)
+
+
+def adapter_response(
+    adapter: TypeAdapter,
+    data,
+    status_code: int = 200,
+    headers: dict | None = None,
+) -> Response:
+    """JSON ответ из data (dict или объекты ORM), сериализованный adapter"""
+    value = adapter.validate_python(data, from_attributes=True)
+    return Response(
+        content=adapter.dump_json(value),
+        status_code=status_code,
+        headers=headers,
+        media_type='application/json',
+    )
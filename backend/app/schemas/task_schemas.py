@@ -1,7 +1,7 @@
 from uuid import UUID
 from datetime import datetime
 
-from app.types import TaskStatusTypeEnum
+from app.types import TaskStatusTypeEnum, BulkResultTypeEnum, StatsBucketTypeEnum
 from .utils import SchemaBase
 
 
@@ -14,8 +14,72 @@ class TaskEditSchema(TaskInSchema):
     status: TaskStatusTypeEnum
 
 
+class TaskPatchSchema(SchemaBase):
+    name: str | None = None
+    description: str | None = None
+    status: TaskStatusTypeEnum | None = None
+    version: int | None = None
+
+
 class TaskOutSchema(TaskInSchema):
     id: UUID
     status: TaskStatusTypeEnum
+    version: int
     created_at: datetime
     updated_at: datetime
+
+
+class TaskBulkEditSchema(TaskEditSchema):
+    id: UUID
+
+
+class TaskBulkResultSchema(SchemaBase):
+    id: UUID
+    result: BulkResultTypeEnum
+    task: TaskOutSchema | None = None
+
+
+class TaskChangesSchema(SchemaBase):
+    """
+    Изменения задач после токена синхронизации. tasks - созданные и изменённые
+    задачи, deleted - id удалённых, archived - id перенесённых в архив (их нет
+    в списках, но они доступны по id). has_more - изменения не поместились в ответ,
+    и следующую часть нужно запросить сразу с next_token
+    """
+    next_token: str
+    has_more: bool
+    tasks: list[TaskOutSchema]
+    deleted: list[UUID]
+    archived: list[UUID]
+
+
+class TaskStatusHistorySchema(SchemaBase):
+    """Смена статуса задачи. old_status = None - создание задачи"""
+    old_status: TaskStatusTypeEnum | None
+    status: TaskStatusTypeEnum
+    version: int
+    changed_at: datetime
+
+
+class TaskStatsBucketSchema(SchemaBase):
+    """
+    Статистика за интервал, начинающийся в start: созданные и завершённые задачи
+    и количество переходов в каждый статус (entered)
+    """
+    start: datetime
+    created: int
+    finished: int
+    entered: dict[TaskStatusTypeEnum, int]
+
+
+class TaskStatsSchema(SchemaBase):
+    """
+    counts - текущее количество задач по статусам. buckets посчитаны по данным
+    до updated_until
+    """
+    counts: dict[TaskStatusTypeEnum, int]
+    bucket: StatsBucketTypeEnum
+    start: datetime
+    end: datetime
+    updated_until: datetime | None
+    buckets: list[TaskStatsBucketSchema]
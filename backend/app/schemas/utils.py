@@ -1,3 +1,8 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Generic, TypeVar
+
 from pydantic import BaseModel
 
 
@@ -6,9 +11,72 @@ class SchemaBase(BaseModel):
         from_attributes = True
 
 
-class PaginationResponse(BaseModel):
-    current_page: int
+T = TypeVar('T')
+
+
+class PaginationResponse(BaseModel, Generic[T]):
+    current_page: int | None
     page_size: int
     total_pages: int
     total_items: int
-    results: list
+    next_cursor: str | None = None
+    results: list[T]
+
+
+def _parse_naive_datetime(value: str) -> datetime:
+    """Время из курсоров и токенов: всегда UTC без часового пояса"""
+    result = datetime.fromisoformat(value)
+    if result.tzinfo is not None:
+        raise ValueError(f'Unexpected timezone: {value}')
+    return result
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """Непрозрачный курсор для keyset пагинации по (created_at, id)"""
+    raw = f'{created_at.isoformat()}|{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Обратное к encode_cursor. При неверном курсоре бросает ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split('|')
+        return _parse_naive_datetime(created_at), uuid.UUID(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def encode_search_cursor(rank: float, id: uuid.UUID) -> str:
+    """Непрозрачный курсор для keyset пагинации результатов поиска по (rank, id)"""
+    raw = f'{rank!r}|{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    """Обратное к encode_search_cursor. При неверном курсоре бросает ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        rank, id = raw.split('|')
+        return float(rank), uuid.UUID(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def encode_change_token(xid: int, issued_at: datetime, after_id: uuid.UUID | None = None) -> str:
+    """
+    Непрозрачный токен GET /tasks/changes: граница по change_xid, время выдачи
+    токена и, для продолжения неполной выборки, id последней отданной задачи
+    """
+    raw = f'{xid}|{issued_at.isoformat()}|{after_id or ""}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_change_token(token: str) -> tuple[int, datetime, uuid.UUID | None]:
+    """Обратное к encode_change_token. При неверном токене бросает ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        xid, issued_at, after_id = raw.split('|')
+        return int(xid), _parse_naive_datetime(issued_at), uuid.UUID(after_id) if after_id else None
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid token: {token}') from e
@@ -0,0 +1,57 @@
+"""
+Production запуск: миграции один раз, затем SERVER_WORKERS процессов uvicorn.
+Запуск из папки backend:
+    python -m app.server
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import uvicorn
+from alembic import command
+from alembic.config import Config
+
+from app.settings import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_RUN_MIGRATIONS
+
+import logging
+# До uvicorn.run логирование настроено только из alembic.ini
+logger = logging.getLogger('alembic')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migrations():
+    """alembic upgrade head, под той же блокировкой, что и старт процессов (alembic/env.py)"""
+    started = time.perf_counter()
+    command.upgrade(Config(os.path.join(BACKEND_DIR, 'alembic.ini')), 'head')
+    logger.info(f'Миграции применены за {time.perf_counter() - started:.3f} с')
+
+
+def prepare_metrics_dir():
+    """
+    Метрики Prometheus нескольких процессов собираются через общую папку.
+    Переменная окружения наследуется процессами uvicorn, файлы прошлого запуска удаляются
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        path = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus_')
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def main():
+    if SERVER_RUN_MIGRATIONS:
+        run_migrations()
+    if SERVER_WORKERS > 1:
+        prepare_metrics_dir()
+    uvicorn.run(
+        'app.main:app',
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=SERVER_WORKERS,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -9,3 +9,130 @@ APP_ADMIN_PASSWORD = os.getenv('APP_ADMIN_PASSWORD', 'password')
 
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt_secret_key')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+
+DATABASE_ECHO = os.getenv('DATABASE_ECHO', 'false').lower() == 'true'
+# При DATABASE_POOL_ENABLED=false каждое обращение открывает новое соединение (NullPool)
+DATABASE_POOL_ENABLED = os.getenv('DATABASE_POOL_ENABLED', 'true').lower() == 'true'
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '10'))
+DATABASE_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', '10'))
+DATABASE_POOL_TIMEOUT = float(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+DATABASE_POOL_RECYCLE = int(os.getenv('DATABASE_POOL_RECYCLE', '1800'))
+DATABASE_POOL_PRE_PING = os.getenv('DATABASE_POOL_PRE_PING', 'true').lower() == 'true'
+# Сколько соединений открыть заранее при старте приложения
+DATABASE_POOL_WARMUP = int(os.getenv('DATABASE_POOL_WARMUP', '5'))
+
+# Реплики для чтения: полные адреса через запятую. GET запросы идут на реплики,
+# запись - на основную базу
+DATABASE_REPLICA_URLS = [_.strip() for _ in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if _.strip()]
+# Реплика с отставанием больше DATABASE_REPLICA_MAX_LAG секунд не используется
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '5'))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DATABASE_REPLICA_LAG_CHECK_INTERVAL', '2'))
+# Сколько секунд после записи чтения клиента идут на основную базу (read-your-writes)
+DATABASE_STICKY_WINDOW = int(os.getenv('DATABASE_STICKY_WINDOW', '5'))
+
+# Максимальное количество задач в одном запросе к /tasks/bulk
+TASK_BULK_MAX_ITEMS = int(os.getenv('TASK_BULK_MAX_ITEMS', '1000'))
+
+# Сколько строк забирается из серверного курсора за раз при выгрузке задач
+TASK_EXPORT_BATCH_SIZE = int(os.getenv('TASK_EXPORT_BATCH_SIZE', '1000'))
+
+# Максимальный размер страницы GET /tasks
+TASK_LIST_MAX_PAGE_SIZE = int(os.getenv('TASK_LIST_MAX_PAGE_SIZE', '1000'))
+
+# Максимальная длина поискового запроса GET /tasks/search
+TASK_SEARCH_MAX_QUERY_LENGTH = int(os.getenv('TASK_SEARCH_MAX_QUERY_LENGTH', '200'))
+# Максимальный размер страницы GET /tasks/search
+TASK_SEARCH_MAX_PAGE_SIZE = int(os.getenv('TASK_SEARCH_MAX_PAGE_SIZE', '1000'))
+
+# Кэш проверенных JWT токенов и данных пользователей в JWTAuthenticationBackend
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '10000'))
+# Через сколько секунд изменение пользователя в другом процессе станет видно
+AUTH_USER_CACHE_TTL = float(os.getenv('AUTH_USER_CACHE_TTL', '30'))
+AUTH_MAX_CONCURRENT_USER_LOOKUPS = int(os.getenv('AUTH_MAX_CONCURRENT_USER_LOOKUPS', '10'))
+
+# Хэширование паролей выполняется в отдельном пуле потоков
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+# Сколько операций хэширования может ждать и выполняться одновременно,
+# сверх этого /login сразу отвечает 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+
+# Кэш отдельных задач для GET /tasks/{task_id}: local - LRU в памяти процесса,
+# redis - общий кэш для всех процессов (нужен пакет redis и REDIS_URL), none - выключен.
+# Для local изменения из других процессов станут видны не позже TASK_CACHE_TTL секунд.
+TASK_CACHE_BACKEND = os.getenv('TASK_CACHE_BACKEND', 'local')
+TASK_CACHE_SIZE = int(os.getenv('TASK_CACHE_SIZE', '10000'))
+TASK_CACHE_TTL = float(os.getenv('TASK_CACHE_TTL', '10'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+
+# Кэш тел ответов GET /tasks в памяти процесса, сбрасывается по generation счётчиков задач
+TASK_LIST_CACHE_MAX_BYTES = int(os.getenv('TASK_LIST_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+TASK_LIST_CACHE_MAX_ENTRIES = int(os.getenv('TASK_LIST_CACHE_MAX_ENTRIES', '10000'))
+
+# Логирование: записи уходят в очередь и пишутся в stderr фоновым потоком.
+# LOG_FORMAT - json или text. LOG_LEVELS - уровни отдельных логгеров,
+# например 'uvicorn.access=WARNING,sqlalchemy.engine=INFO'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Доля записей уровня DEBUG, которые попадают в лог
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+# Размер очереди записей; при переполнении новые записи отбрасываются, а не ждут
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Поток изменений задач GET /tasks/stream (LISTEN/NOTIFY).
+# Очередь каждого подписчика ограничена, при переполнении отбрасываются старые события
+TASK_EVENTS_ENABLED = os.getenv('TASK_EVENTS_ENABLED', 'true').lower() == 'true'
+TASK_EVENTS_QUEUE_SIZE = int(os.getenv('TASK_EVENTS_QUEUE_SIZE', '100'))
+TASK_EVENTS_MAX_SUBSCRIBERS = int(os.getenv('TASK_EVENTS_MAX_SUBSCRIBERS', '1000'))
+# Раз в сколько секунд отправлять комментарий, чтобы прокси не закрывали соединение
+TASK_EVENTS_PING_INTERVAL = float(os.getenv('TASK_EVENTS_PING_INTERVAL', '15'))
+TASK_EVENTS_RECONNECT_DELAY = float(os.getenv('TASK_EVENTS_RECONNECT_DELAY', '1'))
+
+# Удалённые задачи остаются в таблице как tombstone (deleted_at), чтобы
+# GET /tasks/changes мог сообщить клиентам об удалении. Tombstone старше
+# TASK_TOMBSTONE_RETENTION секунд удаляются фоновой задачей пачками по
+# TASK_TOMBSTONE_PURGE_BATCH строк; токен синхронизации старше этого срока
+# недействителен, и клиенту нужна полная синхронизация
+TASK_TOMBSTONE_RETENTION = float(os.getenv('TASK_TOMBSTONE_RETENTION', str(7 * 24 * 3600)))
+TASK_TOMBSTONE_PURGE_INTERVAL = float(os.getenv('TASK_TOMBSTONE_PURGE_INTERVAL', '3600'))
+TASK_TOMBSTONE_PURGE_BATCH = int(os.getenv('TASK_TOMBSTONE_PURGE_BATCH', '1000'))
+# Максимальное количество изменений в одном ответе GET /tasks/changes
+TASK_CHANGES_MAX_PAGE_SIZE = int(os.getenv('TASK_CHANGES_MAX_PAGE_SIZE', '1000'))
+
+# Таблица task разбита на месячные секции по created_at. Секции создаются при старте
+# и затем раз в TASK_PARTITION_CHECK_INTERVAL секунд на TASK_PARTITION_MONTHS_AHEAD
+# месяцев вперёд; задачи вне созданных секций попадают в секцию task_default
+TASK_PARTITION_MONTHS_AHEAD = int(os.getenv('TASK_PARTITION_MONTHS_AHEAD', '3'))
+TASK_PARTITION_CHECK_INTERVAL = float(os.getenv('TASK_PARTITION_CHECK_INTERVAL', str(6 * 3600)))
+# Задачи в статусе finished, которые не менялись TASK_ARCHIVE_AFTER_DAYS дней,
+# переносятся в task_archive пачками по TASK_ARCHIVE_BATCH строк
+TASK_ARCHIVE_AFTER_DAYS = float(os.getenv('TASK_ARCHIVE_AFTER_DAYS', '30'))
+TASK_ARCHIVE_INTERVAL = float(os.getenv('TASK_ARCHIVE_INTERVAL', '3600'))
+TASK_ARCHIVE_BATCH = int(os.getenv('TASK_ARCHIVE_BATCH', '1000'))
+
+# История статусов задач пишется в task_status_history фоновой задачей:
+# раз в TASK_HISTORY_FLUSH_INTERVAL_MS миллисекунд или сразу по накоплении
+# TASK_HISTORY_FLUSH_ROWS записей. Если база недоступна, в памяти хранится
+# не больше TASK_HISTORY_MAX_PENDING записей, более старые отбрасываются
+TASK_HISTORY_FLUSH_INTERVAL_MS = float(os.getenv('TASK_HISTORY_FLUSH_INTERVAL_MS', '200'))
+TASK_HISTORY_FLUSH_ROWS = int(os.getenv('TASK_HISTORY_FLUSH_ROWS', '500'))
+TASK_HISTORY_MAX_PENDING = int(os.getenv('TASK_HISTORY_MAX_PENDING', '50000'))
+
+# Почасовая статистика задач для GET /tasks/stats пересчитывается по истории статусов
+# раз в TASK_STATS_ROLLUP_INTERVAL секунд. Каждый пересчёт заново считает часы
+# начиная с TASK_STATS_LATE_WINDOW секунд до прошлого пересчёта, чтобы учесть
+# записи истории, которые попали в базу с опозданием
+TASK_STATS_ROLLUP_INTERVAL = float(os.getenv('TASK_STATS_ROLLUP_INTERVAL', '60'))
+TASK_STATS_LATE_WINDOW = float(os.getenv('TASK_STATS_LATE_WINDOW', '3600'))
+
+# Production запуск (python -m app.server): SERVER_WORKERS процессов uvicorn на одном
+# порту. Миграции применяются один раз до запуска процессов, если SERVER_RUN_MIGRATIONS=true.
+# У каждого процесса свой пул соединений и соединение LISTEN: до SERVER_WORKERS *
+# (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW + 1) соединений с базой. Не по числу CPU:
+# os.cpu_count() видит все CPU хоста, а не лимит контейнера
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '4'))
+SERVER_RUN_MIGRATIONS = os.getenv('SERVER_RUN_MIGRATIONS', 'true').lower() == 'true'
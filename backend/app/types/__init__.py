@@ -1 +1,6 @@
 from .task_status_type import TaskStatusTypeEnum
+from .count_mode_type import CountModeTypeEnum
+from .bulk_result_type import BulkResultTypeEnum
+from .export_format_type import ExportFormatTypeEnum
+from .task_event_type import TaskEventTypeEnum
+from .stats_bucket_type import StatsBucketTypeEnum
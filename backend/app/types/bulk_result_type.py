@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class BulkResultTypeEnum(str, Enum):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    NOT_FOUND = 'not_found'
+
+    def __str__(self):
+        return str(self.value)
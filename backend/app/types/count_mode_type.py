@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class CountModeTypeEnum(str, Enum):
+    EXACT = 'exact'
+    ESTIMATE = 'estimate'
+
+    def __str__(self):
+        return str(self.value)
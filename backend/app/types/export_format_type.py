@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class ExportFormatTypeEnum(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+    def __str__(self):
+        return str(self.value)
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class StatsBucketTypeEnum(str, Enum):
+    HOUR = 'hour'
+    DAY = 'day'
+    WEEK = 'week'
+
+    def __str__(self):
+        return str(self.value)
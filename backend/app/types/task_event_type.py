@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class TaskEventTypeEnum(str, Enum):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    # Задача перенесена в task_archive: пропала из списков, но доступна по id
+    ARCHIVED = 'archived'
+    # События могли быть потеряны, клиенту нужно перечитать задачи
+    RESYNC = 'resync'
+
+    def __str__(self):
+        return str(self.value)
@@ -1 +1,11 @@
 from .init_admin import init_admin
+from .purge_tombstones import purge_task_tombstones
+from .task_partitions import ensure_task_partitions
+from .task_archive import archive_finished_tasks
+from .task_stats import rollup_task_stats
+from .startup import init_data, startup_finished, startup_stats
+from .task_export import EXPORT_SERIALIZERS, EXPORT_MEDIA_TYPES
+from .http_cache import (
+    task_etag, parse_task_etag, list_etag, if_match_etags,
+    is_not_modified, cache_headers,
+)
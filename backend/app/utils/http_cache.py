@@ -0,0 +1,73 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+
+
+def task_etag(task) -> str:
+    """Сильный ETag задачи: id и номер версии задачи"""
+    return f'"{task.id.hex}.{task.version}"'
+
+
+def parse_task_etag(etag: str) -> tuple[uuid.UUID, int] | None:
+    """Обратное к task_etag. None, если ETag выдан не task_etag"""
+    try:
+        task_id, version = etag.strip().strip('"').split('.')
+        return uuid.UUID(hex=task_id), int(version)
+    except ValueError:
+        return None
+
+
+def list_etag(params: dict, generation: tuple[int, ...]) -> str:
+    """ETag страницы списка: параметры запроса и поколения счётчиков задач"""
+    raw = json.dumps([params, generation], sort_keys=True, default=str)
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _parse_etags(header: str) -> list[str]:
+    return [_.strip() for _ in header.split(',') if _.strip()]
+
+
+def if_match_etags(request: Request) -> list[str] | None:
+    """
+    ETag из заголовка If-Match; None - заголовка нет, ['*'] - любая версия.
+    If-Match сравнивает ETag строго: слабые ETag (W/...) не подходят и отбрасываются
+    """
+    header = request.headers.get('if-match')
+    if header is None:
+        return None
+    return [_ for _ in _parse_etags(header) if not _.startswith('W/')]
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    """Проверка If-None-Match, а при его отсутствии - If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        # If-None-Match сравнивает ETag слабо: W/ не учитывается
+        etags = [_.removeprefix('W/') for _ in _parse_etags(if_none_match)]
+        return '*' in etags or etag in etags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    return False
+
+
+def cache_headers(etag: str, last_modified: datetime | None) -> dict:
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
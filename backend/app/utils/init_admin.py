@@ -7,21 +7,35 @@ logger = logging.getLogger('uvicorn.error')
 
 
 async def init_admin(username: str, password: str):
+    admin, created = await get_or_create_admin(username, password)
+    if not created:
+        await check_admin(admin, password)
+
+
+async def get_or_create_admin(username: str, password: str) -> tuple[UserModel, bool]:
+    """
+    Админ и признак того, что он только что создан. Несколько процессов
+    должны вызывать её по очереди (init_data), иначе второй упадёт на уникальности username
+    """
     logger.info(f'init_admin. Ищем пользователя с username={username}')
-    admin = await UserModel.get_by_username(username)
+    admin = await UserModel.get_by_username(username, primary=True)
     if admin:
-        if admin.check_password(password):
-            raise Exception('Не верный пароль для админа. Измените в .env логин или пароль')
-        if admin.admin is False:
-            raise Exception('Этот пользователь уже существует, но не имеет прав админа. Измените в .env логин или пароль')
-        return
+        return admin, False
     logger.info(f'init_admin. Пользователь {username} не найден. Создаём нового админа')
 
     admin = UserModel(
         username = username,
         admin = True,
     )
-    admin.set_password(password)
+    await admin.set_password(password)
 
     session_manager.session.add(admin)
     await session_manager.session.commit()
+    return admin, True
+
+
+async def check_admin(admin: UserModel, password: str):
+    if not await admin.check_password(password):
+        raise Exception('Не верный пароль для админа. Измените в .env логин или пароль')
+    if admin.admin is False:
+        raise Exception('Этот пользователь уже существует, но не имеет прав админа. Измените в .env логин или пароль')
@@ -0,0 +1,15 @@
+import logging
+from datetime import datetime, timedelta
+
+from app.models import TaskModel
+from app.settings import TASK_TOMBSTONE_RETENTION, TASK_TOMBSTONE_PURGE_BATCH
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def purge_task_tombstones():
+    """Удаляет tombstone задач старше TASK_TOMBSTONE_RETENTION секунд"""
+    older_than = datetime.utcnow() - timedelta(seconds=TASK_TOMBSTONE_RETENTION)
+    purged = await TaskModel.purge_tombstones(older_than, TASK_TOMBSTONE_PURGE_BATCH)
+    if purged:
+        logger.info(f'Удалено tombstone задач: {purged}')
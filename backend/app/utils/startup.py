@@ -0,0 +1,51 @@
+import logging
+import os
+import time
+
+from app.db import advisory_lock, STARTUP_LOCK
+from .init_admin import get_or_create_admin, check_admin
+from .task_partitions import ensure_task_partitions
+
+logger = logging.getLogger('uvicorn.error')
+
+_startup_stats: dict = {}
+
+
+async def init_data(username: str, password: str) -> float:
+    """
+    Шаги старта, которые меняют данные: админ и секции task. Процессы приложения
+    выполняют их по очереди, следующий видит уже созданного админа.
+    Возвращает время ожидания блокировки в секундах.
+    """
+    async with advisory_lock(STARTUP_LOCK) as waited:
+        admin, created = await get_or_create_admin(username, password)
+        # Секция на текущий месяц должна быть до первых запросов
+        await ensure_task_partitions()
+    # Проверка пароля (bcrypt) не меняет данных: вне блокировки процессы не ждут её друг у друга
+    if not created:
+        await check_admin(admin, password)
+    return waited
+
+
+def startup_finished(import_started: float, lifespan_started: float, lock_wait: float):
+    """
+    Запоминает и пишет в лог время старта процесса. import_started - начало
+    импорта приложения, lifespan_started - начало lifespan, оба time.perf_counter()
+    """
+    finished = time.perf_counter()
+    _startup_stats.update(
+        pid=os.getpid(),
+        total_s=round(finished - import_started, 3),
+        import_s=round(lifespan_started - import_started, 3),
+        lifespan_s=round(finished - lifespan_started, 3),
+        lock_wait_s=round(lock_wait, 3),
+    )
+    logger.info(
+        f'Процесс {_startup_stats["pid"]} запущен за {_startup_stats["total_s"]} с: '
+        f'импорт {_startup_stats["import_s"]} с, lifespan {_startup_stats["lifespan_s"]} с, '
+        f'из них ожидание блокировки старта {_startup_stats["lock_wait_s"]} с'
+    )
+
+
+def startup_stats() -> dict:
+    return dict(_startup_stats)
@@ -0,0 +1,15 @@
+import logging
+from datetime import datetime, timedelta
+
+from app.models import TaskModel
+from app.settings import TASK_ARCHIVE_AFTER_DAYS, TASK_ARCHIVE_BATCH
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def archive_finished_tasks():
+    """Переносит в task_archive задачи finished, не менявшиеся TASK_ARCHIVE_AFTER_DAYS дней"""
+    older_than = datetime.utcnow() - timedelta(days=TASK_ARCHIVE_AFTER_DAYS)
+    archived = await TaskModel.archive_finished(older_than, TASK_ARCHIVE_BATCH)
+    if archived:
+        logger.info(f'Перенесено в архив задач: {archived}')
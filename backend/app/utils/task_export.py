@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from app.types import ExportFormatTypeEnum
+
+
+EXPORT_COLUMNS = ['id', 'name', 'description', 'status', 'created_at', 'updated_at']
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatTypeEnum.NDJSON: 'application/x-ndjson',
+    ExportFormatTypeEnum.CSV: 'text/csv',
+}
+
+
+def _row_values(row) -> list:
+    return [
+        str(row.id), row.name, row.description, str(row.status),
+        row.created_at.isoformat(), row.updated_at.isoformat(),
+    ]
+
+
+async def iter_ndjson(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """Одна строка JSON на задачу; каждая пачка строк отдаётся одним куском"""
+    async for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row))), ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode()
+
+
+async def iter_csv(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """CSV с заголовком; каждая пачка строк отдаётся одним куском"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows(_row_values(row) for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+EXPORT_SERIALIZERS = {
+    ExportFormatTypeEnum.NDJSON: iter_ndjson,
+    ExportFormatTypeEnum.CSV: iter_csv,
+}
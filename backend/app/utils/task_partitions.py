@@ -0,0 +1,14 @@
+import logging
+from datetime import datetime
+
+from app.models import TaskModel
+from app.settings import TASK_PARTITION_MONTHS_AHEAD
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def ensure_task_partitions():
+    """Создаёт секции task на текущий месяц и TASK_PARTITION_MONTHS_AHEAD месяцев вперёд"""
+    created = await TaskModel.create_partitions(datetime.utcnow(), TASK_PARTITION_MONTHS_AHEAD + 1)
+    if created:
+        logger.info(f'Создано секций task: {created}')
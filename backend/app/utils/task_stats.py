@@ -0,0 +1,12 @@
+import logging
+
+from app.models import TaskStatsHourlyModel
+from app.settings import TASK_STATS_LATE_WINDOW
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def rollup_task_stats():
+    """Пересчитывает почасовую статистику задач, если её не пересчитывает другой процесс"""
+    if not await TaskStatsHourlyModel.rollup(TASK_STATS_LATE_WINDOW):
+        logger.debug('Статистику задач пересчитывает другой процесс')
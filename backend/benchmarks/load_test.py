@@ -0,0 +1,275 @@
+"""
+Нагрузочный тест API задач.
+
+Поднимает приложение app.main:app в этом же процессе (httpx.ASGITransport) или
+обращается к уже запущенному серверу (--base-url) и гоняет по нему clients
+параллельных клиентов. Каждый клиент логинится, а затем iterations раз проходит
+сценарий: создание задачи, списки задач (первая страница, глубокая страница по
+page, глубокая страница по cursor, фильтр по статусу), получение, PUT, PATCH и
+удаление задачи.
+
+Для каждого маршрута выводится JSON с количеством запросов, ошибок, пропускной
+способностью и задержками p50/p95/p99 в миллисекундах. С --baseline результаты
+сравниваются с сохранённым прогоном: если p95 маршрута вырос больше чем на
+--threshold, скрипт завершается с кодом 1.
+
+Запуск из папки backend на базе с применёнными миграциями:
+    python -m benchmarks.load_test --clients 20 --iterations 50 --seed 10000 --output run.json
+    python -m benchmarks.load_test --clients 20 --iterations 50 --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from httpx import AsyncClient, ASGITransport, Response
+
+from app.settings import (
+    APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD, DATABASE_URL_FULL, TASK_BULK_MAX_ITEMS,
+)
+from app.types import TaskStatusTypeEnum
+
+
+class LatencyRecorder:
+    """Задержки и ошибки по маршрутам"""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def timed(self, route: str, request) -> Response:
+        started = time.perf_counter()
+        response = await request
+        self.latencies[route].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            routes[route] = {
+                'requests': len(latencies),
+                'errors': self.errors[route],
+                'rps': round(len(latencies) / elapsed, 1),
+                **percentiles(latencies),
+            }
+        total = sum(len(_) for _ in self.latencies.values())
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'rps': round(total / elapsed, 1),
+            'routes': routes,
+        }
+
+
+def percentiles(latencies: list[float]) -> dict:
+    ms = sorted(_ * 1000 for _ in latencies)
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0]
+    return {
+        'mean_ms': round(statistics.fmean(ms), 2),
+        'p50_ms': round(p50, 2),
+        'p95_ms': round(p95, 2),
+        'p99_ms': round(p99, 2),
+        'max_ms': round(ms[-1], 2),
+    }
+
+
+async def login(client: AsyncClient, recorder: LatencyRecorder | None = None) -> dict:
+    request = client.post('/login', json={
+        'username': APP_ADMIN_USERNAME, 'password': APP_ADMIN_PASSWORD,
+    })
+    response = await (recorder.timed('POST /login', request) if recorder else request)
+    response.raise_for_status()
+    return {'Authorization': f'Bearer {response.json()}'}
+
+
+async def seed(client: AsyncClient, headers: dict, count: int) -> list[str]:
+    """Создаёт count задач через /tasks/bulk, каждую третью переводит в in_progress"""
+    ids = []
+    for start in range(0, count, TASK_BULK_MAX_ITEMS):
+        size = min(TASK_BULK_MAX_ITEMS, count - start)
+        response = await client.post('/tasks/bulk', headers=headers, json=[
+            {'name': f'Seed task {start + n}', 'description': 'Load test task ' * 8}
+            for n in range(size)
+        ])
+        response.raise_for_status()
+        created = [_['task'] for _ in response.json()]
+        ids.extend(_['id'] for _ in created)
+
+        response = await client.put('/tasks/bulk', headers=headers, json=[
+            {**_, 'status': TaskStatusTypeEnum.IN_PROGRESS}
+            for _ in created[::3]
+        ])
+        response.raise_for_status()
+    return ids
+
+
+async def cleanup(client: AsyncClient, headers: dict, ids: list[str]):
+    for start in range(0, len(ids), TASK_BULK_MAX_ITEMS):
+        response = await client.request(
+            'DELETE', '/tasks/bulk', headers=headers,
+            json=ids[start:start + TASK_BULK_MAX_ITEMS],
+        )
+        response.raise_for_status()
+
+
+async def run_client(
+    client: AsyncClient,
+    recorder: LatencyRecorder,
+    iterations: int,
+    page_size: int,
+    deep_page: int,
+    deep_cursor: str | None,
+):
+    headers = await login(client, recorder)
+    for n in range(iterations):
+        response = await recorder.timed('POST /tasks', client.post(
+            '/tasks', headers=headers,
+            json={'name': f'Load task {n}', 'description': 'Load test task'},
+        ))
+        task_id = response.json()['id']
+
+        await recorder.timed('GET /tasks', client.get(
+            '/tasks', headers=headers, params={'page_size': page_size},
+        ))
+        await recorder.timed('GET /tasks?page=deep', client.get(
+            '/tasks', headers=headers, params={'page': deep_page, 'page_size': page_size},
+        ))
+        if deep_cursor:
+            await recorder.timed('GET /tasks?cursor=deep', client.get(
+                '/tasks', headers=headers, params={'cursor': deep_cursor, 'page_size': page_size},
+            ))
+        await recorder.timed('GET /tasks?task_status', client.get(
+            '/tasks', headers=headers,
+            params={'task_status': TaskStatusTypeEnum.IN_PROGRESS, 'page_size': page_size},
+        ))
+        await recorder.timed('GET /tasks/{task_id}', client.get(
+            f'/tasks/{task_id}', headers=headers,
+        ))
+        response = await recorder.timed('PUT /tasks/{task_id}', client.put(
+            f'/tasks/{task_id}', headers=headers, json={
+                'name': f'Load task {n}', 'description': 'Edited',
+                'status': TaskStatusTypeEnum.IN_PROGRESS,
+            },
+        ))
+        await recorder.timed('PATCH /tasks/{task_id}', client.patch(
+            f'/tasks/{task_id}', headers=headers, json={
+                'status': TaskStatusTypeEnum.FINISHED, 'version': response.json()['version'],
+            },
+        ))
+        await recorder.timed('DELETE /tasks/{task_id}', client.delete(
+            f'/tasks/{task_id}', headers=headers,
+        ))
+
+
+async def load_test(client: AsyncClient, args) -> dict:
+    headers = await login(client)
+    seeded = await seed(client, headers, args.seed) if args.seed else []
+
+    deep_page = max(args.deep_page, 1)
+    response = await client.get('/tasks', headers=headers, params={
+        'page': deep_page, 'page_size': args.page_size,
+    })
+    response.raise_for_status()
+    deep_cursor = response.json()['next_cursor']
+
+    recorder = LatencyRecorder()
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_client(client, recorder, args.iterations, args.page_size, deep_page, deep_cursor)
+        for _ in range(args.clients)
+    ])
+    elapsed = time.perf_counter() - started
+
+    if seeded and not args.keep_seed:
+        await cleanup(client, headers, seeded)
+
+    return {
+        'config': {
+            'target': args.base_url or 'in-process',
+            'clients': args.clients,
+            'iterations': args.iterations,
+            'page_size': args.page_size,
+            'deep_page': deep_page,
+            'seed': args.seed,
+        },
+        **recorder.report(elapsed),
+    }
+
+
+async def run(args) -> dict:
+    if args.base_url:
+        async with AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+            return await load_test(client, args)
+
+    # Приложение в этом же процессе: подключение к базе как в tests/fixtures.py
+    from app.db import session_manager
+    from app.main import app
+    from app.utils import init_admin
+
+    await session_manager.init(args.database_url)
+    await session_manager.connect()
+    if args.create_schema:
+        await session_manager.create_all()
+    await init_admin(APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD)
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url='http://test/', timeout=args.timeout) as client:
+            return await load_test(client, args)
+    finally:
+        await session_manager.session.close()
+        await session_manager.close()
+
+
+def regressions(result: dict, baseline: dict, threshold: float) -> dict:
+    """Маршруты, у которых p95 вырос больше, чем на threshold относительно baseline"""
+    found = {}
+    for route, stats in result['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if before and before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            found[route] = {'baseline_p95_ms': before['p95_ms'], 'p95_ms': stats['p95_ms']}
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--deep-page', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0, help='сколько задач создать перед прогоном')
+    parser.add_argument('--keep-seed', action='store_true', help='не удалять созданные задачи')
+    parser.add_argument('--base-url', help='адрес запущенного сервера вместо приложения в процессе')
+    parser.add_argument('--database-url', default=DATABASE_URL_FULL)
+    parser.add_argument('--create-schema', action='store_true', help='create_all для пустой базы')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--output', help='сохранить результат в файл')
+    parser.add_argument('--baseline', help='сравнить с результатом предыдущего прогона')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            result['regressions'] = regressions(result, json.load(f), args.threshold)
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    if result.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Микро-бенчмарк сериализации ответа GET /tasks.
+
+Сравнивает стоимость одной строки списка задач:
+  legacy - TaskOutSchema.model_validate для каждой строки, PaginationResponse с
+           results: list, затем повторная валидация и сериализация в FastAPI
+           (serialize_response + JSONResponse);
+  fast   - task_page_adapter: одна валидация объектов ORM и dump_json в pydantic-core.
+
+Запуск из папки backend:
+    python -m benchmarks.serialization_bench --rows 100 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from app.models import TaskModel
+from app.schemas import TaskOutSchema, task_page_adapter, adapter_response
+from app.types import TaskStatusTypeEnum
+
+
+class LegacyPaginationResponse(BaseModel):
+    current_page: int | None
+    page_size: int
+    total_pages: int
+    total_items: int
+    next_cursor: str | None = None
+    results: list
+
+
+legacy_field = create_model_field(name='Response_get_list_tasks', type_=LegacyPaginationResponse)
+
+
+def make_tasks(rows: int) -> list[TaskModel]:
+    now = datetime.utcnow()
+    return [
+        TaskModel(
+            id=uuid.uuid4(),
+            name=f'Task {n}',
+            description='Some description ' * 4,
+            status=TaskStatusTypeEnum.IN_PROGRESS,
+            created_at=now,
+            updated_at=now,
+            version=1,
+        )
+        for n in range(rows)
+    ]
+
+
+def page(tasks: list, results: list) -> dict:
+    return {
+        'current_page': 1,
+        'page_size': len(tasks),
+        'total_pages': 1,
+        'total_items': len(tasks),
+        'next_cursor': None,
+        'results': results,
+    }
+
+
+async def legacy(tasks: list[TaskModel]) -> bytes:
+    response = LegacyPaginationResponse(
+        **page(tasks, [TaskOutSchema.model_validate(_) for _ in tasks])
+    )
+    content = await serialize_response(field=legacy_field, response_content=response)
+    return JSONResponse(content).body
+
+
+async def fast(tasks: list[TaskModel]) -> bytes:
+    return adapter_response(task_page_adapter, page(tasks, tasks)).body
+
+
+async def measure(func, tasks: list[TaskModel], repeat: int) -> float:
+    await func(tasks)
+    started = time.process_time()
+    for _ in range(repeat):
+        await func(tasks)
+    return (time.process_time() - started) / repeat / len(tasks)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.rows)
+    assert json.loads(await legacy(tasks)) == json.loads(await fast(tasks))
+
+    legacy_cost = await measure(legacy, tasks, args.repeat)
+    fast_cost = await measure(fast, tasks, args.repeat)
+    print(json.dumps({
+        'rows': args.rows,
+        'legacy_us_per_row': round(legacy_cost * 1e6, 2),
+        'fast_us_per_row': round(fast_cost * 1e6, 2),
+        'speedup': round(legacy_cost / fast_cost, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,3 +1,6 @@
+import asyncio
+import threading
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy import select
@@ -5,6 +8,8 @@ from sqlalchemy import select
 from app.settings import APP_ADMIN_PASSWORD, APP_ADMIN_USERNAME, DATABASE_URL
 from app.models import UserModel
 from app.main import app
+from app.authentication import password_hasher, PasswordHasherOverloaded
+from app.authentication.password_utils import PasswordHasher
 
 
 async def test_login(db_session):
@@ -25,3 +30,84 @@ async def test_login(db_session):
     assert response.status_code == 200
 
     admin = (await db_session.scalars(select(UserModel).where(UserModel.username == APP_ADMIN_USERNAME))).one()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stats(db_session, auth_client):
+    response = await auth_client.get('/stats')
+    assert response.status_code == 200
+
+    pool_stats = response.json()['db_pool']
+    assert pool_stats['checkouts'] > 0
+    assert 0 <= pool_stats['saturation'] <= 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_token_revoked_after_user_deleted(db_session):
+    user = UserModel(username='short_lived_user', admin=False)
+    await user.set_password('password')
+    db_session.add(user)
+    await db_session.flush()
+
+    client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test/')
+    response = await client.post('/login', json={'username': user.username, 'password': 'password'})
+    assert response.status_code == 200
+    client.headers['Authorization'] = f'Bearer {response.json()}'
+
+    for _ in range(0, 3):
+        response = await client.get('/who_am_i')
+        assert response.status_code == 200
+        assert response.json()['admin'] is False
+
+    await db_session.delete(user)
+    await db_session.flush()
+
+    response = await client.get('/who_am_i')
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_login_password_hasher_overloaded(db_session, client):
+    auth_data = {'username': APP_ADMIN_USERNAME, 'password': APP_ADMIN_PASSWORD}
+
+    max_pending = password_hasher.max_pending
+    password_hasher.max_pending = 0
+    try:
+        response = await client.post('/login', json=auth_data)
+        assert response.status_code == 503
+    finally:
+        password_hasher.max_pending = max_pending
+
+    response = await client.post('/login', json=auth_data)
+    assert response.status_code == 200
+
+    response = await client.post('/login', json={**auth_data, 'password': 'wrong'})
+    assert response.status_code == 401
+
+    response = await client.post('/login', json={**auth_data, 'username': 'nobody'})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_password_hasher_cancelled_keeps_slot():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    task = asyncio.create_task(hasher._run(release.wait))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # поток всё ещё занят, новая операция не должна к нему добавиться
+    assert hasher.pending == 1
+    with pytest.raises(PasswordHasherOverloaded):
+        await hasher._run(release.wait)
+
+    release.set()
+    for _ in range(100):
+        if hasher.pending == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert hasher.pending == 0
+    assert await hasher._run(lambda: True) is True
+    hasher.shutdown()
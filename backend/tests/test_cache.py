@@ -0,0 +1,172 @@
+import sys
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app.cache import TTLCache, CacheBackend, TaskCache, task_cache, TaskListCache
+from app.models import TaskModel
+from app.db.session import READ_PRIMARY_HEADER
+from app.types import TaskStatusTypeEnum
+
+
+class DictCacheBackend(CacheBackend):
+    """Замена общего кэша (redis) для тестов"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def test_ttl_cache_eviction_and_expiry(monkeypatch):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    # 'b' дольше всех не использовался
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+    cache.set('short', 4, ttl=1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 5)
+    assert cache.get('short') is None
+    assert cache.get('a') == 1
+
+
+def test_task_list_cache_eviction():
+    cache = TaskListCache(max_bytes=10, max_entries=3)
+    cache.set('a', b'1234')
+    cache.set('b', b'1234')
+    assert cache.get('a') == b'1234'
+    # не помещается по размеру - вытесняется давно не использованный 'b'
+    cache.set('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.size_bytes == 8
+    assert cache.evictions == 1
+
+    cache.set('too big', b'x' * 11)
+    assert cache.get('too big') is None
+    assert cache.stats()['entries'] == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_cache_read_through(db_session, auth_client, monkeypatch):
+    shared_cache = TaskCache(backend=DictCacheBackend(), ttl=60)
+    monkeypatch.setattr('app.models.task_model.task_cache', shared_cache)
+
+    response = await auth_client.post('/tasks', json={'name': 'cached', 'description': ''})
+    task_id = response.json()['id']
+    assert f'task:{task_id}' in shared_cache.backend.data
+
+    for _ in range(0, 3):
+        response = await auth_client.get(f"/tasks/{task_id}")
+        assert response.status_code == 200
+        assert response.json()['name'] == 'cached'
+    assert shared_cache.hits == 3
+    assert shared_cache.misses == 0
+
+    edit_data = {'name': 'cached edited', 'description': '', 'status': TaskStatusTypeEnum.FINISHED}
+    response = await auth_client.put(f"/tasks/{task_id}", json=edit_data)
+    assert response.status_code == 200
+
+    response = await auth_client.get(f"/tasks/{task_id}")
+    assert response.json()['name'] == 'cached edited'
+    assert response.json()['status'] == TaskStatusTypeEnum.FINISHED
+
+    response = await auth_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == 204
+    assert f'task:{task_id}' not in shared_cache.backend.data
+    assert await TaskModel.get_task(task_id) is None
+    assert shared_cache.misses == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_update_conflict_bypasses_cache(db_session, auth_client, monkeypatch):
+    shared_cache = TaskCache(backend=DictCacheBackend(), ttl=60)
+    monkeypatch.setattr('app.models.task_model.task_cache', shared_cache)
+
+    response = await auth_client.post('/tasks', json={'name': 'stale', 'description': ''})
+    task_id = response.json()['id']
+    # задачу изменил другой процесс, кэш об этом не знает
+    await db_session.execute(update(TaskModel).where(TaskModel.id == task_id).values(version=5))
+    assert f'task:{task_id}' in shared_cache.backend.data
+
+    response = await auth_client.patch(f"/tasks/{task_id}", json={'name': 'x', 'version': 1})
+    assert response.status_code == 409
+    assert response.json()['detail'].endswith(': 5')
+
+    response = await auth_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_cache_bypassed_for_primary_reads(db_session, auth_client, monkeypatch):
+    shared_cache = TaskCache(backend=DictCacheBackend(), ttl=60)
+    monkeypatch.setattr('app.models.task_model.task_cache', shared_cache)
+
+    response = await auth_client.post('/tasks', json={'name': 'before', 'description': ''})
+    task_id = response.json()['id']
+    # запись через другой процесс: кэш этого процесса устарел
+    await db_session.execute(update(TaskModel).where(TaskModel.id == task_id).values(name='after'))
+
+    response = await auth_client.get(f"/tasks/{task_id}")
+    assert response.json()['name'] == 'before'
+    response = await auth_client.get(f"/tasks/{task_id}", headers={READ_PRIMARY_HEADER: 'true'})
+    assert response.json()['name'] == 'after'
+    auth_client.cookies.clear()
+
+    response = await auth_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == 204
+    auth_client.cookies.clear()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_cache_stats(db_session, auth_client):
+    response = await auth_client.get('/stats')
+    assert response.status_code == 200
+    assert response.json()['task_cache'] == task_cache.stats()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_list_cache(db_session, auth_client, monkeypatch):
+    list_cache = TaskListCache(max_bytes=1024 * 1024, max_entries=100)
+    monkeypatch.setattr(sys.modules['app.routers.task_router'], 'task_list_cache', list_cache)
+
+    response = await auth_client.post('/tasks', json={'name': 'listed', 'description': ''})
+    task_id = response.json()['id']
+
+    first = await auth_client.get('/tasks', params={'page_size': 1000})
+    assert first.status_code == 200
+    for _ in range(0, 3):
+        response = await auth_client.get('/tasks', params={'page_size': 1000})
+        assert response.content == first.content
+        assert response.headers['etag'] == first.headers['etag']
+    assert list_cache.misses == 1
+    assert list_cache.hits == 3
+
+    # Запись в обход приложения тоже меняет поколение счётчиков
+    await db_session.execute(
+        update(TaskModel).where(TaskModel.id == task_id).values(name='listed by sql')
+    )
+    response = await auth_client.get('/tasks', params={'page_size': 1000})
+    assert response.headers['etag'] != first.headers['etag']
+    names = {_['id']: _['name'] for _ in response.json()['results']}
+    assert names[task_id] == 'listed by sql'
+    assert list_cache.misses == 2
+
+    response = await auth_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == 204
+    response = await auth_client.get('/tasks', params={'page_size': 1000})
+    assert task_id not in {_['id'] for _ in response.json()['results']}
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+
+from app.events import TaskEventBroker, TaskEventListener, sse_task_events, task_event_broker
+from app.models import TaskModel, TaskArchiveModel
+from app.types import TaskStatusTypeEnum, TaskEventTypeEnum
+
+
+def test_broker_drops_oldest_events():
+    broker = TaskEventBroker(queue_size=2, max_subscribers=10)
+    everything = broker.subscribe()
+    finished = broker.subscribe(TaskStatusTypeEnum.FINISHED)
+
+    for n in range(0, 3):
+        broker.publish({'op': 'updated', 'id': n, 'status': 'in_progress', 'old_status': 'created'})
+    broker.publish({'op': 'updated', 'id': 3, 'status': 'created', 'old_status': 'finished'})
+
+    assert [everything.queue.get_nowait()['id'] for _ in range(0, 2)] == [2, 3]
+    assert everything.dropped == 2
+    assert finished.queue.get_nowait()['id'] == 3
+    assert finished.queue.empty()
+    assert broker.stats() == {'subscribers': 2, 'published': 4, 'dropped': 2}
+
+    broker.unsubscribe(finished)
+    assert broker.stats()['subscribers'] == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_sse_resync_after_dropped_events():
+    broker = TaskEventBroker(queue_size=1, max_subscribers=10)
+    subscription = broker.subscribe()
+    stream = sse_task_events(subscription, ping_interval=0.01)
+
+    assert await anext(stream) == b': connected\n\n'
+    assert await anext(stream) == b': ping\n\n'
+    broker.publish({'op': 'created', 'id': 1})
+    broker.publish({'op': 'created', 'id': 2})
+    assert await anext(stream) == b'event: resync\ndata: {"op":"resync","dropped":1}\n\n'
+    assert await anext(stream) == b'event: created\ndata: {"op":"created","id":2}\n\n'
+    await stream.aclose()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_events_from_database(db_session, auth_client, mock_database_url):
+    broker = TaskEventBroker(queue_size=100, max_subscribers=10)
+    listener = TaskEventListener(broker)
+    listener.start(mock_database_url)
+    await asyncio.wait_for(listener.connected.wait(), timeout=5)
+    subscription = broker.subscribe(TaskStatusTypeEnum.IN_PROGRESS)
+    everything = broker.subscribe()
+
+    async def next_event(subscription):
+        return await asyncio.wait_for(subscription.get(), timeout=5)
+
+    try:
+        response = await auth_client.post('/tasks', json={'name': 'event task', 'description': ''})
+        task_id = response.json()['id']
+        event = await next_event(everything)
+        assert event == {'op': 'created', 'id': task_id, 'status': 'created', 'version': 1}
+
+        response = await auth_client.patch(f'/tasks/{task_id}', json={'status': TaskStatusTypeEnum.IN_PROGRESS})
+        assert response.status_code == 200
+        event = await next_event(subscription)
+        assert event['op'] == TaskEventTypeEnum.UPDATED
+        assert (event['status'], event['old_status'], event['version']) == ('in_progress', 'created', 2)
+
+        response = await auth_client.delete(f'/tasks/{task_id}')
+        assert response.status_code == 204
+        event = await next_event(subscription)
+        assert event['op'] == TaskEventTypeEnum.DELETED
+        assert subscription.queue.empty()
+    finally:
+        await listener.stop()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_archived_event(db_session, mock_database_url):
+    broker = TaskEventBroker(queue_size=100, max_subscribers=10)
+    listener = TaskEventListener(broker)
+    listener.start(mock_database_url)
+    await asyncio.wait_for(listener.connected.wait(), timeout=5)
+
+    task = TaskModel(
+        name='archived event task', description='', status=TaskStatusTypeEnum.FINISHED,
+        updated_at=datetime.utcnow() - timedelta(days=400),
+    )
+    db_session.add(task)
+    await db_session.flush()
+    subscription = broker.subscribe(TaskStatusTypeEnum.FINISHED)
+    try:
+        # перенос в архив - не удаление: задача по-прежнему доступна по id
+        assert await TaskModel.archive_finished(datetime.utcnow() - timedelta(days=300), batch_size=10) == 1
+        event = await asyncio.wait_for(subscription.get(), timeout=5)
+        assert event == {'op': 'archived', 'id': str(task.id), 'status': 'finished', 'version': 1}
+        assert subscription.queue.empty()
+    finally:
+        await listener.stop()
+        await db_session.execute(delete(TaskArchiveModel).where(TaskArchiveModel.id == task.id))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_subscribers_limit(db_session, auth_client, monkeypatch):
+    monkeypatch.setattr(task_event_broker, 'max_subscribers', 0)
+    response = await auth_client.get('/tasks/stream')
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '5'
@@ -0,0 +1,49 @@
+import json
+import logging
+from queue import Queue
+
+from app.log_config import JsonFormatter, SamplingFilter, DroppingQueueHandler, parse_levels
+
+
+def make_record(level=logging.INFO, msg='message %s', args=('arg',), **extra) -> logging.LogRecord:
+    record = logging.LogRecord('app.test', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    data = json.loads(JsonFormatter().format(make_record(task_id='42')))
+    assert data['level'] == 'INFO'
+    assert data['logger'] == 'app.test'
+    assert data['message'] == 'message arg'
+    assert data['task_id'] == '42'
+    assert 'args' not in data
+
+
+def test_sampling_filter(monkeypatch):
+    sampling = SamplingFilter(rate=0.25)
+    monkeypatch.setattr('random.random', lambda: 0.5)
+    assert not sampling.filter(make_record(logging.DEBUG))
+    assert sampling.filter(make_record(logging.INFO))
+    monkeypatch.setattr('random.random', lambda: 0.1)
+    assert sampling.filter(make_record(logging.DEBUG))
+
+
+def test_dropping_queue_handler():
+    queue = Queue(maxsize=1)
+    handler = DroppingQueueHandler(queue)
+    handler.handle(make_record(task_id='1'))
+    # очередь заполнена - запись отбрасывается без ожидания
+    handler.handle(make_record())
+    assert handler.dropped == 1
+
+    record = queue.get_nowait()
+    assert record.getMessage() == 'message arg'
+    assert record.args is None
+    assert record.task_id == '1'
+
+
+def test_parse_levels():
+    assert parse_levels('uvicorn.access=warning, sqlalchemy.engine=INFO,') == {
+        'uvicorn.access': 'WARNING', 'sqlalchemy.engine': 'INFO',
+    }
@@ -0,0 +1,41 @@
+import pytest
+
+
+def sample(text: str, name: str, **labels) -> float:
+    """Значение метрики из текстового формата Prometheus, 0 - если её нет"""
+    expected = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    for line in text.splitlines():
+        if line.startswith(f'{name}{{{expected}}} ') or (not labels and line.startswith(f'{name} ')):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_metrics(db_session, auth_client, client):
+    before = (await client.get('/metrics')).text
+
+    response = await auth_client.post('/tasks', json={'name': 'metrics task', 'description': ''})
+    task_id = response.json()['id']
+    response = await auth_client.get(f'/tasks/{task_id}')
+    assert response.status_code == 200
+
+    response = await client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    after = response.text
+
+    route = {'method': 'GET', 'route': '/tasks/{task_id}'}
+    assert sample(after, 'http_requests_total', **route, status=200) == \
+        sample(before, 'http_requests_total', **route, status=200) + 1
+    assert sample(after, 'http_request_duration_seconds_count', **route) == \
+        sample(before, 'http_request_duration_seconds_count', **route) + 1
+    # создание задачи - как минимум INSERT в task
+    route = {'method': 'POST', 'route': '/tasks'}
+    assert sample(after, 'db_queries_per_request_sum', **route) >= \
+        sample(before, 'db_queries_per_request_sum', **route) + 1
+    assert sample(after, 'db_query_duration_seconds_count') > sample(before, 'db_query_duration_seconds_count')
+    assert 'db_pool_checked_out' in after
+    assert f'/tasks/{task_id}' not in after
+
+    response = await auth_client.delete(f'/tasks/{task_id}')
+    assert response.status_code == 204
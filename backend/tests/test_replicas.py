@@ -0,0 +1,58 @@
+import pytest
+
+from app.db import session_manager
+from app.db.session import READ_PRIMARY_COOKIE, READ_PRIMARY_HEADER
+
+
+@pytest.fixture
+async def replica(db_session, mock_database_url, auth_client):
+    # Вместо настоящей реплики - второй engine к той же базе
+    replica = session_manager.add_replica(mock_database_url)
+    yield replica
+    await session_manager.close_replicas()
+    auth_client.cookies.clear()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_read_replica_routing(replica, auth_client):
+    # отставание ещё не измерено - читаем из основной базы
+    primary_reads = session_manager.primary_reads
+    response = await auth_client.get('/tasks')
+    assert response.status_code == 200
+    assert replica.reads == 0
+    assert session_manager.primary_reads == primary_reads + 1
+
+    await session_manager.check_replica_lag()
+    assert replica.lag == 0
+    response = await auth_client.get('/tasks')
+    assert response.status_code == 200
+    assert replica.reads == 1
+
+    response = await auth_client.get('/tasks', headers={READ_PRIMARY_HEADER: 'true'})
+    assert response.status_code == 200
+    assert replica.reads == 1
+
+    # после записи клиент какое-то время читает из основной базы
+    response = await auth_client.post('/tasks', json={'name': 'replica task', 'description': ''})
+    assert response.status_code == 201
+    assert READ_PRIMARY_COOKIE in response.cookies
+    task_id = response.json()['id']
+    response = await auth_client.get('/tasks')
+    assert replica.reads == 1
+    auth_client.cookies.clear()
+
+    response = await auth_client.get(f'/tasks/{task_id}')
+    assert response.status_code == 200
+    assert replica.reads == 2
+
+    # реплика сильно отстала - чтения уходят в основную базу
+    replica.lag = 3600
+    response = await auth_client.get('/tasks')
+    assert response.status_code == 200
+    assert replica.reads == 2
+
+    response = await auth_client.get('/stats')
+    assert response.json()['db_replicas']['replicas'] == [replica.stats()]
+
+    response = await auth_client.delete(f'/tasks/{task_id}')
+    assert response.status_code == 204
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, func, text
+
+from app.settings import APP_ADMIN_PASSWORD, APP_ADMIN_USERNAME
+from app.models import UserModel
+from app.db import advisory_lock
+from app.utils import init_data
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_startup_lock(db_session):
+    steps = []
+
+    async def worker(n: int) -> float:
+        async with advisory_lock('test_startup_lock') as waited:
+            steps.append(n)
+            await asyncio.sleep(0.1)
+            steps.append(n)
+        return waited
+
+    waits = await asyncio.gather(worker(1), worker(2))
+    # Второй процесс входит только после выхода первого
+    assert steps in ([1, 1, 2, 2], [2, 2, 1, 1])
+    assert max(waits) >= 0.1
+    locks = await db_session.scalar(text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'"))
+    assert locks == 0
+
+    # Повторный старт находит уже созданного админа
+    await init_data(APP_ADMIN_USERNAME, APP_ADMIN_PASSWORD)
+    admins = await db_session.scalar(
+        select(func.count()).select_from(UserModel).where(UserModel.username == APP_ADMIN_USERNAME)
+    )
+    assert admins == 1
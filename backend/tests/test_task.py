@@ -1,10 +1,22 @@
+import asyncio
+import csv
+import io
+import json
 import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, delete, update, func, text
 
-from app.models import TaskModel
-from app.types import TaskStatusTypeEnum
+from app.db import BufferedInsert, session_manager
+from app.models import (
+    TaskModel, TaskArchiveModel, TaskStatusHistoryModel, task_status_history_writer,
+    TaskStatusCounterModel, TaskStatsHourlyModel, TaskStatsWatermarkModel,
+)
+from app.models.task_model import compile_query
+from app.schemas import encode_cursor, encode_change_token
+from app.types import TaskStatusTypeEnum, CountModeTypeEnum, BulkResultTypeEnum
+from app.settings import TASK_LIST_MAX_PAGE_SIZE, TASK_SEARCH_MAX_PAGE_SIZE
 
 
 @pytest.mark.asyncio(loop_scope="session")
@@ -164,4 +176,669 @@ async def test_pagination_tasks(db_session, auth_client):
     assert list_data['total_items'] == len(in_progress_tasks)
     # cleaning database from tasks
     await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
-    assert await db_session.scalar(func.count(select(TaskModel.id))) == 0
+    assert await db_session.scalar(
+        select(func.count(TaskModel.id)).where(TaskModel.deleted_at.is_(None))
+    ) == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_cursor_pagination_tasks(db_session, auth_client):
+    tasks = []
+    for n in range(0, 7):
+        task = TaskModel(name=f'Name {n}', description=f'Description {n}')
+        tasks.append(task)
+        db_session.add(task)
+    await db_session.flush()
+
+    response = await auth_client.get(f"/tasks?page_size=3")
+    assert response.status_code == 200
+    list_data = response.json()
+    assert list_data['total_items'] == len(tasks)
+    assert list_data['next_cursor'] is not None
+
+    seen = [_['id'] for _ in list_data['results']]
+    while list_data['next_cursor']:
+        response = await auth_client.get(
+            f"/tasks?page_size=3&cursor={list_data['next_cursor']}"
+        )
+        assert response.status_code == 200
+        list_data = response.json()
+        assert list_data['current_page'] is None
+        seen.extend(_['id'] for _ in list_data['results'])
+
+    assert seen == [str(_.id) for _ in tasks]
+
+    response = await auth_client.get(f"/tasks?cursor=not-a-cursor")
+    assert response.status_code == 400
+    aware = encode_cursor(datetime.now(timezone.utc), tasks[0].id)
+    response = await auth_client.get('/tasks', params={'cursor': aware})
+    assert response.status_code == 400
+    for page_size in (0, -1, TASK_LIST_MAX_PAGE_SIZE + 1):
+        response = await auth_client.get('/tasks', params={'page_size': page_size})
+        assert response.status_code == 422
+    response = await auth_client.get('/tasks', params={'page': 0})
+    assert response.status_code == 422
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_status_counters(db_session, auth_client):
+    tasks = [TaskModel(name=f'Name {n}', description='') for n in range(0, 4)]
+    db_session.add_all(tasks)
+    await db_session.flush()
+
+    await db_session.execute(
+        update(TaskModel)
+        .where(TaskModel.id.in_([tasks[0].id, tasks[1].id]))
+        .values(status=TaskStatusTypeEnum.FINISHED)
+    )
+    await db_session.execute(delete(TaskModel).where(TaskModel.id == tasks[2].id))
+
+    for task_status in TaskStatusTypeEnum:
+        expected = await db_session.scalar(
+            select(func.count(TaskModel.id))
+            .where(TaskModel.status == task_status, TaskModel.deleted_at.is_(None))
+        )
+        assert await TaskModel.get_total_count(task_status=task_status) == expected
+
+        response = await auth_client.get(f"/tasks?task_status={task_status}")
+        assert response.json()['total_items'] == expected
+
+    # Оценка по pg_class учитывает и tombstone, оставшиеся от других тестов
+    await TaskModel.purge_tombstones(datetime.utcnow(), batch_size=100)
+    await db_session.execute(text('ANALYZE task'))
+    response = await auth_client.get(f"/tasks?count_mode={CountModeTypeEnum.ESTIMATE}")
+    assert response.status_code == 200
+    assert response.json()['total_items'] == 3
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
+    assert await TaskModel.get_total_count() == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_tasks(db_session, auth_client):
+    create_data = [{'name': f'Bulk {n}', 'description': f'Description {n}'} for n in range(0, 5)]
+
+    response = await auth_client.post('/tasks/bulk', json=create_data)
+    assert response.status_code == 201
+    created = response.json()
+    assert [_['result'] for _ in created] == [BulkResultTypeEnum.CREATED] * len(create_data)
+    assert [_['task']['name'] for _ in created] == [_['name'] for _ in create_data]
+    ids = [_['id'] for _ in created]
+
+    missing_id = str(uuid.uuid4())
+    edit_data = [
+        {'id': ids[0], 'name': 'Bulk edited', 'description': '', 'status': TaskStatusTypeEnum.FINISHED},
+        {'id': missing_id, 'name': 'Missing', 'description': '', 'status': TaskStatusTypeEnum.FINISHED},
+        {'id': ids[1], 'name': 'Bulk edited 1', 'description': 'd', 'status': TaskStatusTypeEnum.IN_PROGRESS},
+    ]
+    response = await auth_client.put('/tasks/bulk', json=edit_data)
+    assert response.status_code == 200
+    updated = response.json()
+    assert [_['result'] for _ in updated] == [
+        BulkResultTypeEnum.UPDATED, BulkResultTypeEnum.NOT_FOUND, BulkResultTypeEnum.UPDATED,
+    ]
+    assert updated[0]['task']['status'] == TaskStatusTypeEnum.FINISHED
+    assert updated[0]['task']['updated_at'] != created[0]['task']['updated_at']
+    assert updated[1]['task'] is None
+    assert updated[2]['task']['name'] == 'Bulk edited 1'
+
+    response = await auth_client.get(f"/tasks/{ids[0]}")
+    assert response.json()['name'] == 'Bulk edited'
+
+    response = await auth_client.request('DELETE', '/tasks/bulk', json=ids + [missing_id])
+    assert response.status_code == 200
+    deleted = response.json()
+    assert [_['result'] for _ in deleted] == [BulkResultTypeEnum.DELETED] * len(ids) + [BulkResultTypeEnum.NOT_FOUND]
+    assert await TaskModel.get_total_count() == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_tasks(db_session, auth_client):
+    tasks = [
+        TaskModel(
+            name=f'Export, {n}',
+            description=f'"quoted" {n}',
+            status=TaskStatusTypeEnum.FINISHED if n % 2 else TaskStatusTypeEnum.CREATED,
+        )
+        for n in range(0, 5)
+    ]
+    db_session.add_all(tasks)
+    await db_session.flush()
+
+    response = await auth_client.get('/tasks/export?format=ndjson')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(_) for _ in response.text.splitlines()]
+    assert [_['id'] for _ in rows] == [str(_.id) for _ in tasks]
+    assert rows[1]['status'] == TaskStatusTypeEnum.FINISHED
+
+    response = await auth_client.get(f'/tasks/export?format=csv&task_status={TaskStatusTypeEnum.FINISHED}')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    finished = [_ for _ in tasks if _.status == TaskStatusTypeEnum.FINISHED]
+    assert [_['id'] for _ in rows] == [str(_.id) for _ in finished]
+    assert rows[0]['name'] == finished[0].name
+    assert rows[0]['description'] == finished[0].description
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_conditional_requests(db_session, auth_client):
+    response = await auth_client.post('/tasks', json={'name': 'etag task', 'description': ''})
+    assert response.status_code == 201
+    task_id = response.json()['id']
+    etag = response.headers['etag']
+
+    response = await auth_client.get(f"/tasks/{task_id}")
+    assert response.status_code == 200
+    assert response.headers['etag'] == etag
+    last_modified = response.headers['last-modified']
+
+    response = await auth_client.get(f"/tasks/{task_id}", headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+
+    response = await auth_client.get(f"/tasks/{task_id}", headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    response = await auth_client.get("/tasks")
+    assert response.status_code == 200
+    list_etag = response.headers['etag']
+
+    response = await auth_client.get("/tasks", headers={'If-None-Match': list_etag})
+    assert response.status_code == 304
+
+    response = await auth_client.get(f"/tasks/{task_id}", headers={'If-None-Match': f'W/{etag}'})
+    assert response.status_code == 304
+
+    edit_data = {'name': 'etag task', 'description': 'changed', 'status': TaskStatusTypeEnum.IN_PROGRESS}
+    # для If-Match слабый ETag не совпадает ни с какой версией
+    response = await auth_client.put(f"/tasks/{task_id}", json=edit_data, headers={'If-Match': f'W/{etag}'})
+    assert response.status_code == 412
+    response = await auth_client.put(f"/tasks/{task_id}", json=edit_data, headers={'If-Match': etag})
+    assert response.status_code == 200
+    new_etag = response.headers['etag']
+    assert new_etag != etag
+
+    # старый ETag больше не подходит
+    response = await auth_client.put(f"/tasks/{task_id}", json=edit_data, headers={'If-Match': etag})
+    assert response.status_code == 412
+
+    response = await auth_client.put(f"/tasks/{uuid.uuid4()}", json=edit_data, headers={'If-Match': etag})
+    assert response.status_code == 404
+
+    response = await auth_client.get(f"/tasks/{task_id}", headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    response = await auth_client.get("/tasks", headers={'If-None-Match': list_etag})
+    assert response.status_code == 200
+
+    response = await auth_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_search_tasks(db_session, auth_client):
+    tasks = [
+        TaskModel(name='Подготовить отчёт', description='квартальный отчёт для бухгалтерии'),
+        TaskModel(name='Починить сервер', description='после обновления не стартует отчёт'),
+        TaskModel(name='Отчётность', description='', status=TaskStatusTypeEnum.FINISHED),
+        TaskModel(name='Deploy release', description='release notes'),
+    ]
+    db_session.add_all(tasks)
+    await db_session.flush()
+
+    response = await auth_client.get('/tasks/search', params={'q': 'отчёт'})
+    assert response.status_code == 200
+    data = response.json()
+    # совпадение в названии выше совпадения в описании, 'Отчётность' находится по префиксу
+    assert [_['name'] for _ in data['results']] == [
+        'Подготовить отчёт', 'Отчётность', 'Починить сервер',
+    ]
+    assert data['total_items'] == 3
+
+    response = await auth_client.get('/tasks/search', params={
+        'q': 'отчёт', 'task_status': TaskStatusTypeEnum.FINISHED,
+    })
+    assert [_['name'] for _ in response.json()['results']] == ['Отчётность']
+
+    response = await auth_client.get('/tasks/search', params={'q': 'DEPLOY rel'})
+    assert [_['name'] for _ in response.json()['results']] == ['Deploy release']
+
+    found, cursor = [], None
+    while True:
+        params = {'q': 'отчёт', 'page_size': 1}
+        if cursor:
+            params['cursor'] = cursor
+        data = (await auth_client.get('/tasks/search', params=params)).json()
+        found.extend(_['name'] for _ in data['results'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert found == ['Подготовить отчёт', 'Отчётность', 'Починить сервер']
+
+    response = await auth_client.get('/tasks/search', params={'q': '&|!'})
+    assert response.status_code == 400
+    response = await auth_client.get('/tasks/search', params={'q': 'отчёт', 'cursor': 'bad'})
+    assert response.status_code == 400
+    for page_size in (0, -1, TASK_SEARCH_MAX_PAGE_SIZE + 1):
+        response = await auth_client.get('/tasks/search', params={'q': 'отчёт', 'page_size': page_size})
+        assert response.status_code == 422
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_patch_task(db_session, auth_client):
+    response = await auth_client.post('/tasks', json={'name': 'patch task', 'description': 'long text'})
+    task = response.json()
+    etag = response.headers['etag']
+    assert task['version'] == 1
+
+    response = await auth_client.patch(f"/tasks/{task['id']}", json={
+        'status': TaskStatusTypeEnum.IN_PROGRESS, 'version': 1,
+    })
+    assert response.status_code == 200
+    patched = response.json()
+    assert patched['status'] == TaskStatusTypeEnum.IN_PROGRESS
+    assert patched['name'] == 'patch task'
+    assert patched['description'] == 'long text'
+    assert patched['version'] == 2
+    assert response.headers['etag'] == f'"{uuid.UUID(task["id"]).hex}.2"'
+
+    # версия 1 устарела - изменение не должно потеряться
+    response = await auth_client.patch(f"/tasks/{task['id']}", json={'name': 'lost', 'version': 1})
+    assert response.status_code == 409
+
+    response = await auth_client.patch(f"/tasks/{task['id']}", json={'name': 'lost'}, headers={'If-Match': etag})
+    assert response.status_code == 412
+
+    response = await auth_client.patch(f"/tasks/{task['id']}", json={'description': 'short'})
+    assert response.status_code == 200
+    assert response.json()['version'] == 3
+    assert response.json()['status'] == TaskStatusTypeEnum.IN_PROGRESS
+
+    # PUT тоже увеличивает версию
+    edit_data = {'name': 'patch task', 'description': '', 'status': TaskStatusTypeEnum.FINISHED}
+    response = await auth_client.put(f"/tasks/{task['id']}", json=edit_data)
+    assert response.json()['version'] == 4
+
+    response = await auth_client.patch(f"/tasks/{task['id']}", json={'version': 4})
+    assert response.status_code == 400
+    response = await auth_client.patch(f"/tasks/{uuid.uuid4()}", json={'name': 'x', 'version': 1})
+    assert response.status_code == 404
+
+    response = await auth_client.delete(f"/tasks/{task['id']}")
+    assert response.status_code == 204
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_time_filters_tasks(db_session, auth_client):
+    base = datetime(2020, 1, 1)
+    tasks = [
+        TaskModel(
+            name=f'Dated {n}', description='',
+            status=TaskStatusTypeEnum.IN_PROGRESS if n % 2 else TaskStatusTypeEnum.CREATED,
+            created_at=base + timedelta(days=n), updated_at=base + timedelta(days=n, hours=12),
+        )
+        for n in range(0, 10)
+    ]
+    db_session.add_all(tasks)
+    await db_session.flush()
+
+    params = {'created_after': '2020-01-03T00:00:00', 'created_before': '2020-01-07T00:00:00'}
+    response = await auth_client.get('/tasks', params=params)
+    data = response.json()
+    assert [_['name'] for _ in data['results']] == ['Dated 2', 'Dated 3', 'Dated 4', 'Dated 5']
+    assert data['total_items'] == 4
+
+    response = await auth_client.get('/tasks', params={
+        **params, 'task_status': TaskStatusTypeEnum.IN_PROGRESS,
+    })
+    assert [_['name'] for _ in response.json()['results']] == ['Dated 3', 'Dated 5']
+    assert response.json()['total_items'] == 2
+
+    # время с часовым поясом приводится к UTC
+    response = await auth_client.get('/tasks', params={
+        'updated_after': '2020-01-09T15:00:00+03:00', 'updated_before': '2020-01-10T13:00:00Z',
+    })
+    assert [_['name'] for _ in response.json()['results']] == ['Dated 8', 'Dated 9']
+
+    response = await auth_client.get('/tasks', params={**params, 'count_mode': CountModeTypeEnum.ESTIMATE})
+    assert response.status_code == 200
+
+    # На маленькой таблице планировщик выбирает seq scan, поэтому запрещаем его
+    # и проверяем, что для фильтров вообще есть подходящий индекс
+    queries = [
+        (TaskModel.butch_query(
+            page_size=10, task_status=TaskStatusTypeEnum.IN_PROGRESS, created_after=base,
+        ), {'ix_task_status_created_at_id'}),
+        (TaskModel.butch_query(
+            page_size=10, updated_after=base, updated_before=base + timedelta(days=3),
+        ), {'ix_task_updated_at'}),
+        (TaskModel.butch_query(
+            page_size=10, task_status=TaskStatusTypeEnum.CREATED, updated_after=base,
+        ), {'ix_task_status_updated_at', 'ix_task_status_created_at_id'}),
+    ]
+    await db_session.execute(text('SET enable_seqscan = off'))
+    try:
+        for query, indexes in queries:
+            plan = await db_session.scalar(text(f'EXPLAIN (FORMAT JSON) {compile_query(query)}'))
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(plan_nodes(plan[0]['Plan']))
+            assert not [_ for _ in nodes if _['Node Type'] == 'Seq Scan'], plan
+            # В плане индексы секций task, сравниваем их родительские индексы
+            used = [_['Index Name'] for _ in nodes if 'Index Name' in _]
+            parents = set((await db_session.scalars(
+                text('SELECT inhparent::regclass::text FROM pg_inherits WHERE inhrelid::regclass::text = ANY(:names)'),
+                {'names': used},
+            )).all())
+            assert indexes & parents, plan
+    finally:
+        await db_session.execute(text('RESET enable_seqscan'))
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_([_.id for _ in tasks])))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_changes(db_session, auth_client):
+    tasks = []
+    for n in range(0, 3):
+        response = await auth_client.post('/tasks', json={'name': f'Sync {n}', 'description': ''})
+        tasks.append(response.json())
+    ids = {_['id'] for _ in tasks}
+
+    # первая синхронизация частями по page_size
+    synced, token = set(), None
+    while True:
+        params = {'page_size': 2, **({'since': token} if token else {})}
+        response = await auth_client.get('/tasks/changes', params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['tasks']) + len(data['deleted']) <= 2
+        synced.update(_['id'] for _ in data['tasks'])
+        token = data['next_token']
+        if not data['has_more']:
+            break
+    assert ids <= synced
+
+    response = await auth_client.get('/tasks/changes', params={'since': token})
+    assert response.json()['tasks'] == []
+    assert response.json()['deleted'] == []
+
+    await auth_client.patch(f"/tasks/{tasks[0]['id']}", json={'status': TaskStatusTypeEnum.FINISHED})
+    response = await auth_client.delete(f"/tasks/{tasks[1]['id']}")
+    assert response.status_code == 204
+    response = await auth_client.get(f"/tasks/{tasks[1]['id']}")
+    assert response.status_code == 404
+
+    response = await auth_client.get('/tasks/changes', params={'since': token})
+    data = response.json()
+    assert [(_['id'], _['status'], _['version']) for _ in data['tasks']] == [
+        (tasks[0]['id'], TaskStatusTypeEnum.FINISHED, 2),
+    ]
+    assert data['deleted'] == [tasks[1]['id']]
+    assert data['has_more'] is False
+
+    response = await auth_client.get('/tasks/changes', params={'since': 'broken'})
+    assert response.status_code == 400
+    aware = encode_change_token(0, datetime.now(timezone.utc))
+    response = await auth_client.get('/tasks/changes', params={'since': aware})
+    assert response.status_code == 400
+    stale = encode_change_token(0, datetime.utcnow() - timedelta(days=365))
+    response = await auth_client.get('/tasks/changes', params={'since': stale})
+    assert response.status_code == 410
+
+    # tombstone старше срока хранения удаляются пачками
+    await db_session.execute(
+        update(TaskModel)
+        .where(TaskModel.id == tasks[1]['id'])
+        .values(deleted_at=datetime.utcnow() - timedelta(days=30))
+    )
+    purged = await TaskModel.purge_tombstones(datetime.utcnow() - timedelta(days=1), batch_size=1)
+    assert purged >= 1
+    assert await db_session.scalar(
+        select(func.count(TaskModel.id)).where(TaskModel.id == tasks[1]['id'])
+    ) == 0
+
+    await db_session.execute(delete(TaskModel).where(TaskModel.id.in_(ids)))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_partitions_and_archive(db_session, auth_client):
+    # секции на текущий и следующие месяцы создаются вместе с таблицей
+    assert await TaskModel.create_partitions(datetime.utcnow(), 2) == 0
+
+    old = TaskModel(
+        name='Old finished', description='', status=TaskStatusTypeEnum.FINISHED,
+        created_at=datetime(2019, 5, 3), updated_at=datetime(2019, 5, 4),
+    )
+    fresh = TaskModel(name='Fresh finished', description='', status=TaskStatusTypeEnum.FINISHED)
+    db_session.add_all([old, fresh])
+    await db_session.flush()
+
+    partitions = dict((await db_session.execute(
+        text('SELECT id, tableoid::regclass::text FROM task WHERE id IN (:old, :fresh)'),
+        {'old': old.id, 'fresh': fresh.id},
+    )).all())
+    assert partitions[old.id] == 'task_default'
+    assert partitions[fresh.id] == f'task_p{fresh.created_at:%Y%m}'
+    # секцию за месяц, задачи которого уже лежат в task_default, создать нельзя
+    assert await TaskModel.create_partitions(datetime(2019, 5, 1), 1) == 0
+    assert await TaskModel.create_partitions(datetime(2019, 6, 1), 1) == 1
+
+    response = await auth_client.get('/tasks/changes')
+    token = response.json()['next_token']
+    while response.json()['has_more']:
+        response = await auth_client.get('/tasks/changes', params={'since': token})
+        token = response.json()['next_token']
+
+    finished = await TaskModel.get_total_count(task_status=TaskStatusTypeEnum.FINISHED)
+    archived = await TaskModel.archive_finished(datetime.utcnow() - timedelta(days=1), batch_size=1)
+    assert archived >= 1
+    assert await TaskModel.get_total_count(task_status=TaskStatusTypeEnum.FINISHED) == finished - archived
+    assert await db_session.scalar(
+        select(func.count(TaskModel.id)).where(TaskModel.id == old.id)
+    ) == 0
+
+    # архивная задача по-прежнему доступна по id, но не изменяется
+    response = await auth_client.get(f'/tasks/{old.id}')
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Old finished'
+    response = await auth_client.get(f'/tasks/{fresh.id}')
+    assert response.status_code == 200
+    response = await auth_client.patch(f'/tasks/{old.id}', json={'name': 'x', 'version': 1})
+    assert response.status_code == 404
+
+    # клиенты синхронизации узнают о переносе в архив, а не об удалении
+    response = await auth_client.get('/tasks/changes', params={'since': token})
+    data = response.json()
+    assert str(old.id) in data['archived']
+    assert str(old.id) not in data['deleted']
+    assert str(old.id) not in [_['id'] for _ in data['tasks']]
+
+    await db_session.execute(delete(TaskArchiveModel).where(TaskArchiveModel.id == old.id))
+    await db_session.execute(delete(TaskModel).where(TaskModel.id == fresh.id))
+    await db_session.execute(text('DROP TABLE task_p201906'))
+
+
+def test_buffered_insert_drops_oldest():
+    buffer = BufferedInsert(TaskStatusHistoryModel.__table__, flush_interval=1, max_rows=2, max_pending=3)
+    buffer.add({'n': 1})
+    assert not buffer._full.is_set()
+    buffer.add(*[{'n': n} for n in range(2, 6)])
+    assert buffer._full.is_set()
+    assert [_['n'] for _ in buffer.pending] == [3, 4, 5]
+    assert buffer.stats()['dropped'] == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_buffered_insert_rejects_bad_rows(db_session):
+    buffer = BufferedInsert(TaskStatusHistoryModel.__table__, flush_interval=1, max_rows=10, max_pending=100)
+    task_id = uuid.uuid4()
+    row = {
+        'task_id': task_id, 'old_status': None, 'status': TaskStatusTypeEnum.CREATED,
+        'changed_at': datetime.utcnow(),
+    }
+    # строка без status нарушает NOT NULL: её повтор не поможет
+    buffer.add({**row, 'version': 1}, {**row, 'version': 2, 'status': None}, {**row, 'version': 3})
+    assert await buffer.flush() == 2
+    assert buffer.pending == []
+    assert buffer.stats()['rejected'] == 1
+    assert await buffer.flush() == 0
+    assert (await db_session.scalars(
+        select(TaskStatusHistoryModel.version).where(TaskStatusHistoryModel.task_id == task_id)
+    )).all() == [1, 3]
+    await db_session.execute(delete(TaskStatusHistoryModel).where(TaskStatusHistoryModel.task_id == task_id))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_buffered_insert_stop_during_flush(db_session):
+    buffer = BufferedInsert(TaskStatusHistoryModel.__table__, flush_interval=60, max_rows=1, max_pending=100)
+    task_id = uuid.uuid4()
+    row = {
+        'task_id': task_id, 'old_status': None, 'status': TaskStatusTypeEnum.CREATED,
+        'changed_at': datetime.utcnow(),
+    }
+    async with session_manager._engine.connect() as conn:
+        # блокировка таблицы держит фоновую запись внутри flush
+        await conn.execute(text('BEGIN'))
+        await conn.execute(text('LOCK TABLE task_status_history IN ACCESS EXCLUSIVE MODE'))
+        buffer.start()
+        buffer.add({**row, 'version': 1})
+        for _ in range(100):
+            if buffer._in_flight:
+                break
+            await asyncio.sleep(0.01)
+        assert buffer._in_flight
+        stop = asyncio.create_task(buffer.stop())
+        await asyncio.sleep(0.1)
+        assert not stop.done()
+        await conn.execute(text('COMMIT'))
+    await stop
+    assert buffer.pending == []
+    assert buffer.stats()['written'] == 1
+    assert (await db_session.scalars(
+        select(TaskStatusHistoryModel.version).where(TaskStatusHistoryModel.task_id == task_id)
+    )).all() == [1]
+    await db_session.execute(delete(TaskStatusHistoryModel).where(TaskStatusHistoryModel.task_id == task_id))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_status_history(db_session, auth_client):
+    response = await auth_client.post('/tasks', json={'name': 'History', 'description': ''})
+    task = response.json()
+    await auth_client.put(f"/tasks/{task['id']}", json={
+        'name': 'History', 'description': '', 'status': TaskStatusTypeEnum.IN_PROGRESS,
+    })
+    await auth_client.patch(f"/tasks/{task['id']}", json={'name': 'History 2'})
+    await auth_client.patch(f"/tasks/{task['id']}", json={'status': TaskStatusTypeEnum.FINISHED})
+
+    expected = [
+        (None, TaskStatusTypeEnum.CREATED, 1),
+        (TaskStatusTypeEnum.CREATED, TaskStatusTypeEnum.IN_PROGRESS, 2),
+        (TaskStatusTypeEnum.IN_PROGRESS, TaskStatusTypeEnum.FINISHED, 4),
+    ]
+    # записи ещё в буфере, но уже видны в истории
+    assert task_status_history_writer.stats()['pending'] >= 3
+    response = await auth_client.get(f"/tasks/{task['id']}/history")
+    assert response.status_code == 200
+    assert [(_['old_status'], _['status'], _['version']) for _ in response.json()] == expected
+
+    assert await task_status_history_writer.flush() >= 3
+    assert task_status_history_writer.stats()['pending'] == 0
+    assert await db_session.scalar(
+        select(func.count(TaskStatusHistoryModel.id))
+        .where(TaskStatusHistoryModel.task_id == task['id'])
+    ) == 3
+    response = await auth_client.get(f"/tasks/{task['id']}/history")
+    assert [(_['old_status'], _['status'], _['version']) for _ in response.json()] == expected
+
+    response = await auth_client.get(f"/tasks/{uuid.uuid4()}/history")
+    assert response.status_code == 404
+
+    await db_session.execute(
+        delete(TaskStatusHistoryModel).where(TaskStatusHistoryModel.task_id == task['id'])
+    )
+    await db_session.execute(delete(TaskModel).where(TaskModel.id == task['id']))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_stats(db_session, auth_client):
+    await db_session.execute(delete(TaskStatsWatermarkModel))
+    created, in_progress, finished = (
+        TaskStatusTypeEnum.CREATED, TaskStatusTypeEnum.IN_PROGRESS, TaskStatusTypeEnum.FINISHED,
+    )
+    ids = [uuid.uuid4() for _ in range(0, 3)]
+    base = datetime(2019, 3, 1, 10)
+    db_session.add_all([
+        TaskStatusHistoryModel(task_id=task_id, old_status=old, status=new, version=version, changed_at=changed_at)
+        for task_id, old, new, version, changed_at in [
+            (ids[0], None, created, 1, base + timedelta(minutes=5)),
+            (ids[1], None, created, 1, base + timedelta(minutes=40)),
+            (ids[0], created, in_progress, 2, base + timedelta(minutes=50)),
+            (ids[0], in_progress, finished, 3, base + timedelta(hours=1, minutes=10)),
+            (ids[2], None, created, 1, base + timedelta(days=1)),
+        ]
+    ])
+    await db_session.flush()
+    assert await TaskStatsHourlyModel.rollup(late_window=3600)
+
+    params = {'start': '2019-03-01T00:00:00', 'end': '2019-03-03T00:00:00'}
+    response = await auth_client.get('/tasks/stats', params=params)
+    assert response.status_code == 200
+    data = response.json()
+    assert data['counts'] == await TaskStatusCounterModel.get_counts()
+    assert data['updated_until'] is not None
+    assert [
+        (_['start'], _['created'], _['finished'], _['entered'][in_progress]) for _ in data['buckets']
+    ] == [
+        ('2019-03-01T10:00:00', 2, 0, 1),
+        ('2019-03-01T11:00:00', 0, 1, 0),
+        ('2019-03-02T10:00:00', 1, 0, 0),
+    ]
+
+    response = await auth_client.get('/tasks/stats', params={**params, 'bucket': 'day'})
+    assert [(_['start'], _['created'], _['finished']) for _ in response.json()['buckets']] == [
+        ('2019-03-01T00:00:00', 2, 1),
+        ('2019-03-02T00:00:00', 1, 0),
+    ]
+    # интервалы, которые начинаются в [start, end), считаются целиком: день 2019-03-01
+    # начался раньше start и не попадает в ответ, день 2019-03-02 начался раньше end
+    response = await auth_client.get('/tasks/stats', params={
+        'start': '2019-03-01T10:30:00', 'end': '2019-03-02T05:00:00', 'bucket': 'day',
+    })
+    assert [(_['start'], _['created'], _['finished']) for _ in response.json()['buckets']] == [
+        ('2019-03-02T00:00:00', 1, 0),
+    ]
+    response = await auth_client.get('/tasks/stats', params={
+        'start': '2019-02-25T00:00:00', 'end': '2019-03-01T00:00:01', 'bucket': 'week',
+    })
+    assert [(_['start'], _['created'], _['finished']) for _ in response.json()['buckets']] == [
+        ('2019-02-25T00:00:00', 3, 1),
+    ]
+    response = await auth_client.get('/tasks/stats', params={'start': params['end'], 'end': params['start']})
+    assert response.status_code == 400
+
+    # пока пересчёт выполняет другой процесс, этот пропускает итерацию
+    other = await session_manager.get_session()
+    try:
+        await other.execute(text("SELECT pg_advisory_lock(hashtext('task_stats_hourly'))"))
+        assert not await TaskStatsHourlyModel.rollup(late_window=3600)
+        await other.execute(text("SELECT pg_advisory_unlock(hashtext('task_stats_hourly'))"))
+    finally:
+        await other.close()
+
+    await db_session.execute(delete(TaskStatusHistoryModel).where(TaskStatusHistoryModel.task_id.in_(ids)))
+    await db_session.execute(delete(TaskStatsHourlyModel))
+    await db_session.execute(delete(TaskStatsWatermarkModel))